@@ -0,0 +1,196 @@
+"""
+Benchmark: every run_* algorithm and metric function on seeded synthetic graphs.
+
+Usage:
+    python -m benchmarks.bench_algorithms [--sizes 10000 100000] [--only louvain leiden] [--timeout 600]
+    python -m benchmarks.bench_algorithms --compare old.json new.json
+
+Graphs come from benchmarks.synthetic (power-law degrees, planted communities),
+so the same arguments always benchmark the same graphs. Every function runs in
+its own forked worker process (the graph is inherited, not pickled), which gives
+a per-function peak RSS and lets slow functions time out. Results (wall time,
+peak RSS, modularity and NMI against the planted partition) are written as JSON
+to results/benchmarks/, tagged with the git commit, to compare across commits.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import numpy as np
+from src import algorithms, metrics, parallel, data_loader
+from src.ensemble import normalized_mutual_info
+from benchmarks.synthetic import planted_partition_graph
+
+DEFAULT_SIZES = [10000, 100000]
+OUTPUT_DIR = os.path.join("results", "benchmarks")
+
+ALGORITHMS = {
+    "louvain": algorithms.run_louvain,
+    "leiden": algorithms.run_leiden,
+    "label_propagation": algorithms.run_label_propagation,
+    "asyn_lpa": algorithms.run_asyn_lpa,
+    "greedy_modularity": algorithms.run_greedy_modularity,
+    "girvan_newman": algorithms.run_girvan_newman,
+    "girvan_newman_approx": algorithms.run_girvan_newman_approx,
+    "hierarchical": algorithms.run_hierarchical,
+}
+SEEDED = {"louvain", "leiden", "label_propagation", "asyn_lpa", "girvan_newman_approx"}
+
+# Below this planted modularity the synthetic graph is close to random and the benchmark is meaningless
+MIN_PLANTED_MODULARITY = 0.3
+
+# Largest graph each slow algorithm is run on (the others run on every size)
+MAX_NODES = {
+    "girvan_newman": 1000,
+    "girvan_newman_approx": 5000,
+}
+
+METRICS = {
+    "calculate_modularity": lambda G, p: metrics.calculate_modularity(G, p),
+    "calculate_partition_stats": lambda G, p: metrics.calculate_partition_stats(G, p),
+    "calculate_bubble_metrics": lambda G, p: metrics.calculate_bubble_metrics(G, p),
+    "calculate_weighted_avg_conductance":
+        lambda G, p: metrics.calculate_weighted_avg_conductance(metrics.calculate_bubble_metrics(G, p)),
+    "calculate_weighted_avg_internal_density":
+        lambda G, p: metrics.calculate_weighted_avg_internal_density(metrics.calculate_bubble_metrics(G, p)),
+}
+
+# Graph and planted partition inherited by the forked workers
+_GRAPH = None
+_TRUTH = None
+
+def _bench_algorithm(name, seed, result_path):
+    G = _GRAPH
+    rss_start = data_loader.peak_memory_mb()
+    kwargs = {"seed": seed} if name in SEEDED else {}
+    start = time.perf_counter()
+    partition = ALGORITHMS[name](G, **kwargs)
+    elapsed = time.perf_counter() - start
+    peak = data_loader.peak_memory_mb()
+    labels = G.labels_from_partition(partition)
+    parallel.write_result(result_path, {
+        "wall_s": elapsed,
+        "rss_start_mb": rss_start,
+        "peak_rss_mb": peak,
+        "modularity": metrics.calculate_modularity(G, partition),
+        "nmi": normalized_mutual_info(labels, _TRUTH),
+        "num_communities": len(np.unique(labels)),
+    })
+
+def _bench_metric(name, result_path):
+    G = _GRAPH
+    partition = G.partition_from_labels(_TRUTH)
+    rss_start = data_loader.peak_memory_mb()
+    start = time.perf_counter()
+    METRICS[name](G, partition)
+    elapsed = time.perf_counter() - start
+    parallel.write_result(result_path, {
+        "wall_s": elapsed,
+        "rss_start_mb": rss_start,
+        "peak_rss_mb": data_loader.peak_memory_mb(),
+    })
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(sizes, names, seed=42, timeout=None):
+    """Benchmarks the given algorithms and every metric function on one synthetic graph per size."""
+    global _GRAPH, _TRUTH
+    results = []
+    work_dir = tempfile.mkdtemp()
+    for size in sizes:
+        print(f"\nGenerating synthetic graph ({size} nodes, seed {seed})...")
+        start = time.perf_counter()
+        _GRAPH, _TRUTH = planted_partition_graph(size, seed=seed)
+        graph_info = {
+            "size": size,
+            "nodes": _GRAPH.number_of_nodes(),
+            "edges": _GRAPH.number_of_edges(),
+            "planted_modularity": metrics.calculate_modularity(_GRAPH, _GRAPH.partition_from_labels(_TRUTH)),
+            "generate_s": time.perf_counter() - start,
+        }
+        print(f"{graph_info['nodes']} nodes, {graph_info['edges']} edges, "
+              f"planted modularity {graph_info['planted_modularity']:.4f}")
+        if graph_info["planted_modularity"] < MIN_PLANTED_MODULARITY:
+            raise ValueError(f"Planted partition of the {size}-node graph has modularity "
+                             f"{graph_info['planted_modularity']:.4f} < {MIN_PLANTED_MODULARITY}: "
+                             f"the graph has no community structure to benchmark")
+
+        tasks = []
+        for name in names:
+            if size > MAX_NODES.get(name, size):
+                results.append({**graph_info, "kind": "algorithm", "name": name, "status": "skipped"})
+                continue
+            tasks.append(("algorithm", name, _bench_algorithm, (name, seed)))
+        for name in METRICS:
+            tasks.append(("metric", name, _bench_metric, (name,)))
+
+        # One worker at a time, so timings and RSS are not disturbed by other benchmarks
+        for kind, name, target, args in tasks:
+            result_path = os.path.join(work_dir, f"{kind}_{name}_{size}.json")
+            status = parallel.run_in_processes([(name, target, args + (result_path,))], max_workers=1, timeout=timeout)
+            row = {**graph_info, "kind": kind, "name": name, "status": status[name]}
+            row.update(parallel.read_result(result_path) or {})
+            results.append(row)
+            if "wall_s" in row:
+                quality = f" Q={row['modularity']:.4f} NMI={row['nmi']:.4f}" if kind == "algorithm" else ""
+                print(f"{name:<42} {row['wall_s']:>9.3f} s {row['peak_rss_mb'] or 0:>9.0f} MB{quality}")
+    return results
+
+def compare(old_path, new_path):
+    """Prints the wall time and peak RSS ratios (new / old) of two benchmark result files."""
+    with open(old_path) as f:
+        old = {(r["kind"], r["name"], r["size"]): r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+    print(f"{'name':<42} {'size':>9} {'old s':>9} {'new s':>9} {'time x':>7} {'RSS x':>7}")
+    for row in new:
+        before = old.get((row["kind"], row["name"], row["size"]))
+        if not before or "wall_s" not in row or "wall_s" not in before:
+            continue
+        time_ratio = row["wall_s"] / before["wall_s"] if before["wall_s"] else float('nan')
+        rss_ratio = (row["peak_rss_mb"] or 0) / before["peak_rss_mb"] if before["peak_rss_mb"] else float('nan')
+        print(f"{row['name']:<42} {row['size']:>9} {before['wall_s']:>9.3f} {row['wall_s']:>9.3f} "
+              f"{time_ratio:>7.2f} {rss_ratio:>7.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark algorithms and metrics on synthetic graphs.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Graph sizes (nodes)")
+    parser.add_argument("--only", nargs="+", choices=sorted(ALGORITHMS), help="Algorithms to run (default: all)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=None, help="Seconds per function before it is stopped")
+    parser.add_argument("--output", help="Result file (default: results/benchmarks/bench_<commit>_<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = run_benchmarks(args.sizes, args.only or list(ALGORITHMS), seed=args.seed, timeout=args.timeout)
+
+    commit = _git_commit()
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    output = args.output or os.path.join(OUTPUT_DIR, f"bench_{commit or 'nogit'}_{timestamp}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            "commit": commit,
+            "timestamp": timestamp,
+            "seed": args.seed,
+            "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                        "numpy": np.__version__, "cpus": os.cpu_count()},
+            "results": results,
+        }, f, indent=4)
+    print(f"\nSaved benchmark results to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: cold-start time of the package and of the CLI entry point.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 7] [--target 0.25]
+
+Every command runs in a fresh interpreter (python -c / python -m), so each
+measurement includes interpreter startup and all imports, as seen from a shell.
+The median of --runs runs is reported with the heavy third-party modules the
+command ended up importing (none of them should load before a stage needs
+them). Exits with status 1 if a command's median is above --target seconds.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# Cold-start target of the commands below, in seconds (interpreter startup included)
+STARTUP_TARGET_S = 0.25
+
+HEAVY_MODULES = ["networkx", "community", "scipy", "pandas", "igraph", "leidenalg"]
+
+_REPORT = (f"import sys; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules) or '-', "
+           "file=sys.stderr)")
+
+def _cli(*argv):
+    """python -m src.main <argv>, run through runpy so the loaded modules can be reported."""
+    return ["-c", f"import runpy, sys; sys.argv = ['src.main'] + {list(argv)!r}\n"
+                  f"try:\n    runpy.run_module('src.main', run_name='__main__')\n"
+                  f"except SystemExit:\n    pass\n{_REPORT}"]
+
+COMMANDS = {
+    "python (baseline)": ["-c", "pass"],
+    "import src": ["-c", f"import src; {_REPORT}"],
+    "import src.main": ["-c", f"import src.main; {_REPORT}"],
+    "src.main --help": _cli("--help"),
+    "src.main --list-algorithms": _cli("--list-algorithms"),
+}
+
+def _time_command(args, runs):
+    times = []
+    heavy = ""
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable] + args, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, text=True, check=True)
+        times.append(time.perf_counter() - start)
+        heavy = result.stderr.strip()
+    return statistics.median(times), heavy
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--target", type=float, default=STARTUP_TARGET_S)
+    args = parser.parse_args()
+
+    print(f"{'command':<28} {'median':>9}  heavy modules loaded")
+    failed = []
+    for label, command in COMMANDS.items():
+        median, heavy = _time_command(command, args.runs)
+        print(f"{label:<28} {median:>7.3f} s  {heavy or '(not reported)'}")
+        if label.startswith("python"):
+            continue
+        if median > args.target:
+            failed.append(label)
+    if failed:
+        print(f"Above the {args.target:.2f} s target: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"All commands within the {args.target:.2f} s target.")
+
+if __name__ == "__main__":
+    main()
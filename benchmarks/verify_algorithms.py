@@ -0,0 +1,115 @@
+"""
+Check: the CSR community detection engines find the same partitions as the NetworkX
+implementations they replace, or partitions as good.
+
+Usage:
+    python -m benchmarks.verify_algorithms
+
+On Zachary's karate club (ground truth: the two clubs) and on a planted-partition
+graph (benchmarks/synthetic.py), label propagation and asynchronous label propagation
+(lpa.py, "numpy" backend) run with SEEDS against NetworkX's label_propagation_communities
+and asyn_lpa_communities. LPA is randomized and the two engines do not visit the nodes
+in the same order, so their partitions are compared statistically: the median modularity
+of the numpy backend must be within Q_TOLERANCE of NetworkX's and, on the planted graph,
+its median NMI against the planted partition within NMI_TOLERANCE. (The karate club split
+is not the best partition by modularity, four communities are, so there the NMI is only
+reported.) The median NMI between the two engines' partitions is reported too.
+
+Greedy modularity is deterministic: with tolerance=0 the cnm backend must return exactly
+the partition of NetworkX's greedy_modularity_communities, with the same modularity.
+With the tolerance of "greedy_modularity_approx" (src/main.py) its modularity must be
+within Q_TOLERANCE. Exits with status 1 on a failed check.
+"""
+import contextlib
+import io
+import sys
+import networkx as nx
+import numpy as np
+from src import algorithms, metrics
+from src.ensemble import normalized_mutual_info
+from src.graph import as_csr
+from benchmarks.synthetic import planted_partition_graph
+
+SEEDS = list(range(10))
+PLANTED_NODES = 3000
+APPROX_TOLERANCE = 1e-3
+# Largest shortfall of the median modularity / NMI of the numpy backends
+Q_TOLERANCE = 0.03
+NMI_TOLERANCE = 0.05
+
+def karate_graph():
+    """Zachary's karate club (unweighted) as a CSRGraph, and the club of every position."""
+    K = nx.karate_club_graph()
+    G = as_csr(nx.Graph(K.edges()))
+    clubs = {n: int(K.nodes[n]["club"] == "Officer") for n in K}
+    return G, G.labels_from_partition(clubs)
+
+def _quiet(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+def _scores(G, truth, partitions):
+    labels = [G.labels_from_partition(p) for p in partitions]
+    return {
+        "modularity": [metrics.calculate_modularity(G, p) for p in partitions],
+        "nmi": [normalized_mutual_info(l, truth) for l in labels],
+        "communities": [len(set(p.values())) for p in partitions],
+        "labels": labels,
+    }
+
+def check_lpa(graph_name, G, truth, func, check_nmi=True):
+    """Compares `func` (run_label_propagation or run_asyn_lpa) on both backends; returns True if it passes."""
+    results = {backend: _scores(G, truth, [_quiet(func, G, seed=seed, backend=backend) for seed in SEEDS])
+               for backend in ("numpy", "networkx")}
+    for backend, s in results.items():
+        print(f"  {func.__name__:<22} {backend:<9} median Q {np.median(s['modularity']):.4f} "
+              f"(min {np.min(s['modularity']):.4f}), median NMI {np.median(s['nmi']):.4f}, "
+              f"median communities {np.median(s['communities']):.0f}")
+    ours, reference = results["numpy"], results["networkx"]
+    cross = [normalized_mutual_info(a, b) for a, b in zip(ours["labels"], reference["labels"])]
+    print(f"  {'':<22} NMI numpy vs networkx (same seed): median {np.median(cross):.4f}")
+    ok = (np.median(ours["modularity"]) >= np.median(reference["modularity"]) - Q_TOLERANCE
+          and (not check_nmi or np.median(ours["nmi"]) >= np.median(reference["nmi"]) - NMI_TOLERANCE))
+    if not ok:
+        print(f"  MISMATCH: {func.__name__} on {graph_name} is worse than NetworkX")
+    return ok
+
+def _communities(partition):
+    groups = {}
+    for node, community in partition.items():
+        groups.setdefault(community, set()).add(node)
+    return sorted(sorted(group) for group in groups.values())
+
+def check_cnm(graph_name, G):
+    """Compares the cnm backend of run_greedy_modularity with NetworkX; returns True if it passes."""
+    reference = _quiet(algorithms.run_greedy_modularity, G, backend="networkx")
+    exact = _quiet(algorithms.run_greedy_modularity, G, backend="cnm", tolerance=0.0)
+    approx = _quiet(algorithms.run_greedy_modularity, G, backend="cnm", tolerance=APPROX_TOLERANCE)
+    q_reference, q_exact, q_approx = (metrics.calculate_modularity(G, p) for p in (reference, exact, approx))
+    same = _communities(exact) == _communities(reference)
+    print(f"  run_greedy_modularity  networkx  Q {q_reference:.6f}, {len(set(reference.values()))} communities")
+    print(f"  {'':<22} cnm       Q {q_exact:.6f}, {len(set(exact.values()))} communities, "
+          f"{'same partition' if same else 'DIFFERENT partition'}")
+    print(f"  {'':<22} cnm ~{APPROX_TOLERANCE:g}  Q {q_approx:.6f}, {len(set(approx.values()))} communities")
+    ok = same and q_exact == q_reference and q_approx >= q_reference - Q_TOLERANCE
+    if not ok:
+        print(f"  MISMATCH: run_greedy_modularity on {graph_name} differs from NetworkX")
+    return ok
+
+def main():
+    graphs = [("karate", *karate_graph(), False), ("planted", *planted_partition_graph(PLANTED_NODES), True)]
+    failed = []
+    for graph_name, G, truth, check_nmi in graphs:
+        print(f"{graph_name}: {G.number_of_nodes()} nodes, {G.number_of_edges()} edges")
+        for func in (algorithms.run_label_propagation, algorithms.run_asyn_lpa):
+            if not check_lpa(graph_name, G, truth, func, check_nmi):
+                failed.append((graph_name, func.__name__))
+        if not check_cnm(graph_name, G):
+            failed.append((graph_name, "run_greedy_modularity"))
+    if failed:
+        print(f"Failed checks: {failed}")
+        sys.exit(1)
+    print("The CSR engines match the NetworkX implementations.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Check: the streaming GML reader returns the same graph as nx.read_gml, whatever the
+chunk and batch sizes.
+
+Usage:
+    python -m benchmarks.verify_gml_reader [path/to/graph.gml]
+
+Without a path, a small directed GML graph is generated in a temporary directory, with
+the constructs that can be cut by a chunk boundary: quoted labels containing spaces,
+brackets and '#', comments, nested `graphics` lists, negative and float attributes.
+The file is read with chunk sizes down to 1 byte (every token is cut somewhere) and
+with small `batch_edges`, and the node ids, edge endpoints and kept attributes are
+compared with nx.read_gml(label='id'). Exits with status 1 on a mismatch.
+"""
+import os
+import sys
+import tempfile
+import networkx as nx
+import numpy as np
+from src import data_loader
+
+CHUNK_SIZES = [1, 2, 3, 7, 64, 4096, data_loader.GML_CHUNK_SIZE]
+BATCH_EDGES = [1, 5, 97]
+
+def _write_tricky_gml(path, num_nodes=150, seed=7):
+    rng = np.random.default_rng(seed)
+    ids = rng.permutation(10 * num_nodes)[:num_nodes] + 1
+    with open(path, 'w') as f:
+        f.write('# generated by benchmarks/verify_gml_reader.py\ngraph [\n  directed 1\n')
+        for k, n in enumerate(ids.tolist()):
+            f.write(f'  node [\n    id {n}\n    label "user {n} [#{k}]"\n'
+                    f'    score {-1.5 * k}\n    graphics [ x {k} y {-k} ]\n  ]\n')
+        seen = set()
+        for _ in range(4 * num_nodes):
+            u, v = rng.choice(ids, 2, replace=False).tolist()
+            if (u, v) in seen:
+                continue
+            seen.add((u, v))
+            f.write(f'  edge [\n    source {u}\n    target {v}  # retweet\n    weight {rng.integers(1, 9)}\n  ]\n')
+        f.write(']\n')
+
+def _reference(gml_path):
+    G = nx.read_gml(gml_path, label='id')
+    edges = list(G.edges(data=True))
+    return {
+        "node_ids": list(G.nodes()),
+        "labels": [G.nodes[n].get("label") for n in G.nodes()],
+        "sources": [u for u, _, _ in edges],
+        "targets": [v for _, v, _ in edges],
+        "weights": [d.get("weight") for _, _, d in edges],
+    }
+
+def _streamed(gml_path, chunk_size, batch_edges):
+    batches = list(data_loader.iter_gml_arrays(gml_path, batch_edges, node_attrs=["label"], edge_attrs=["weight"],
+                                               chunk_size=chunk_size, verbose=False))
+    return {
+        "node_ids": np.concatenate([b.node_ids for b in batches]).tolist(),
+        "labels": [x for b in batches for x in b.node_attrs["label"]],
+        "sources": np.concatenate([b.sources for b in batches]).tolist(),
+        "targets": np.concatenate([b.targets for b in batches]).tolist(),
+        "weights": [x for b in batches for x in b.edge_attrs["weight"]],
+    }
+
+def _same_edges(expected, got):
+    # nx.DiGraph lists edges grouped by source: compare as (source, target, weight) multisets
+    key = lambda d: sorted(zip(d["sources"], d["targets"], d["weights"]))
+    return key(expected) == key(got)
+
+def main():
+    if len(sys.argv) > 1:
+        gml_path = sys.argv[1]
+    else:
+        gml_path = os.path.join(tempfile.mkdtemp(), "tricky.gml")
+        _write_tricky_gml(gml_path)
+    expected = _reference(gml_path)
+    size = os.path.getsize(gml_path)
+    print(f"{gml_path}: {size} bytes, {len(expected['node_ids'])} nodes, {len(expected['sources'])} edges")
+
+    failed = []
+    settings = [(c, None) for c in CHUNK_SIZES]
+    settings += [(7, b) for b in BATCH_EDGES]
+    for chunk_size, batch_edges in settings:
+        got = _streamed(gml_path, chunk_size, batch_edges)
+        ok = (got["node_ids"] == expected["node_ids"] and got["labels"] == expected["labels"]
+              and _same_edges(expected, got))
+        print(f"chunk {chunk_size:>9} B, batch {batch_edges or 'all':>4}: {'ok' if ok else 'MISMATCH'}")
+        if not ok:
+            failed.append((chunk_size, batch_edges))
+    if failed:
+        print(f"Mismatches: {failed}")
+        sys.exit(1)
+    print("The streaming reader matches nx.read_gml for every chunk and batch size.")
+
+if __name__ == "__main__":
+    main()
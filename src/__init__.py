@@ -1,6 +1,36 @@
 """
 Social Network Analysis Package
+
+The public names are loaded on first access (PEP 562), so `import src` stays
+cheap and NetworkX, python-louvain or igraph are imported only by the stages
+that use them.
 """
-from .data_loader import load_graph, get_gcc
-from .algorithms import run_louvain, run_label_propagation, run_greedy_modularity, run_asyn_lpa, run_girvan_newman, run_hierarchical, run_leiden
-from .metrics import calculate_modularity, calculate_bubble_metrics
+import importlib
+
+_EXPORTS = {
+    "load_graph": "data_loader",
+    "get_gcc": "data_loader",
+    "CSRGraph": "graph",
+    "run_louvain": "algorithms",
+    "run_label_propagation": "algorithms",
+    "run_greedy_modularity": "algorithms",
+    "run_asyn_lpa": "algorithms",
+    "run_girvan_newman": "algorithms",
+    "run_girvan_newman_approx": "algorithms",
+    "run_hierarchical": "algorithms",
+    "run_leiden": "algorithms",
+    "calculate_modularity": "metrics",
+    "calculate_bubble_metrics": "metrics",
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
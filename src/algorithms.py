@@ -1,15 +1,165 @@
-import networkx as nx
-import community as community_louvain
+import random
+from contextlib import contextmanager
+import numpy as np
+from .graph import CSRGraph, as_networkx, as_csr
+from .instrument import timed
+from . import cnm, lpa
 
-def run_louvain(G):
-    """Runs the Louvain algorithm for community detection."""
-    print("Running Louvain Algorithm...")
-    partition = community_louvain.best_partition(G)
-    return partition
+# Louvain backend: "igraph" (native multilevel, built from the CSR edge arrays)
+# or "python-louvain" (pure Python, the original implementation)
+LOUVAIN_BACKEND = "igraph"
+# Leiden backend: "leidenalg" (the original implementation) or "igraph" (native C community_leiden)
+LEIDEN_BACKEND = "leidenalg"
+# Label propagation backend: "numpy" (lpa.py, vectorized over the CSR arrays)
+# or "networkx" (pure Python, the original implementation)
+LPA_BACKEND = "numpy"
+# Greedy modularity backend: "cnm" (cnm.py, heap-based CNM over the CSR arrays)
+# or "networkx" (pure Python, the original implementation)
+GREEDY_BACKEND = "cnm"
+
+def _to_igraph(G):
+    """
+    Returns (CSRGraph, igraph.Graph, weights attribute or None) for G.
+    NetworkX graphs keep their 'weight' edge attribute if every edge has one.
+    The igraph object is cached on the CSRGraph, so it is built once per graph.
+    """
+    if not isinstance(G, CSRGraph):
+        print("  Converting NetworkX graph to CSR...")
+        G = as_csr(G, weight=_weight_attr(G))
+    H = G.to_igraph()
+    return G, H, ('weight' if G.weights is not None else None)
+
+def _weight_attr(G):
+    """'weight' if every edge of the NetworkX graph G has a weight (retweet counts), else None."""
+    import networkx as nx
+    return 'weight' if nx.is_weighted(G) else None
+
+@contextmanager
+def _igraph_seed(seed):
+    """Seeds igraph's random number generator (Python's `random` by default) for the duration of a call."""
+    if seed is None:
+        yield
+        return
+    import igraph
+    igraph.set_random_number_generator(random.Random(seed))
+    try:
+        yield
+    finally:
+        igraph.set_random_number_generator(random)
+
+def _initial_membership(G, initial_partition):
+    """
+    Label array (0..k-1, aligned with G's positions) to warm-start from `initial_partition`
+    ({node_id: community_id}); nodes it does not cover start in their own community.
+    """
+    labels = G.labels_from_partition(initial_partition, missing=-1)
+    missing = labels < 0
+    labels[missing] = labels.max(initial=-1) + 1 + np.arange(np.count_nonzero(missing))
+    return np.unique(labels, return_inverse=True)[1]
+
+def _louvain_from(H, weights, resolution, seed, initial):
+    """
+    Louvain on igraph graph H with leidenalg, starting from the `initial` membership:
+    local moving of the nodes, then of the communities of each aggregate graph, until no
+    move improves the quality (Louvain is Leiden without the refinement step).
+
+    Returns:
+        list: Membership of each igraph vertex.
+    """
+    import leidenalg
+    if resolution == 1.0:
+        partition = leidenalg.ModularityVertexPartition(H, weights=weights, initial_membership=initial)
+    else:
+        partition = leidenalg.RBConfigurationVertexPartition(H, weights=weights, initial_membership=initial,
+                                                             resolution_parameter=resolution)
+    optimiser = leidenalg.Optimiser()
+    if seed is not None:
+        optimiser.set_rng_seed(seed)
+    optimiser.move_nodes(partition)
+    aggregate = partition.aggregate_partition()
+    while optimiser.move_nodes(aggregate) > 0:
+        partition.from_coarse_partition(aggregate)
+        aggregate = aggregate.aggregate_partition()
+    return partition.membership
+
+@timed()
+def run_louvain(G, resolution=1.0, seed=None, backend=None, initial_partition=None):
+    """
+    Runs the Louvain algorithm for community detection.
+
+    Args:
+        G: nx.Graph or CSRGraph
+        resolution (float): Modularity resolution (1.0 = classic modularity).
+        seed (int): Random seed for reproducible runs.
+        backend (str): "igraph" or "python-louvain" (default: LOUVAIN_BACKEND).
+        initial_partition (dict): Partition to start from (warm start). igraph's multilevel
+            cannot start from a partition, so the igraph backend runs the warm start with
+            leidenalg's local moving and aggregation instead (the same Louvain steps); without
+            leidenalg it warns and falls back to python-louvain.
+    """
+    backend = backend or LOUVAIN_BACKEND
+    print(f"Running Louvain Algorithm ({backend})...")
+    if backend == "igraph":
+        try:
+            import igraph
+            if initial_partition is not None:
+                import leidenalg
+        except ImportError:
+            print("Warning: igraph (or leidenalg, for warm starts) not installed, falling back to python-louvain.")
+            backend = "python-louvain"
+
+    if backend == "python-louvain":
+        if initial_partition is not None:
+            G = as_csr(G)
+            initial_partition = G.partition_from_labels(_initial_membership(G, initial_partition))
+        import community as community_louvain
+        G = as_networkx(G)
+        partition = community_louvain.best_partition(G, partition=initial_partition,
+                                                     resolution=resolution, random_state=seed)
+        return partition
 
-def run_label_propagation(G):
-    """Runs the Label Propagation algorithm."""
-    print("Running Label Propagation Algorithm...")
+    G, H, weights = _to_igraph(G)
+    if initial_partition is not None:
+        membership = _louvain_from(H, weights, resolution, seed, _initial_membership(G, initial_partition).tolist())
+        return G.partition_from_labels(np.asarray(membership))
+    with _igraph_seed(seed):
+        clustering = H.community_multilevel(weights=weights, resolution=resolution)
+    return G.partition_from_labels(np.asarray(clustering.membership))
+
+@timed()
+def run_label_propagation(G, seed=None, backend=None, max_iter=100, tol=0.0, workers=1):
+    """
+    Runs the (semi-synchronous) Label Propagation algorithm.
+
+    Args:
+        G: nx.Graph or CSRGraph
+        seed (int): Random seed for reproducible runs.
+        backend (str): "numpy" (lpa.label_propagation over the CSR arrays, weighted if G
+            has edge weights) or "networkx" (the original implementation, unweighted).
+        max_iter, tol, workers: Convergence control and threads of the numpy backend
+            (see lpa.label_propagation).
+
+    NetworkX's semi-synchronous LPA is deterministic for a given node order, so there a
+    `seed` shuffles the node order (initial labels and tie-breaking) instead.
+    """
+    backend = backend or LPA_BACKEND
+    print(f"Running Label Propagation Algorithm ({backend})...")
+    if backend == "numpy":
+        G = as_csr(G, weight=_weight_attr(G) if not isinstance(G, CSRGraph) else None)
+        labels, _ = lpa.label_propagation(G, seed=seed, max_iter=max_iter, tol=tol, workers=workers)
+        return G.partition_from_labels(labels)
+
+    import networkx as nx
+    G = as_networkx(G)
+    if _weight_attr(G):
+        print("  Note: label_propagation_communities ignores edge weights.")
+    if seed is not None:
+        nodes = list(G.nodes())
+        random.Random(seed).shuffle(nodes)
+        G_shuffled = nx.Graph()
+        G_shuffled.add_nodes_from(nodes)
+        G_shuffled.add_edges_from(G.edges(data=True))
+        G = G_shuffled
     # returns a generator of sets of nodes
     communities_generator = nx.algorithms.community.label_propagation_communities(G)
     partition = {}
@@ -18,29 +168,73 @@ def run_label_propagation(G):
             partition[node] = i
     return partition
 
-def run_greedy_modularity(G):
-    """Runs the Greedy Modularity algorithm (Clauset-Newman-Moore)."""
-    print("Running Greedy Modularity Algorithm (this might be slow)...")
+@timed()
+def run_greedy_modularity(G, resolution=1.0, n_communities=None, tolerance=0.0, backend=None):
+    """
+    Runs the Greedy Modularity algorithm (Clauset-Newman-Moore), weighted if G has edge weights.
+
+    Args:
+        G: nx.Graph or CSRGraph
+        resolution (float): Modularity resolution (1.0 = classic modularity).
+        n_communities (int): Stop merging as soon as this many communities are left.
+        tolerance (float): Relative ΔQ tolerance of the cnm backend's merges (0 = exact CNM,
+            see cnm.greedy_modularity).
+        backend (str): "cnm" (cnm.greedy_modularity over the CSR arrays) or "networkx"
+            (the original implementation). Default: GREEDY_BACKEND.
+    """
+    backend = backend or GREEDY_BACKEND
+    print(f"Running Greedy Modularity Algorithm ({backend})...")
+    if backend == "cnm":
+        G = as_csr(G, weight=_weight_attr(G) if not isinstance(G, CSRGraph) else None)
+        labels, _ = cnm.greedy_modularity(G, resolution=resolution, n_communities=n_communities,
+                                          tolerance=tolerance)
+        return G.partition_from_labels(labels)
+
+    print("  (this might be slow)")
+    import networkx as nx
+    G = as_networkx(G)
     # returns a list of sets of nodes
-    communities_list = nx.algorithms.community.greedy_modularity_communities(G)
+    communities_list = nx.algorithms.community.greedy_modularity_communities(
+        G, weight=_weight_attr(G), resolution=resolution, cutoff=n_communities or 1)
     partition = {}
     for i, comm in enumerate(communities_list):
         for node in comm:
             partition[node] = i
     return partition
 
-def run_asyn_lpa(G):
-    """Runs the Asynchronous Label Propagation Algorithm."""
-    print("Running Asynchronous Label Propagation Algorithm...")
+@timed()
+def run_asyn_lpa(G, seed=None, backend=None, max_iter=100, tol=0.0, workers=1):
+    """
+    Runs the Asynchronous Label Propagation Algorithm, weighted if G has edge weights.
+
+    Args:
+        G: nx.Graph or CSRGraph
+        seed (int): Random seed for reproducible runs.
+        backend (str): "numpy" or "networkx" (default: LPA_BACKEND). The numpy backend
+            updates the colour classes of lpa.label_propagation in a new random order
+            every pass: nodes of a class are not adjacent, so updating a class at once
+            is the same as updating its nodes one after the other.
+        max_iter, tol, workers: Convergence control and threads of the numpy backend.
+    """
+    backend = backend or LPA_BACKEND
+    print(f"Running Asynchronous Label Propagation Algorithm ({backend})...")
+    if backend == "numpy":
+        G = as_csr(G, weight=_weight_attr(G) if not isinstance(G, CSRGraph) else None)
+        labels, _ = lpa.label_propagation(G, seed=seed, max_iter=max_iter, tol=tol,
+                                          shuffle=True, workers=workers)
+        return G.partition_from_labels(labels)
+
+    import networkx as nx
+    G = as_networkx(G)
     # returns a generator of sets of nodes
-    # weight=None to treat as unweighted, or specify weight string
-    communities_generator = nx.algorithms.community.asyn_lpa_communities(G)
+    communities_generator = nx.algorithms.community.asyn_lpa_communities(G, weight=_weight_attr(G), seed=seed)
     partition = {}
     for i, comm in enumerate(communities_generator):
         for node in comm:
             partition[node] = i
     return partition
 
+@timed()
 def run_girvan_newman(G):
     """
     Runs the Girvan-Newman algorithm.
@@ -48,6 +242,8 @@ def run_girvan_newman(G):
     It iterates to find the partition with the highest modularity.
     """
     print("Running Girvan-Newman Algorithm (WARNING: This is extremely slow)...")
+    import networkx as nx
+    G = as_networkx(G)
     if G.number_of_edges() > 10000:
         print(f"WARNING: Graph has {G.number_of_edges()} edges. Girvan-Newman might take days.")
     
@@ -96,123 +292,262 @@ def run_girvan_newman(G):
 
     return best_partition_map if best_partition_map else {}
 
-def run_hierarchical(G, base_algo_func=run_louvain, meta_algo_func=run_greedy_modularity):
+@timed()
+def run_girvan_newman_approx(G, k_pivots=32, max_levels=20, seed=None, workers=None):
+    """
+    Runs a divisive Girvan-Newman with approximate, incrementally updated edge betweenness.
+
+    - Edge betweenness is estimated from `k_pivots` sampled sources per component (k-pivot Brandes,
+      vectorized sweeps; see betweenness.SampledEdgeBetweenness), spread over `workers` processes
+      (default: every CPU, or 1 inside a parallel algorithm worker; 1 = in this process).
+    - Removing an edge only re-runs the sweeps whose shortest-path DAG used it. Whether the
+      component split is found by two BFS from the edge's endpoints that stop as soon as they
+      meet; after a split both halves get `k_pivots` sweeps of their own.
+    - Modularity (on the original graph) is updated incrementally: a split only replaces the
+      term of the split community by the terms of its two halves, from the edges of the
+      smaller half.
+
+    Like run_girvan_newman, it stops after `max_levels` splits and returns the best-modularity partition.
+    Edge weights are ignored for the betweenness (unweighted shortest paths) but used for the modularity.
+    The result does not depend on `workers`.
+    """
+    print("Running approximate Girvan-Newman Algorithm...")
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import connected_components
+    from .betweenness import SampledEdgeBetweenness, default_workers
+
+    if not isinstance(G, CSRGraph):
+        G = as_csr(G, weight=_weight_attr(G))
+    u, v, w = G.edge_array()
+    if len(u) == 0:
+        return G.partition_from_labels(np.arange(G.number_of_nodes()))
+    rng = np.random.default_rng(seed)
+    w = np.ones(len(u)) if w is None else np.asarray(w, dtype=np.float64)
+    m = w.sum()
+    degrees = G.strengths()
+    entry_weights = np.ones(len(G.indices)) if G.weights is None else np.asarray(G.weights, dtype=np.float64)
+
+    adjacency = csr_matrix((np.ones(len(G.indices), dtype=np.int8), G.indices, G.indptr))
+    num_comps, comp = connected_components(adjacency, directed=False)
+    del adjacency
+
+    # Modularity term of every community: internal_weight / m - (strength_sum / 2m)^2
+    same = comp[u] == comp[v]
+    internal = np.bincount(comp[u[same]], weights=w[same], minlength=num_comps).tolist()
+    strength = np.bincount(comp, weights=degrees, minlength=num_comps).tolist()
+    order = np.argsort(comp, kind='stable')
+    members = np.split(order, np.cumsum(np.bincount(comp, minlength=num_comps))[:-1])
+
+    def term(c):
+        return internal[c] / m - (strength[c] / (2 * m)) ** 2
+
+    workers = default_workers() if workers is None else workers
+    sampler = SampledEdgeBetweenness(G, workers=workers)
+    pivots = []      # Pivots of every component
+    scale = []       # Estimate scale of every component: size / (2 * number of pivots)
+    # Betweenness estimate of every alive edge (-1 once removed)
+    estimate = np.zeros(len(u), dtype=np.float64)
+
+    def update_estimates(eids):
+        # Repeated edge ids are written the same value
+        estimate[eids] = np.where(sampler.alive[eids], sampler.totals[eids] * np.take(scale, comp[u[eids]]), -1.0)
+
+    def sample_pivots(c, keep=()):
+        """Pivots of component c: `keep` plus new samples up to min(k_pivots, size)."""
+        keep = [p for p in keep]
+        k = min(k_pivots, len(members[c]))
+        if len(keep) < k:
+            candidates = np.setdiff1d(members[c], keep, assume_unique=True)
+            keep += rng.choice(candidates, size=k - len(keep), replace=False).tolist()
+        return keep[:k]
+
+    try:
+        for c in range(num_comps):
+            pivots.append(sample_pivots(c))
+            scale.append(len(members[c]) / (2 * len(pivots[c])))
+        update_estimates(sampler.add_sweeps([p for ps in pivots for p in ps]))
+
+        modularity = sum(term(c) for c in range(num_comps))
+        best_modularity = modularity
+        best_comp = comp.copy()
+        levels = 0
+
+        while levels < max_levels:
+            e = int(np.argmax(estimate))
+            if estimate[e] < 0:
+                break  # No edges left
+            sampler.remove_edge(e)
+            estimate[e] = -1.0
+            c = int(comp[u[e]])
+
+            side = sampler.separated(int(u[e]), int(v[e]))
+            if side is None:
+                stale = sampler.sweeps_using(e, pivots[c])
+                changed = sampler.drop_sweeps(stale)
+                update_estimates(np.concatenate([changed, sampler.add_sweeps(stale)]))
+                continue
+
+            # The component split: the side found by the search becomes a new community
+            new_c = len(pivots)
+            comp[side] = new_c
+            offsets, rows = G.entries_of(side)
+            cols = np.asarray(G.indices[offsets])
+            weights = entry_weights[offsets]
+            inside = comp[cols] == new_c
+            # Entries list every edge from both ends, self-loops once
+            side_internal = (weights[inside].sum() + weights[inside & (rows == cols)].sum()) / 2
+            cut = weights[comp[cols] == c].sum()
+            internal[c] -= side_internal + cut
+            internal.append(side_internal)
+            side_strength = degrees[side].sum()
+            strength[c] -= side_strength
+            strength.append(side_strength)
+            members.append(side)
+            members[c] = members[c][comp[members[c]] == c]
+
+            # The removed edge was a bridge: the sweeps of the pivots left in c only lose the
+            # new community, those of the pivots inside it are re-run there (it is the side
+            # the search ran out on, usually the smaller one)
+            near = int(u[e]) if comp[u[e]] == c else int(v[e])
+            kept = [p for p in pivots[c] if comp[p] == c]
+            moved = [p for p in pivots[c] if comp[p] == new_c]
+            sampler.cut_off(kept, near, side)
+            sampler.drop_sweeps(moved)
+            pivots[c] = sample_pivots(c, kept)
+            pivots.append(sample_pivots(new_c, moved))
+            sampler.add_sweeps(pivots[c][len(kept):] + pivots[new_c])
+            scale[c] = len(members[c]) / (2 * len(pivots[c]))
+            scale.append(len(side) / (2 * len(pivots[new_c])))
+            # The scale of both communities changed: refresh every estimate in them
+            update_estimates(sampler.entry_eid[G.entries_of(np.concatenate([members[c], side]))[0]])
+
+            modularity = sum(term(k) for k in range(len(pivots)))
+            levels += 1
+            print(f"  GN (approx): Found {len(pivots)} communities, Modularity: {modularity:.4f}")
+
+            if modularity > best_modularity:
+                best_modularity = modularity
+                best_comp = comp.copy()
+    finally:
+        sampler.close()
+
+    return G.partition_from_labels(np.unique(best_comp, return_inverse=True)[1])
+
+def _dense_labels(G, partition):
+    """Label array aligned with G's positions, renumbered to 0..k-1."""
+    return np.unique(G.labels_from_partition(partition), return_inverse=True)[1]
+
+@timed()
+def run_hierarchical(G, base_algo_func=run_louvain, meta_algo_func=run_greedy_modularity, levels=1, return_dendrogram=False):
     """
     Runs a hierarchical community detection strategy (Coarsening).
     1. Run base_algo (e.g., Louvain) to get micro-communities.
-    2. Build a Quotient Graph where nodes are the micro-communities.
-    3. Run meta_algo (e.g., Greedy Modularity) on the Quotient Graph.
-    4. Map results back to original nodes.
+    2. Build a Quotient Graph where nodes are the micro-communities
+       (weighted, with self-loops holding the internal weight, so modularity is preserved).
+    3. Repeat base_algo + quotient for `levels - 1` further coarsening levels.
+    4. Run meta_algo (e.g., Greedy Modularity) on the last Quotient Graph.
+    5. Map results back to original nodes.
+
+    Returns:
+        dict: Final partition {node: community}. If `return_dendrogram` is True, returns
+        (partition, dendrogram) where the dendrogram lists one partition per level,
+        from the base micro-communities to the final meta communities.
     """
     print("Running Hierarchical Strategy...")
+    if not isinstance(G, CSRGraph):
+        G = as_csr(G, weight=_weight_attr(G))
     
-    # Step 1: Base Partition
-    print("  Step 1: Running base algorithm (Louvain) for micro-communities...")
-    base_partition = base_algo_func(G)
+    # Step 1: Base Partition (labels[i] = micro-community of position i, renumbered 0..k-1)
+    print("  Step 1: Running base algorithm for micro-communities...")
+    labels = _dense_labels(G, base_algo_func(G))
+    dendrogram = [labels]
     
-    # Step 2: Build Quotient Graph
+    # Step 2: Build Quotient Graph by vectorized label aggregation
     print("  Step 2: Building Quotient Graph...")
-    # Create a mapping from community_id to list of nodes
-    comm_to_nodes = {}
-    for node, comm_id in base_partition.items():
-        if comm_id not in comm_to_nodes:
-            comm_to_nodes[comm_id] = []
-        comm_to_nodes[comm_id].append(node)
-    
-    # Create the quotient graph
-    # Nodes are community IDs
-    # Edges are weighted by the number of edges between communities in the original graph
-    Q = nx.Graph()
-    Q.add_nodes_from(comm_to_nodes.keys())
-    
-    # Iterate over original edges to build quotient edges
-    # This can be slow, so we iterate carefully
-    # Optimization: Iterate over edges of G, map endpoints to comms, add to Q
-    
-    edge_weights = {}
-    
-    for u, v in G.edges():
-        c_u = base_partition[u]
-        c_v = base_partition[v]
-        
-        if c_u != c_v:
-            pair = tuple(sorted((c_u, c_v)))
-            edge_weights[pair] = edge_weights.get(pair, 0) + 1
-            
-    for (c1, c2), weight in edge_weights.items():
-        Q.add_edge(c1, c2, weight=weight)
-        
+    Q = G.quotient(labels)
     print(f"  Quotient Graph built: {Q.number_of_nodes()} super-nodes, {Q.number_of_edges()} edges.")
     
-    # Step 3: Meta Algorithm
-    print(f"  Step 3: Running meta algorithm on Quotient Graph...")
-    # Note: Meta algo must handle weighted graphs if possible, or we treat as unweighted
-    # Greedy modularity in networkx handles weights if 'weight' attr is present?
-    # nx.algorithms.community.greedy_modularity_communities uses 'weight' param
-    
-    # We need to wrap the meta algo call because our wrappers might not expose weight param
-    # But our wrappers take G. If G has 'weight' edge attributes, some algos use it.
-    # Let's assume meta_algo_func is one of our wrappers.
-    
-    # Special handling if meta_algo is greedy_modularity to ensure it uses weights if available
-    # Actually our run_greedy_modularity just calls nx...greedy_modularity_communities(G)
-    # which defaults to weight='weight'. So we are good if we set 'weight' attr.
-    
-    meta_partition = meta_algo_func(Q)
+    # Step 3: Further coarsening levels
+    for level in range(2, levels + 1):
+        print(f"  Step 3: Coarsening level {level} with the base algorithm...")
+        q_labels = _dense_labels(Q, base_algo_func(Q))
+        if q_labels.max() + 1 == Q.number_of_nodes():
+            print("  No further coarsening possible, stopping early.")
+            break
+        # Map back: original position -> super-node -> new community
+        labels = q_labels[labels]
+        dendrogram.append(labels)
+        Q = Q.quotient(q_labels)
+        print(f"  Quotient Graph built: {Q.number_of_nodes()} super-nodes, {Q.number_of_edges()} edges.")
     
-    # Step 4: Map back
-    print("  Step 4: Mapping back to original nodes...")
-    final_partition = {}
+    # Step 4: Meta Algorithm on the last Quotient Graph (weighted, self-loops included)
+    print("  Step 4: Running meta algorithm on Quotient Graph...")
+    q_labels = _dense_labels(Q, meta_algo_func(Q))
+    labels = q_labels[labels]
+    dendrogram.append(labels)
     
-    for comm_id, meta_comm_id in meta_partition.items():
-        # comm_id is the node in Q (which is a community in G)
-        # meta_comm_id is the new community ID assigned to this super-node
-        
-        # Assign all original nodes in this micro-community to the new meta-community
-        for node in comm_to_nodes[comm_id]:
-            final_partition[node] = meta_comm_id
-            
+    # Step 5: Map back to original nodes
+    print("  Step 5: Mapping back to original nodes...")
+    final_partition = G.partition_from_labels(dendrogram[-1])
+    if return_dendrogram:
+        return final_partition, [G.partition_from_labels(l) for l in dendrogram]
     return final_partition
 
-def run_leiden(G):
-    """Runs the Leiden algorithm."""
-    print("Running Leiden Algorithm...")
+@timed()
+def run_leiden(G, resolution=1.0, seed=None, backend=None, initial_partition=None, n_iterations=-1, directed=False):
+    """
+    Runs the Leiden algorithm.
+
+    Args:
+        G: nx.Graph or CSRGraph
+        resolution (float): Modularity resolution (1.0 = classic modularity).
+        seed (int): Random seed for reproducible runs.
+        backend (str): "leidenalg" or "igraph" (default: LEIDEN_BACKEND).
+        initial_partition (dict): Partition to start from (warm start), e.g. the previous
+            time window's.
+        n_iterations (int): Leiden iterations (-1 = until convergence). From a good initial
+            partition one or two iterations are usually enough.
+        directed (bool): Optimize directed modularity on the retweet arcs (`G.arcs`, see
+            data_loader.load_gcc). Only leidenalg supports it; otherwise the undirected graph is used.
+    """
+    backend = backend or LEIDEN_BACKEND
+    print(f"Running Leiden Algorithm ({backend})...")
     try:
-        import leidenalg
         import igraph
+        if backend == "leidenalg":
+            import leidenalg
     except ImportError:
         print("Error: leidenalg or igraph not installed. Please run 'pip install leidenalg igraph'.")
         return {}
 
-    # Convert NetworkX graph to igraph
-    # This can be memory intensive
-    print("  Converting NetworkX graph to igraph...")
-    
-    # Mapping: NetworkX nodes can be anything (int, str). igraph nodes are 0-indexed ints.
-    # We need to map back.
-    nodes = list(G.nodes())
-    node_map = {node: i for i, node in enumerate(nodes)}
-    reverse_map = {i: node for i, node in enumerate(nodes)}
-    
-    # Create igraph
-    # Edges as list of tuples (mapped)
-    # Efficiently create edges list
-    edges = [(node_map[u], node_map[v]) for u, v in G.edges()]
-    
-    H = igraph.Graph(n=len(nodes), edges=edges, directed=G.is_directed())
+    # igraph is built straight from the CSR edge arrays (igraph nodes are 0-indexed positions)
+    G, H, weights = _to_igraph(G)
+    if directed:
+        if backend == "leidenalg" and G.arcs is not None:
+            H, weights = G.to_igraph(directed=True), 'weight'
+        else:
+            print("  Warning: directed Leiden needs leidenalg and a graph loaded with directed=True; "
+                  "using the undirected graph.")
+    initial = _initial_membership(G, initial_partition).tolist() if initial_partition is not None else None
     
     # Run Leiden
-    # partition_type=leidenalg.ModularityVertexPartition usually for modularity maximization
     print("  Executing Leiden...")
-    # n_iterations=-1 runs until convergence
-    partition = leidenalg.find_partition(H, leidenalg.ModularityVertexPartition, n_iterations=-1)
+    if backend == "igraph":
+        with _igraph_seed(seed):
+            clustering = H.community_leiden(objective_function="modularity", weights=weights,
+                                            resolution=resolution, n_iterations=n_iterations,
+                                            initial_membership=initial)
+        membership = clustering.membership
+    elif resolution == 1.0:
+        # ModularityVertexPartition for classic modularity, RBConfiguration when a resolution is given
+        membership = leidenalg.find_partition(H, leidenalg.ModularityVertexPartition,
+                                              initial_membership=initial,
+                                              weights=weights, n_iterations=n_iterations, seed=seed).membership
+    else:
+        membership = leidenalg.find_partition(H, leidenalg.RBConfigurationVertexPartition,
+                                              initial_membership=initial,
+                                              weights=weights, n_iterations=n_iterations, seed=seed,
+                                              resolution_parameter=resolution).membership
     
-    # Map back results
-    final_partition = {}
-    # partition is a VertexClustering object, iterable yields lists of node indices
-    for i, cluster_nodes in enumerate(partition):
-        for node_idx in cluster_nodes:
-            original_node = reverse_map[node_idx]
-            final_partition[original_node] = i
-            
-    return final_partition
+    # Map back results: membership[i] is the community of position i
+    return G.partition_from_labels(np.asarray(membership))
@@ -0,0 +1,264 @@
+import multiprocessing as mp
+import os
+import numpy as np
+
+# Sampler shared with the pool workers (inherited through fork, never pickled)
+_WORKER_SAMPLER = None
+
+def _init_worker(sampler):
+    global _WORKER_SAMPLER
+    _WORKER_SAMPLER = sampler
+
+def _worker_sweep(source):
+    return _WORKER_SAMPLER._sweep(source)
+
+def default_workers():
+    """Processes for the betweenness sweeps: every CPU, or 1 inside a worker process (no nested pools)."""
+    return 1 if mp.parent_process() is not None else (os.cpu_count() or 1)
+
+def entry_edge_ids(G):
+    """Edge id (index in G.edge_array()) of every stored CSR entry; both directions map to the same id."""
+    n = G.number_of_nodes()
+    u, v, _ = G.edge_array()
+    rows = G._row_of_entries().astype(np.int64)
+    cols = np.asarray(G.indices, dtype=np.int64)
+    edge_keys = u.astype(np.int64) * n + v
+    entry_keys = np.minimum(rows, cols) * n + np.maximum(rows, cols)
+    return np.searchsorted(edge_keys, entry_keys)
+
+def _first_occurrences(nodes, slot):
+    """`nodes` without repeats (first occurrences, in order); `slot` is a scratch int array over all nodes."""
+    positions = np.arange(len(nodes))
+    slot[nodes[::-1]] = positions[::-1]
+    return nodes[slot[nodes] == positions]
+
+def source_dependencies(G, s, entry_eid, alive=None):
+    """
+    Brandes sweep from `s`: every BFS level is a few NumPy operations over the entries of
+    the frontier, and the dependencies are accumulated back level by level, so a sweep is
+    O(m) array work instead of O(m) Python steps. Only edges with `alive[edge id]` are
+    followed (all of them if `alive` is None).
+
+    Returns:
+        tuple: (sorted edge ids of the shortest-path DAG of `s`, their dependencies,
+        BFS distance of every node (-1 if not reached), number of shortest paths to every node)
+    """
+    n = G.number_of_nodes()
+    indices = G.indices
+    dist = np.full(n, -1, dtype=np.int32)
+    sigma = np.zeros(n, dtype=np.float64)
+    slot = np.empty(n, dtype=np.int64)
+    dist[s] = 0
+    sigma[s] = 1.0
+    frontier = np.array([s], dtype=np.int64)
+    levels = []
+    depth = 0
+    while len(frontier):
+        offsets, v = G.entries_of(frontier)
+        if alive is not None:
+            followed = alive[entry_eid[offsets]]
+            offsets, v = offsets[followed], v[followed]
+        w = np.asarray(indices[offsets])
+        fresh = w[dist[w] < 0]
+        dist[fresh] = depth + 1
+        # Shortest-path DAG edges from this level to the next
+        dag = dist[w] == depth + 1
+        v, w, e = v[dag], w[dag], entry_eid[offsets[dag]]
+        sigma += np.bincount(w, weights=sigma[v], minlength=n)
+        levels.append((v, w, e))
+        frontier = _first_occurrences(fresh, slot)
+        depth += 1
+    delta = np.zeros(n, dtype=np.float64)
+    eids, values = [], []
+    for v, w, e in reversed(levels):
+        c = sigma[v] / sigma[w] * (1.0 + delta[w])
+        eids.append(e)
+        values.append(c)
+        delta += np.bincount(v, weights=c, minlength=n)
+    # An edge joins consecutive levels in one direction only: every DAG edge appears once
+    eids = np.concatenate(eids) if eids else np.zeros(0, dtype=np.int64)
+    values = np.concatenate(values) if values else np.zeros(0, dtype=np.float64)
+    order = np.argsort(eids)
+    return eids[order], values[order], dist, sigma
+
+def sweep_edge_betweenness(G, sources, scale=1.0, entry_eid=None, alive=None):
+    """
+    Edge betweenness summed over BFS sweeps from `sources` (k-pivot Brandes), multiplied by
+    `scale`, following only the edges with `alive[edge id]` (all if `alive` is None).
+
+    Returns:
+        np.ndarray: Betweenness estimate for every edge id (index in G.edge_array()).
+    """
+    if entry_eid is None:
+        entry_eid = entry_edge_ids(G)
+    num_edges = len(G.edge_array()[0])
+    result = np.zeros(num_edges, dtype=np.float64)
+    for s in sources:
+        eids, values, _, _ = source_dependencies(G, s, entry_eid, alive)
+        result += np.bincount(eids, weights=values, minlength=num_edges)
+    return result * scale
+
+class SampledEdgeBetweenness:
+    """
+    Sampled edge betweenness (k-pivot Brandes) of a graph whose edges are removed one at a time.
+
+    The sweep of every pivot (the edge ids of its shortest-path DAG, their dependencies,
+    and the distances and path counts from the pivot) is kept, and `totals` holds their sum
+    per edge. Removing an edge changes no shortest path from a pivot whose DAG does not use
+    it, so only the sweeps that used the edge (`sweeps_using`) are dropped and recomputed;
+    removing a bridge only cuts off the far side (`cut_off`). Sweeps are vectorized
+    (source_dependencies) and, with `workers > 1`, spread over a fork-based process pool
+    created once here; the alive-edge mask lives in shared memory, so removals made by the
+    parent are visible to the workers without copying.
+
+    Edges are identified by their index in `G.edge_array()`.
+    """
+
+    def __init__(self, G, workers=1):
+        self.G = G
+        self.entry_eid = entry_edge_ids(G)
+        self.u, self.v, _ = G.edge_array()
+        self.num_edges = len(self.u)
+        self.alive_buffer = mp.RawArray('b', self.num_edges)
+        self.alive = np.frombuffer(self.alive_buffer, dtype=np.bool_)
+        self.alive[:] = True
+        self.totals = np.zeros(self.num_edges, dtype=np.float64)
+        self.sweeps = {}  # pivot -> (sorted edge ids, dependencies, distances, path counts)
+        # Scratch arrays over the nodes, reset after every use
+        n = G.number_of_nodes()
+        self._side = np.zeros(n, dtype=np.int8)   # BFS side in `separated` (0 = not visited)
+        self._far = np.zeros(n, dtype=bool)       # Nodes cut off in `cut_off`
+        self._flow = np.zeros(n, dtype=np.float64)
+        self._slot = np.empty(n, dtype=np.int64)
+
+        self.workers = max(1, workers or 1)
+        self._pool = None
+        if self.workers > 1 and "fork" in mp.get_all_start_methods():
+            self._pool = mp.get_context("fork").Pool(self.workers, initializer=_init_worker, initargs=(self,))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def _sweep(self, source):
+        return source_dependencies(self.G, source, self.entry_eid, self.alive)
+
+    def remove_edge(self, eid):
+        self.alive[eid] = False
+
+    def add_sweeps(self, pivots):
+        """
+        Sweeps from `pivots` over the alive edges and adds them to `totals`.
+
+        Returns:
+            np.ndarray: Edge ids whose total changed.
+        """
+        pivots = [int(p) for p in pivots]
+        if self._pool is not None and len(pivots) > 1:
+            results = self._pool.map(_worker_sweep, pivots)
+        else:
+            results = [self._sweep(p) for p in pivots]
+        for p, sweep in zip(pivots, results):
+            self.sweeps[p] = sweep
+            self.totals[sweep[0]] += sweep[1]
+        return np.concatenate([sweep[0] for sweep in results]) if results else np.zeros(0, dtype=np.int64)
+
+    def drop_sweeps(self, pivots):
+        """Removes the sweeps of `pivots` from `totals`; returns the edge ids whose total changed."""
+        changed = []
+        for p in pivots:
+            eids, values, _, _ = self.sweeps.pop(int(p))
+            self.totals[eids] -= values
+            changed.append(eids)
+        return np.concatenate(changed) if changed else np.zeros(0, dtype=np.int64)
+
+    def sweeps_using(self, eid, pivots):
+        """The pivots (among `pivots`) whose shortest-path DAG uses edge `eid`."""
+        used = []
+        for p in pivots:
+            eids = self.sweeps[int(p)][0]
+            i = np.searchsorted(eids, eid)
+            if i < len(eids) and eids[i] == eid:
+                used.append(p)
+        return used
+
+    def cut_off(self, pivots, a, far):
+        """
+        Updates the sweeps of `pivots` after the removal of the bridge that joined node `a`
+        (on the pivots' side) to the nodes `far`. Shortest paths between the nodes left are
+        unchanged: the DAG edges into `far` are dropped, and the len(far) units of dependency
+        that went through `a` are taken back from the edges between each pivot and `a`,
+        walking the pivot's shortest-path DAG backwards from `a` (its ancestors only).
+
+        Returns:
+            np.ndarray: Edge ids whose total changed.
+        """
+        G, indices, entry_eid, alive = self.G, self.G.indices, self.entry_eid, self.alive
+        far_mask, flow = self._far, self._flow
+        far_mask[far] = True
+        changed = []
+        try:
+            for p in pivots:
+                eids, values, dist, sigma = self.sweeps[int(p)]
+                cut = far_mask[self.u[eids]] | far_mask[self.v[eids]]
+                self.totals[eids[cut]] -= values[cut]
+                changed.append(eids[cut])
+                eids, values = eids[~cut], values[~cut]
+                dist[far] = -1
+                sigma[far] = 0.0
+                frontier = np.array([a], dtype=np.int64)
+                flow[a] = len(far)
+                touched = [frontier]
+                while dist[frontier[0]] > 0:
+                    offsets, y = G.entries_of(frontier)
+                    live = alive[entry_eid[offsets]]
+                    offsets, y = offsets[live], y[live]
+                    x = np.asarray(indices[offsets])
+                    parent = dist[x] == dist[frontier[0]] - 1
+                    x, y, e = x[parent], y[parent], entry_eid[offsets[parent]]
+                    f = flow[y] * sigma[x] / sigma[y]
+                    values[np.searchsorted(eids, e)] -= f
+                    self.totals[e] -= f
+                    np.add.at(flow, x, f)
+                    changed.append(e)
+                    frontier = _first_occurrences(x, self._slot)
+                    touched.append(frontier)
+                flow[np.concatenate(touched)] = 0.0
+                self.sweeps[int(p)] = (eids, values, dist, sigma)
+        finally:
+            far_mask[far] = False
+        return np.concatenate(changed) if changed else np.zeros(0, dtype=np.int64)
+
+    def separated(self, a, b):
+        """
+        Whether a and b are disconnected over the alive edges, by two BFS, from a and from b,
+        that expand the smaller frontier one level at a time and stop as soon as they meet.
+        The cost is bounded by the smaller side when they are disconnected, and by the
+        neighbourhoods explored until the searches meet otherwise.
+
+        Returns:
+            np.ndarray: The nodes of the side whose search ran out first (the whole
+            connected component of a or b) if they are disconnected, else None.
+        """
+        G, side, indices, entry_eid, alive = self.G, self._side, self.G.indices, self.entry_eid, self.alive
+        visited = [[np.array([a])], [np.array([b])]]
+        frontiers = [visited[0][0], visited[1][0]]
+        side[a], side[b] = 1, 2
+        try:
+            while True:
+                i = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+                offsets, _ = G.entries_of(frontiers[i])
+                w = np.asarray(indices[offsets[alive[entry_eid[offsets]]]])
+                if (side[w] == 2 - i).any():
+                    return None
+                fresh = _first_occurrences(w[side[w] == 0], self._slot)
+                if len(fresh) == 0:
+                    return np.concatenate(visited[i])
+                side[fresh] = i + 1
+                visited[i].append(fresh)
+                frontiers[i] = fresh
+        finally:
+            for nodes in visited:
+                side[np.concatenate(nodes)] = 0
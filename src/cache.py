@@ -0,0 +1,267 @@
+"""
+Content-addressed binary cache for processed graphs.
+
+Each cached graph lives in its own directory `<cache_dir>/gcc_<key>/` as plain
+`.npy` arrays, so it can be memory-mapped (np.load(mmap_mode='r')) and shared
+zero-copy by several processes. The key is a hash of the raw file contents and
+of the preprocessing parameters, so a new raw file or a parameter change never
+reuses a stale entry.
+
+Algorithm runs are cached under `<cache_dir>/runs/run_<key>/`: the label array
+of the partition (aligned with the graph it was computed on) plus its metrics.
+The run key combines the graph key (which already covers the raw file and any
+subgraph selection), the algorithm, its parameters and seed, and a digest of
+the detection code; metrics are stored per metrics-code digest and parameters,
+so they can be recomputed from a cached partition without re-running the
+detection. Run entries are evicted least-recently-used first beyond a size limit.
+
+Arrays derived from a graph alone (e.g. its edge betweenness, which every
+partition of that graph reuses) are cached under `<cache_dir>/derived/`.
+"""
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from .graph import CSRGraph
+from .instrument import timed
+
+# Bump when the on-disk layout or the preprocessing code changes meaning
+CACHE_FORMAT_VERSION = 1
+
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+DIGESTS_FILE = "digests.json"
+META_FILE = "meta.json"
+RUNS_DIR = "runs"
+DERIVED_DIR = "derived"
+
+def file_digest(path, cache_dir=None):
+    """
+    Returns the SHA-256 hex digest of a file's contents.
+    If `cache_dir` is given, digests are memoized there by (path, size, mtime) so
+    an unchanged multi-GB raw file is only hashed once.
+    """
+    stat = os.stat(path)
+    memo_key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    memo_path = os.path.join(cache_dir, DIGESTS_FILE) if cache_dir else None
+    memo = {}
+    if memo_path and os.path.exists(memo_path):
+        with open(memo_path) as f:
+            memo = json.load(f)
+        if memo_key in memo:
+            return memo[memo_key]
+
+    print(f"Hashing {path}...")
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            h.update(block)
+    digest = h.hexdigest()
+
+    if memo_path:
+        memo[memo_key] = digest
+        _write_json_atomic(memo_path, memo)
+    return digest
+
+def graph_cache_key(raw_path, params, cache_dir=None):
+    """Builds the cache key for the graph derived from `raw_path` with preprocessing `params` (dict)."""
+    payload = json.dumps({
+        "version": CACHE_FORMAT_VERSION,
+        "raw_digest": file_digest(raw_path, cache_dir),
+        "params": params,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+def _entry_dir(cache_dir, key):
+    return os.path.join(cache_dir, f"gcc_{key}")
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
+
+@timed()
+def save_graph(G, cache_dir, key, params=None, raw_path=None):
+    """
+    Stores a CSRGraph under `key`.
+    Arrays are written first and `meta.json` last, so a partially written entry is never loaded.
+    """
+    path = _entry_dir(cache_dir, key)
+    print(f"Saving graph to cache: {path}...")
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    u, v, w = G.edge_array()
+    arrays = {
+        "indptr": G.indptr,
+        "indices": G.indices,
+        "node_ids": G.node_ids,
+        "degrees": G.degrees,
+        "degree_order": G.degree_order,
+        "degree_rank": G.degree_rank,
+        "edges": np.column_stack((u, v)),
+    }
+    if w is not None:
+        arrays["weights"] = G.weights
+        arrays["edge_weights"] = w
+    if G.arcs is not None:
+        arrays["arc_sources"], arrays["arc_targets"], arrays["arc_weights"] = G.arcs
+    for name, arr in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(arr))
+
+    _write_json_atomic(os.path.join(tmp_path, META_FILE), {
+        "version": CACHE_FORMAT_VERSION,
+        "key": key,
+        "params": params,
+        "raw_path": raw_path,
+        "num_nodes": G.number_of_nodes(),
+        "num_edges": len(u),
+        "arrays": sorted(arrays),
+    })
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+@timed()
+def load_graph(cache_dir, key, mmap=True):
+    """
+    Loads the CSRGraph cached under `key`, memory-mapped by default.
+    Returns None if there is no complete entry for this key.
+    """
+    path = _entry_dir(cache_dir, key)
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("version") != CACHE_FORMAT_VERSION:
+        return None
+
+    print(f"Loading cached graph from {path}...")
+    mode = 'r' if mmap else None
+    load = lambda name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+    weights = load("weights") if "weights" in meta["arrays"] else None
+    G = CSRGraph(load("indptr"), load("indices"), load("node_ids"), weights)
+    G._degrees = load("degrees")
+    if "degree_order" in meta["arrays"]:
+        G._degree_order = load("degree_order")
+        G._degree_rank = load("degree_rank")
+    if "arc_sources" in meta["arrays"]:
+        G.arcs = (load("arc_sources"), load("arc_targets"), load("arc_weights"))
+    edges = load("edges")
+    G._edges = (edges[:, 0], edges[:, 1], load("edge_weights") if weights is not None else None)
+    return G
+
+def find_latest_key(cache_dir, params):
+    """Returns the key of the most recently written entry built with `params`, or None."""
+    if not os.path.isdir(cache_dir):
+        return None
+    best_key, best_mtime = None, -1
+    for name in os.listdir(cache_dir):
+        meta_path = os.path.join(cache_dir, name, META_FILE)
+        if not name.startswith("gcc_") or name.endswith(".tmp") or not os.path.exists(meta_path):
+            continue
+        with open(meta_path) as f:
+            meta = json.load(f)
+        mtime = os.path.getmtime(meta_path)
+        if meta.get("version") == CACHE_FORMAT_VERSION and meta.get("params") == params and mtime > best_mtime:
+            best_key, best_mtime = meta["key"], mtime
+    return best_key
+
+def _derived_path(cache_dir, key, name):
+    return os.path.join(cache_dir, DERIVED_DIR, f"{key}_{name}.npy")
+
+def save_derived(cache_dir, key, name, array):
+    """Stores an array derived from the graph cached under `key` (written to a temporary file and moved into place)."""
+    path = _derived_path(cache_dir, key, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp_path, np.asarray(array))
+    os.replace(tmp_path, path)
+
+def load_derived(cache_dir, key, name, mmap=True):
+    """Returns the array stored by save_derived (memory-mapped by default), or None."""
+    path = _derived_path(cache_dir, key, name)
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode='r' if mmap else None)
+
+def source_digest(*modules):
+    """Short SHA-256 digest of the source files of the given modules (a code version for cache keys)."""
+    h = hashlib.sha256()
+    for module in modules:
+        with open(module.__file__, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+def run_cache_key(graph_key, algorithm, params, seed, code_version):
+    """Builds the cache key of one algorithm run on the graph cached under `graph_key`."""
+    payload = json.dumps({
+        "version": CACHE_FORMAT_VERSION,
+        "graph_key": graph_key,
+        "algorithm": algorithm,
+        "params": params,
+        "seed": seed,
+        "code_version": code_version,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+def _run_dir(cache_dir, key):
+    return os.path.join(cache_dir, RUNS_DIR, f"run_{key}")
+
+def save_run(cache_dir, key, labels, meta=None):
+    """Stores the label array of a run (written to a temporary directory and moved into place)."""
+    path = _run_dir(cache_dir, key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, "labels.npy"), np.asarray(labels))
+    _write_json_atomic(os.path.join(tmp_path, META_FILE), {"key": key, **(meta or {})})
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+def load_run(cache_dir, key):
+    """Returns the cached label array of a run, or None. A hit marks the entry as recently used."""
+    path = _run_dir(cache_dir, key)
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    os.utime(meta_path)
+    return np.load(os.path.join(path, "labels.npy"))
+
+def save_run_metrics(cache_dir, key, metrics_key, data):
+    """Stores the metrics computed for a cached run with the metrics code/parameters `metrics_key`."""
+    path = _run_dir(cache_dir, key)
+    if os.path.isdir(path):
+        _write_json_atomic(os.path.join(path, f"metrics_{metrics_key}.json"), data)
+
+def load_run_metrics(cache_dir, key, metrics_key):
+    """Returns the metrics stored for a cached run under `metrics_key`, or None."""
+    metrics_path = os.path.join(_run_dir(cache_dir, key), f"metrics_{metrics_key}.json")
+    if not os.path.exists(metrics_path):
+        return None
+    with open(metrics_path) as f:
+        return json.load(f)
+
+def evict_runs(cache_dir, max_bytes):
+    """Deletes least-recently-used run entries until the run cache takes at most `max_bytes`."""
+    runs_dir = os.path.join(cache_dir, RUNS_DIR)
+    if not os.path.isdir(runs_dir):
+        return
+    entries = []
+    for name in os.listdir(runs_dir):
+        path = os.path.join(runs_dir, name)
+        meta_path = os.path.join(path, META_FILE)
+        if name.endswith(".tmp") or not os.path.exists(meta_path):
+            continue
+        size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+        entries.append((os.path.getmtime(meta_path), size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        print(f"Evicting cached run {path}...")
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
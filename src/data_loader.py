@@ -1,41 +1,366 @@
-import networkx as nx
+import numpy as np
 import os
-import pickle
+import re
 import sys
+import html
+from array import array
+from collections import namedtuple
+from .graph import CSRGraph
+from .instrument import timed
 
-def load_graph(gml_path):
-    """Loads the graph from a GML file."""
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Streaming GML reader configuration
+GML_CHUNK_SIZE = 16 * 1024 * 1024  # Bytes read from disk per chunk
+GML_PROGRESS_EVERY = 0.1           # Print progress every 10% of the file
+
+# Tokens: comments, brackets, (possibly unterminated) strings and bare words/numbers.
+# An unterminated string can only happen at the end of a chunk, in which case it is carried over.
+_GML_TOKEN = re.compile(rb'#[^\n]*|\[|\]|"[^"]*"?|[^\s\[\]"]+')
+
+GMLData = namedtuple("GMLData", ["node_ids", "sources", "targets", "directed", "multigraph", "node_attrs", "edge_attrs"])
+
+def peak_memory_mb():
+    """Returns the peak resident memory of the current process in MB (None if unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+def _parse_gml_value(token):
+    """Converts a raw GML value token (bytes) to int, float or str."""
+    if token[:1] == b'"':
+        return html.unescape(token[1:-1].decode('utf-8'))
+    try:
+        return int(token)
+    except ValueError:
+        pass
+    try:
+        return float(token)
+    except ValueError:
+        return token.decode('utf-8')
+
+def _iter_gml_tokens(f, chunk_size):
+    """Yields lists of GML tokens, reading the file in fixed-size chunks."""
+    carry = b''
+    while True:
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buf = carry + chunk
+        tokens = _GML_TOKEN.findall(buf)
+        carry = b''
+        # The last token may be cut in half by the chunk boundary: keep it for the next round
+        if not eof and tokens and buf.endswith(tokens[-1]):
+            carry = tokens.pop()
+        yield tokens
+        if eof:
+            return
+
+def iter_gml_arrays(gml_path, batch_edges=None, node_attrs=None, edge_attrs=None,
+                    chunk_size=GML_CHUNK_SIZE, verbose=True):
+    """
+    Streams a GML file as a sequence of GMLData batches.
+
+    Only the top-level `node` and `edge` blocks are parsed. Nested lists
+    (e.g. `graphics [...]`) and attributes not listed in `node_attrs` /
+    `edge_attrs` are skipped. A batch is emitted as soon as `batch_edges`
+    edges have been parsed (None: a single batch with the whole file), so
+    memory stays bounded by the batch size, not by the edge count.
+
+    Args:
+        gml_path (str): Path to the GML file.
+        batch_edges (int): Edges per batch (None = whole file).
+        node_attrs (iterable): Node attribute names to keep (besides `id`).
+        edge_attrs (iterable): Edge attribute names to keep (besides `source`/`target`).
+        chunk_size (int): Number of bytes read per chunk.
+        verbose (bool): Print progress and peak memory.
+
+    Yields:
+        GMLData: the nodes and edges parsed since the previous batch, as int64
+        arrays (in file order), the `directed`/`multigraph` flags read so far and
+        dicts {attr: list} of the kept attributes.
+    """
+    keep_node = {a.encode('utf-8') for a in (node_attrs or ())}
+    keep_edge = {a.encode('utf-8') for a in (edge_attrs or ())}
+    flags = {b'directed': 0, b'multigraph': 0}
+
+    def new_batch():
+        return array('q'), array('q'), array('q'), {a: [] for a in keep_node}, {a: [] for a in keep_edge}
+
+    def to_gml_data():
+        return GMLData(
+            node_ids=np.frombuffer(node_ids, dtype=np.int64),
+            sources=np.frombuffer(sources, dtype=np.int64),
+            targets=np.frombuffer(targets, dtype=np.int64),
+            directed=bool(flags[b'directed']),
+            multigraph=bool(flags[b'multigraph']),
+            node_attrs={a.decode('utf-8'): v for a, v in node_values.items()},
+            edge_attrs={a.decode('utf-8'): v for a, v in edge_values.items()},
+        )
+
+    node_ids, sources, targets, node_values, edge_values = new_batch()
+    total_nodes = total_edges = 0
+
+    file_size = os.path.getsize(gml_path)
+    next_report = GML_PROGRESS_EVERY
+
+    stack = []      # Names of the currently open lists
+    key = None      # Pending key waiting for its value
+    record = None   # Attributes of the node/edge block being parsed
+
+    with open(gml_path, 'rb') as f:
+        for tokens in _iter_gml_tokens(f, chunk_size):
+            for tok in tokens:
+                if tok == b'[':
+                    stack.append(key)
+                    if len(stack) == 2 and key in (b'node', b'edge'):
+                        record = {}
+                    key = None
+                elif tok == b']':
+                    closed = stack.pop()
+                    if len(stack) == 1 and record is not None:
+                        if closed == b'node':
+                            node_ids.append(record[b'id'])
+                            for a in keep_node:
+                                node_values[a].append(record.get(a))
+                        elif closed == b'edge':
+                            sources.append(record[b'source'])
+                            targets.append(record[b'target'])
+                            for a in keep_edge:
+                                edge_values[a].append(record.get(a))
+                        record = None
+                elif tok[:1] == b'#':
+                    continue
+                elif key is None:
+                    key = tok
+                else:
+                    depth = len(stack)
+                    if depth == 2 and record is not None:
+                        if key in (b'id', b'source', b'target'):
+                            record[key] = int(tok)
+                        elif key in keep_node or key in keep_edge:
+                            record[key] = _parse_gml_value(tok)
+                    elif depth == 1 and key in flags:
+                        flags[key] = int(tok)
+                    key = None
+
+            if verbose and file_size > 0:
+                progress = f.tell() / file_size
+                if progress >= next_report:
+                    print(f"  GML: {progress:.0%} read, {total_nodes + len(node_ids)} nodes, "
+                          f"{total_edges + len(sources)} edges (peak memory: {peak_memory_mb() or 0:.0f} MB)")
+                    next_report = progress + GML_PROGRESS_EVERY
+
+            if batch_edges and len(sources) >= batch_edges:
+                yield to_gml_data()
+                total_nodes += len(node_ids)
+                total_edges += len(sources)
+                node_ids, sources, targets, node_values, edge_values = new_batch()
+
+    if stack:
+        raise ValueError(f"Malformed GML file: {len(stack)} unclosed list(s) at end of file")
+    yield to_gml_data()
+
+@timed()
+def read_gml_arrays(gml_path, node_attrs=None, edge_attrs=None, chunk_size=GML_CHUNK_SIZE, verbose=True):
+    """
+    Streams a GML file and returns its structure as integer arrays.
+
+    Only the top-level `node` and `edge` blocks are parsed (see iter_gml_arrays),
+    so memory stays proportional to the edge count.
+
+    Args:
+        gml_path (str): Path to the GML file.
+        node_attrs (iterable): Node attribute names to keep (besides `id`).
+        edge_attrs (iterable): Edge attribute names to keep (besides `source`/`target`).
+        chunk_size (int): Number of bytes read per chunk.
+        verbose (bool): Print progress and peak memory.
+
+    Returns:
+        GMLData: node ids and edge endpoints as int64 arrays (in file order),
+        the `directed`/`multigraph` flags and dicts {attr: list} of the kept attributes.
+    """
+    batch, = iter_gml_arrays(gml_path, None, node_attrs, edge_attrs, chunk_size, verbose)
+    return batch
+
+def duplicate_edges(sources, targets, directed=False):
+    """
+    Positions (in file order) of the edges that repeat an earlier edge: same endpoints,
+    in either order unless `directed`.
+    """
+    s, t = np.asarray(sources), np.asarray(targets)
+    if not directed:
+        s, t = np.minimum(s, t), np.maximum(s, t)
+    order = np.lexsort((t, s))  # Stable: the first copy of an edge comes first
+    repeated = (s[order][1:] == s[order][:-1]) & (t[order][1:] == t[order][:-1])
+    return np.sort(order[1:][repeated])
+
+@timed()
+def load_graph(gml_path, node_attrs=None, edge_attrs=None):
+    """
+    Loads the graph from a GML file.
+    Uses the streaming reader and keeps only the requested attributes.
+    Like nx.read_gml, a repeated edge is an error unless the file declares `multigraph 1`
+    (then every copy is kept with its own attributes).
+    """
     print(f"Loading graph from {gml_path}...")
     if not os.path.exists(gml_path):
         raise FileNotFoundError(f"File not found: {gml_path}")
-    
+
+    import networkx as nx
     try:
-        G = nx.read_gml(gml_path, label='id')
-        print(f"Graph loaded: {G.number_of_nodes()} nodes, {G.number_of_edges()} edges.")
+        data = read_gml_arrays(gml_path, node_attrs=node_attrs, edge_attrs=edge_attrs)
+        if not data.multigraph:
+            duplicates = duplicate_edges(data.sources, data.targets, directed=data.directed)
+            if len(duplicates):
+                i = int(duplicates[0])
+                arrow = "->" if data.directed else "--"
+                raise ValueError(f"edge #{i} ({data.sources[i]}{arrow}{data.targets[i]}) is duplicated "
+                                 f"({len(duplicates)} duplicated edges in total)")
+
+        if data.multigraph:
+            G = nx.MultiDiGraph() if data.directed else nx.MultiGraph()
+        else:
+            G = nx.DiGraph() if data.directed else nx.Graph()
+
+        node_ids = data.node_ids.tolist()
+        if data.node_attrs:
+            names = list(data.node_attrs)
+            G.add_nodes_from(
+                (n, {a: v for a, v in zip(names, values) if v is not None})
+                for n, values in zip(node_ids, zip(*data.node_attrs.values()))
+            )
+        else:
+            G.add_nodes_from(node_ids)
+
+        edges = zip(data.sources.tolist(), data.targets.tolist())
+        if data.edge_attrs:
+            names = list(data.edge_attrs)
+            G.add_edges_from(
+                (u, v, {a: x for a, x in zip(names, values) if x is not None})
+                for (u, v), values in zip(edges, zip(*data.edge_attrs.values()))
+            )
+        else:
+            G.add_edges_from(edges)
+
+        print(f"Graph loaded: {G.number_of_nodes()} nodes, {G.number_of_edges()} edges "
+              f"(peak memory: {peak_memory_mb() or 0:.0f} MB).")
         return G
     except Exception as e:
         print(f"Error loading graph: {e}")
         sys.exit(1)
 
-def get_gcc(G):
-    """Extracts the Giant Connected Component (GCC) from the graph."""
+@timed()
+def gcc_from_arrays(node_ids, sources, targets, weights=None, directed=False):
+    """
+    Extracts the Giant Connected Component directly from edge arrays.
+
+    Edges are treated as undirected and components are found with
+    scipy.sparse.csgraph (weak connectivity), so no undirected copy of the
+    graph is ever materialized. Nodes keep their original order.
+
+    Args:
+        node_ids (np.ndarray): Original node ids.
+        sources, targets (np.ndarray): Edge endpoints as original node ids.
+        weights (np.ndarray): Optional edge weights (summed over duplicate edges).
+        directed (bool): Also keep the direction of the edges as `G.arcs` (every ordered
+            pair once, with its summed weight, or weight 1 without weights).
+
+    Returns:
+        CSRGraph: The GCC, relabelled to positions 0..n_gcc-1.
+    """
+    node_ids = np.asarray(node_ids, dtype=np.int64)
+    n = len(node_ids)
+
+    # Map node ids to positions 0..n-1
+    order = np.argsort(node_ids, kind='stable')
+    sorted_ids = node_ids[order]
+    src = np.searchsorted(sorted_ids, sources)
+    dst = np.searchsorted(sorted_ids, targets)
+    if n == 0 or np.any(src >= n) or np.any(dst >= n) \
+            or np.any(sorted_ids[src] != sources) or np.any(sorted_ids[dst] != targets):
+        raise ValueError("Edge endpoint not declared as a node")
+    src = order[src]
+    dst = order[dst]
+
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+    adjacency = coo_matrix((np.ones(len(src), dtype=np.int8), (src, dst)), shape=(n, n)).tocsr()
+    _, labels = connected_components(adjacency, directed=True, connection='weak')
+    del adjacency
+
+    in_gcc = labels == np.argmax(np.bincount(labels))
+    del labels
+    new_pos = np.cumsum(in_gcc) - 1
+    keep = in_gcc[src]  # Both endpoints are in the same component
+    src, dst = new_pos[src[keep]], new_pos[dst[keep]]
+    if weights is not None:
+        weights = np.asarray(weights)[keep]
+    num_nodes = int(in_gcc.sum())
+    G = CSRGraph.from_edges(src, dst, num_nodes, node_ids=node_ids[in_gcc], weights=weights)
+    if directed:
+        # Collapse repeated (source, target) pairs, keeping their direction
+        keys, inverse = np.unique(src * num_nodes + dst, return_inverse=True)
+        if weights is None:
+            arc_weights = np.ones(len(keys), dtype=np.int32)
+        else:
+            arc_weights = np.bincount(inverse, weights=weights, minlength=len(keys)).astype(weights.dtype)
+        G.arcs = ((keys // num_nodes).astype(np.int32), (keys % num_nodes).astype(np.int32), arc_weights)
+    return G
+
+@timed()
+def load_gcc(gml_path, weighted=False, directed=False):
+    """
+    Loads the GCC of a GML file straight into a CSRGraph.
+    Streams the file into edge arrays and never builds a NetworkX graph.
+
+    Repeated edges between the same accounts (in either direction) are collapsed into
+    one edge, with a warning giving their count. With `weighted`, the collapsed edge
+    gets an int32 weight equal to its number of copies (the number of retweets; GML
+    weight attributes are not read), otherwise every edge counts once. With `directed`,
+    the retweet direction is also kept as `G.arcs` (repeated arcs collapsed the same way).
+    """
+    print(f"Loading graph from {gml_path}...")
+    if not os.path.exists(gml_path):
+        raise FileNotFoundError(f"File not found: {gml_path}")
+
+    data = read_gml_arrays(gml_path)
+    print(f"Graph loaded: {len(data.node_ids)} nodes, {len(data.sources)} edges.")
+    num_duplicates = len(duplicate_edges(data.sources, data.targets))
+    if num_duplicates:
+        print(f"WARNING: {num_duplicates} repeated edges collapsed into one edge each "
+              f"({'weights count the copies' if weighted else 'each counted once'}).")
+    print("Extracting Giant Connected Component (GCC)...")
+    weights = np.ones(len(data.sources), dtype=np.int32) if weighted else None
+    G_gcc = gcc_from_arrays(data.node_ids, data.sources, data.targets, weights=weights, directed=directed)
+    print(f"GCC extracted: {G_gcc.number_of_nodes()} nodes, {G_gcc.number_of_edges()} edges "
+          f"(peak memory: {peak_memory_mb() or 0:.0f} MB).")
+    return G_gcc
+
+@timed()
+def get_gcc(G, as_csr=False):
+    """
+    Extracts the Giant Connected Component (GCC) from the graph.
+    If `as_csr` is True the GCC is returned as a compact CSRGraph, extracted
+    from the edge arrays without building an undirected copy of G.
+    """
     print("Extracting Giant Connected Component (GCC)...")
+    if as_csr:
+        node_ids = np.fromiter(G.nodes(), dtype=np.int64, count=G.number_of_nodes())
+        edges = np.fromiter((x for e in G.edges() for x in e[:2]), dtype=np.int64, count=2 * G.number_of_edges())
+        G_gcc = gcc_from_arrays(node_ids, edges[0::2], edges[1::2])
+        print(f"GCC extracted: {G_gcc.number_of_nodes()} nodes, {G_gcc.number_of_edges()} edges.")
+        return G_gcc
+
+    import networkx as nx
     G_undirected = G.to_undirected()
     largest_cc_nodes = max(nx.connected_components(G_undirected), key=len)
     G_gcc = G_undirected.subgraph(largest_cc_nodes).copy()
     print(f"GCC extracted: {G_gcc.number_of_nodes()} nodes, {G_gcc.number_of_edges()} edges.")
     return G_gcc
-
-def load_processed_data(cache_path):
-    """Loads processed data from cache if available."""
-    if os.path.exists(cache_path):
-        print(f"Loading cached data from {cache_path}...")
-        with open(cache_path, 'rb') as f:
-            return pickle.load(f)
-    return None
-
-def save_processed_data(data, cache_path):
-    """Saves processed data to cache."""
-    print(f"Saving data to cache: {cache_path}...")
-    with open(cache_path, 'wb') as f:
-        pickle.dump(data, f)
@@ -0,0 +1,203 @@
+"""
+Echo-chamber analytics: how the communities of a partition connect to each other.
+
+- Flow matrix: the community x community matrix of edge weight between communities
+  (retweets from one to the other on directed graphs), built as one sparse matrix
+  from the edge arrays, and the share of each community's cut that goes to each
+  rival community.
+- Participation coefficient of every node, 1 - sum_c (k_ic / k_i)^2: 0 when all of
+  its edges stay in one community, close to 1 when they are spread over many.
+- Bridge users: approximate edge betweenness (k-pivot Brandes, see betweenness.py)
+  restricted to the cut edges and summed per node, i.e. the users that shortest
+  paths go through to cross from one bubble to another.
+
+Everything is a few passes over the edge arrays and sparse matrix products, linear
+in the number of edges. The betweenness does not depend on the partition, so it is
+estimated once per graph (`edge_betweenness`) and reused by every partition.
+"""
+import numpy as np
+from .graph import CSRGraph, as_csr
+from .instrument import timed
+
+def community_labels(G, partition):
+    """
+    Dense community index of every position of G, in order of first appearance in `partition`.
+    Nodes missing from the partition get the extra index k.
+
+    Returns:
+        tuple: (labels, list of community ids, indexed by label)
+    """
+    comm_ids = list(dict.fromkeys(partition.values()))
+    comm_index = {c: i for i, c in enumerate(comm_ids)}
+    k = len(comm_ids)
+    labels = np.fromiter((comm_index.get(partition.get(n), k) for n in G.node_ids.tolist()),
+                         dtype=np.int64, count=G.number_of_nodes())
+    return labels, comm_ids
+
+def flow_matrix(G, labels, k, directed=False):
+    """
+    Community x community flow matrix (scipy.sparse CSR, k x k).
+
+    Undirected: entry (a, b) is the edge weight (or number of edges) between communities
+    a and b, so the matrix is symmetric and its diagonal holds the internal weight.
+    Directed (needs G.arcs): entry (a, b) is the arc weight from a to b, i.e. how much
+    a retweets b.
+    Labels >= k (nodes without a community) are left out.
+    """
+    from scipy.sparse import coo_matrix
+    if directed:
+        if G.arcs is None:
+            raise ValueError("This graph has no directed arcs")
+        s, t, w = G.arcs
+    else:
+        s, t, w = G.edge_array()
+    w = np.ones(len(s)) if w is None else np.asarray(w, dtype=np.float64)
+    ls, lt = labels[s], labels[t]
+    keep = (ls < k) & (lt < k)
+    ls, lt, w = ls[keep], lt[keep], w[keep]
+    if not directed:
+        # Every edge is stored once: mirror the cut edges to make the matrix symmetric
+        cut = ls != lt
+        ls, lt, w = np.concatenate([ls, lt[cut]]), np.concatenate([lt, ls[cut]]), np.concatenate([w, w[cut]])
+    return coo_matrix((w, (ls, lt)), shape=(k, k)).tocsr()
+
+def cut_shares(F):
+    """
+    Share of every community's cut going to each other community: row a of F without its
+    diagonal, divided by its sum (scipy.sparse CSR; rows of communities without a cut are empty).
+
+    Returns:
+        tuple: (shares matrix, cut weight of every community)
+    """
+    from scipy.sparse import diags
+    F = F.tocsr(copy=True)
+    F.setdiag(0)
+    F.eliminate_zeros()
+    cut = np.asarray(F.sum(axis=1)).ravel()
+    inverse = np.divide(1.0, cut, out=np.zeros_like(cut), where=cut > 0)
+    return diags(inverse) @ F, cut
+
+def participation_coefficient(G, labels, k):
+    """
+    Participation coefficient 1 - sum_c (k_ic / k_i)^2 of every position, where k_ic is the
+    weight of its edges into community c (self-loops left out). Isolated nodes get 0.
+    """
+    from scipy.sparse import csr_matrix
+    rows = G._row_of_entries()
+    cols = np.asarray(G.indices)
+    w = np.ones(len(cols)) if G.weights is None else np.asarray(G.weights, dtype=np.float64)
+    keep = rows != cols
+    # Node x community weight matrix (duplicate entries are summed)
+    S = csr_matrix((w[keep], (rows[keep], labels[cols[keep]])), shape=(G.number_of_nodes(), k + 1))
+    strength = np.asarray(S.sum(axis=1)).ravel()
+    squares = np.asarray(S.multiply(S).sum(axis=1)).ravel()
+    return 1.0 - np.divide(squares, strength ** 2, out=np.ones_like(strength), where=strength > 0)
+
+@timed()
+def edge_betweenness(G, pivots=16, seed=0):
+    """
+    Approximate edge betweenness of G from `pivots` sampled sources (k-pivot Brandes,
+    vectorized BFS sweeps), aligned with G.edge_array(). Edge weights are ignored
+    (unweighted shortest paths).
+    """
+    from .betweenness import sweep_edge_betweenness
+    n = G.number_of_nodes()
+    sources = np.random.default_rng(seed).choice(n, size=min(pivots, n), replace=False)
+    return sweep_edge_betweenness(G, sources.tolist(), scale=n / (2 * max(len(sources), 1)))
+
+def bridge_scores(G, labels, betweenness=None):
+    """
+    Cut weight (or number of cut edges) and summed cut-edge betweenness of every position.
+    `betweenness` is aligned with G.edge_array(); without it the second array is None.
+    """
+    n = G.number_of_nodes()
+    u, v, w = G.edge_array()
+    cut = labels[u] != labels[v]
+    cu, cv = u[cut], v[cut]
+    cw = None if w is None else np.asarray(w, dtype=np.float64)[cut]
+    cut_weight = np.bincount(cu, weights=cw, minlength=n) + np.bincount(cv, weights=cw, minlength=n)
+    if betweenness is None:
+        return cut_weight, None
+    b = np.asarray(betweenness)[cut]
+    return cut_weight, np.bincount(cu, weights=b, minlength=n) + np.bincount(cv, weights=b, minlength=n)
+
+@timed()
+def calculate_echo_chamber_metrics(G, partition, betweenness=None, directed=False, min_size=10,
+                                   top_communities=20, top_rivals=5, top_bridges=100):
+    """
+    Echo-chamber metrics of a partition, as a JSON-ready dict.
+
+    Args:
+        G: nx.Graph or CSRGraph
+        partition (dict): {node_id: community_id}
+        betweenness (np.ndarray): Edge betweenness aligned with G.edge_array() (see
+            edge_betweenness); bridges are ranked by cut weight without it.
+        directed (bool): Flow matrix over the retweet arcs (G.arcs) instead of the edges.
+        min_size (int): Communities with fewer nodes get no cut shares.
+        top_communities (int): Largest communities kept in the flow matrix; the others are
+            summed into a last "other" row/column.
+        top_rivals (int): Rival communities listed per community, by decreasing cut share.
+        top_bridges (int): Bridge users listed.
+
+    Returns:
+        dict: {"cut_weight_fraction", "mean_participation", "flow_matrix": {"communities", "matrix"},
+        "cut_shares": {community_id: {"size", "cut", "rivals": [{"community", "share"}]}},
+        "bridges": [{"node", "community", "degree", "cut_weight", "participation", "bridge_betweenness"}]}
+    """
+    if not isinstance(G, CSRGraph):
+        import networkx as nx
+        G = as_csr(G, weight='weight' if nx.is_weighted(G) else None)
+    labels, comm_ids = community_labels(G, partition)
+    k = len(comm_ids)
+    sizes = np.bincount(labels, minlength=k + 1)[:k]
+
+    F = flow_matrix(G, labels, k, directed=directed)
+    internal = F.diagonal().sum()
+    between = (F.sum() - internal) / (1 if directed else 2)  # Undirected cut edges appear twice in F
+
+    # Flow between the largest communities, the rest summed into "other"
+    top = np.argsort(-sizes, kind='stable')[:top_communities]
+    slot = np.full(k, len(top))
+    slot[top] = np.arange(len(top))
+    width = len(top) + (k > len(top))
+    C = F.tocoo()
+    dense = np.zeros((width, width))
+    np.add.at(dense, (slot[C.row], slot[C.col]), C.data)
+
+    shares, cut = cut_shares(F)
+    cut_share_data = {}
+    for c in np.flatnonzero(sizes >= min_size).tolist():
+        lo, hi = shares.indptr[c], shares.indptr[c + 1]
+        order = np.argsort(-shares.data[lo:hi], kind='stable')[:top_rivals]
+        cut_share_data[comm_ids[c]] = {
+            "size": int(sizes[c]),
+            "cut": float(cut[c]),
+            "rivals": [{"community": comm_ids[shares.indices[lo + i]], "share": float(shares.data[lo + i])}
+                       for i in order.tolist()],
+        }
+
+    participation = participation_coefficient(G, labels, k)
+    cut_weight, bridge_betweenness = bridge_scores(G, labels, betweenness)
+    score = cut_weight if bridge_betweenness is None else bridge_betweenness
+    candidates = np.flatnonzero(score > 0)
+    best = candidates[np.argsort(-score[candidates], kind='stable')[:top_bridges]]
+    degrees = G.degrees
+    bridges = [{
+        "node": int(G.node_ids[i]),
+        "community": comm_ids[labels[i]] if labels[i] < k else None,
+        "degree": int(degrees[i]),
+        "cut_weight": float(cut_weight[i]),
+        "participation": float(participation[i]),
+        "bridge_betweenness": None if bridge_betweenness is None else float(bridge_betweenness[i]),
+    } for i in best.tolist()]
+
+    return {
+        "cut_weight_fraction": float(between / (internal + between)) if internal + between > 0 else 0.0,
+        "mean_participation": float(participation.mean()) if len(participation) else 0.0,
+        "flow_matrix": {
+            "communities": [comm_ids[c] for c in top.tolist()] + (["other"] if width > len(top) else []),
+            "matrix": dense.tolist(),
+        },
+        "cut_shares": cut_share_data,
+        "bridges": bridges,
+    }
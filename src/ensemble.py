@@ -0,0 +1,145 @@
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .algorithms import run_louvain
+from .graph import CSRGraph, as_csr
+
+# Graph shared with the ensemble workers (inherited through fork, never pickled)
+_WORKER_GRAPH = None
+
+def _init_worker(G):
+    global _WORKER_GRAPH
+    _WORKER_GRAPH = G
+
+def _run_seed(func, seed):
+    """Runs one seeded detection on the shared graph and returns (labels, elapsed seconds)."""
+    G = _WORKER_GRAPH
+    start = time.perf_counter()
+    partition = func(G, seed=seed)
+    elapsed = time.perf_counter() - start
+    return G.labels_from_partition(partition).astype(np.int32), elapsed
+
+def run_ensemble(G, func, seeds, max_workers=None):
+    """
+    Runs a randomized algorithm once per seed, in parallel worker processes.
+
+    Args:
+        G: nx.Graph or CSRGraph
+        func: A run_* function accepting a `seed` keyword argument.
+        seeds (list): One run per seed.
+        max_workers (int): Number of worker processes (default: number of CPUs).
+
+    Returns:
+        tuple: (CSRGraph, list of label arrays aligned with its positions, list of run times in seconds)
+    """
+    G = as_csr(G)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(seeds))
+    print(f"Running ensemble of {len(seeds)} seeds on {max_workers} worker(s)...")
+
+    if max_workers <= 1 or "fork" not in mp.get_all_start_methods():
+        _init_worker(G)
+        results = [_run_seed(func, seed) for seed in seeds]
+    else:
+        # Workers inherit the graph through fork instead of receiving a pickled copy
+        ctx = mp.get_context("fork")
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx,
+                                 initializer=_init_worker, initargs=(G,)) as executor:
+            results = list(executor.map(_run_seed, [func] * len(seeds), seeds))
+
+    labels = [r[0] for r in results]
+    timings = [r[1] for r in results]
+    return G, labels, timings
+
+def contingency_table(a, b):
+    """
+    Sparse contingency table of two label arrays, in O(n log n) time and O(n) memory.
+
+    Returns:
+        tuple: (counts of every non-empty cell, row sums, column sums)
+    """
+    _, a = np.unique(a, return_inverse=True)
+    _, b = np.unique(b, return_inverse=True)
+    n_b = int(b.max()) + 1 if len(b) else 1
+    _, cell_counts = np.unique(a.astype(np.int64) * n_b + b, return_counts=True)
+    return cell_counts, np.bincount(a), np.bincount(b)
+
+def _entropy(counts, n):
+    p = counts[counts > 0] / n
+    return float(-np.sum(p * np.log(p)))
+
+def normalized_mutual_info(a, b):
+    """Normalized Mutual Information (arithmetic mean normalization) between two label arrays."""
+    n = len(a)
+    cells, rows, cols = contingency_table(a, b)
+    h_a = _entropy(rows, n)
+    h_b = _entropy(cols, n)
+    if h_a == 0 and h_b == 0:
+        return 1.0
+    # MI = H(a) + H(b) - H(a, b)
+    mi = h_a + h_b - _entropy(cells, n)
+    return float(max(mi, 0.0) / ((h_a + h_b) / 2))
+
+def adjusted_rand_index(a, b):
+    """Adjusted Rand Index between two label arrays."""
+    n = len(a)
+    cells, rows, cols = contingency_table(a, b)
+    comb2 = lambda x: np.sum(x.astype(np.float64) * (x - 1) / 2)
+    sum_cells, sum_rows, sum_cols = comb2(cells), comb2(rows), comb2(cols)
+    expected = sum_rows * sum_cols / (n * (n - 1) / 2) if n > 1 else 0.0
+    max_index = (sum_rows + sum_cols) / 2
+    if max_index == expected:
+        return 1.0
+    return float((sum_cells - expected) / (max_index - expected))
+
+def pairwise_stability(labels):
+    """
+    Pairwise NMI and ARI between all runs.
+
+    Returns:
+        dict: NMI/ARI matrices (lists), their means over distinct pairs and the mean NMI of every run
+    """
+    k = len(labels)
+    nmi = np.eye(k)
+    ari = np.eye(k)
+    for i in range(k):
+        for j in range(i + 1, k):
+            nmi[i, j] = nmi[j, i] = normalized_mutual_info(labels[i], labels[j])
+            ari[i, j] = ari[j, i] = adjusted_rand_index(labels[i], labels[j])
+    off_diag = ~np.eye(k, dtype=bool)
+    return {
+        "nmi_matrix": nmi.tolist(),
+        "ari_matrix": ari.tolist(),
+        "mean_nmi": float(nmi[off_diag].mean()) if k > 1 else 1.0,
+        "mean_ari": float(ari[off_diag].mean()) if k > 1 else 1.0,
+        "run_mean_nmi": ((nmi.sum(axis=1) - 1) / (k - 1)).tolist() if k > 1 else [1.0],
+    }
+
+def consensus_partition(G, labels, threshold=0.5, seed=0):
+    """
+    Builds a consensus partition from several runs without an O(n^2) co-assignment matrix.
+
+    Co-assignment is only sampled on the graph's edges: for every edge, the
+    fraction of runs that put both endpoints in the same community. Edges kept
+    by at least `threshold` of the runs form a consensus graph weighted by that
+    fraction, which is clustered once more with Louvain (Lancichinetti & Fortunato's
+    consensus clustering). Plain connected components would chain weakly agreeing
+    communities together.
+
+    Returns:
+        tuple: (consensus label array aligned with G's positions, per-edge co-assignment frequency)
+    """
+    u, v, _ = G.edge_array()
+    co_assigned = np.zeros(len(u), dtype=np.float64)
+    for lab in labels:
+        co_assigned += lab[u] == lab[v]
+    co_assigned /= len(labels)
+
+    keep = co_assigned >= threshold
+    n = G.number_of_nodes()
+    if not keep.any():
+        return np.arange(n), co_assigned
+    consensus_graph = CSRGraph.from_edges(u[keep], v[keep], n, node_ids=G.node_ids, weights=co_assigned[keep])
+    consensus = consensus_graph.labels_from_partition(run_louvain(consensus_graph, seed=seed))
+    return consensus, co_assigned
@@ -0,0 +1,216 @@
+import datetime
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .instrument import span
+
+# Nodes/edges formatted per write() call, bounding the size of the in-memory text buffer
+WRITE_BATCH_SIZE = 50000
+
+# Held by the export thread while it runs a stage, and by every fork: a process is never forked
+# (worker pools of the algorithms, ...) while an export holds locks the child would inherit
+_EXPORT_LOCK = threading.Lock()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=_EXPORT_LOCK.acquire, after_in_parent=_EXPORT_LOCK.release,
+                        after_in_child=_EXPORT_LOCK.release)
+
+def induced_edges(G, positions):
+    """
+    Edges of the subgraph of G induced by `positions`, without building the subgraph.
+    Only the rows of `positions` are read (not the whole edge array), so exporting from a
+    memory-mapped out-of-core graph touches just those rows.
+
+    Returns:
+        tuple: (u, v, w) arrays of positions in G, every edge once with u <= v, sorted by u
+        (w is None if G is unweighted)
+    """
+    positions = np.sort(np.asarray(positions, dtype=np.int64))
+    selected = np.zeros(G.number_of_nodes(), dtype=bool)
+    selected[positions] = True
+    offsets, rows = G.entries_of(positions)
+    cols = np.asarray(G.indices[offsets])
+    keep = selected[cols] & (rows <= cols)
+    offsets = offsets[keep]
+    return rows[keep], cols[keep], (np.asarray(G.weights[offsets]) if G.weights is not None else None)
+
+def _batches(n):
+    for start in range(0, n, WRITE_BATCH_SIZE):
+        yield start, min(start + WRITE_BATCH_SIZE, n)
+
+def write_gexf(path, G, positions, node_attrs=None):
+    """
+    Streams the subgraph of G induced by `positions` to a GEXF 1.2 file.
+
+    Args:
+        path (str): Output file.
+        G (CSRGraph): Source graph (never copied).
+        positions (np.ndarray): Positions of the nodes to export.
+        node_attrs (dict): {name: integer array aligned with `positions`}, e.g. community and degree.
+    """
+    node_attrs = node_attrs or {}
+    names = list(node_attrs)
+    ids = G.node_ids[positions].tolist()
+    values = [np.asarray(node_attrs[name]).tolist() for name in names]
+    u, v, w = induced_edges(G, positions)
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("<?xml version='1.0' encoding='utf-8'?>\n"
+                '<gexf xmlns="http://www.gexf.net/1.2draft" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                'xsi:schemaLocation="http://www.gexf.net/1.2draft http://www.gexf.net/1.2draft/gexf.xsd" version="1.2">\n'
+                f'  <meta lastmodifieddate="{datetime.date.today().isoformat()}">\n'
+                '    <creator>2022-Brazilian-Election-Retweet-Interaction-Analysis</creator>\n'
+                '  </meta>\n'
+                '  <graph defaultedgetype="undirected" mode="static" name="">\n')
+        if names:
+            f.write('    <attributes mode="static" class="node">\n')
+            for i, name in enumerate(names):
+                f.write(f'      <attribute id="{i}" title="{name}" type="long" />\n')
+            f.write('    </attributes>\n')
+
+        f.write('    <nodes>\n')
+        for start, end in _batches(len(ids)):
+            lines = []
+            for k in range(start, end):
+                if names:
+                    attvalues = "".join(
+                        f'          <attvalue for="{i}" value="{values[i][k]}" />\n' for i in range(len(names))
+                    )
+                    lines.append(f'      <node id="{ids[k]}" label="{ids[k]}">\n'
+                                 f'        <attvalues>\n{attvalues}        </attvalues>\n'
+                                 f'      </node>\n')
+                else:
+                    lines.append(f'      <node id="{ids[k]}" label="{ids[k]}" />\n')
+            f.write("".join(lines))
+        f.write('    </nodes>\n')
+
+        f.write('    <edges>\n')
+        src = G.node_ids[u].tolist()
+        dst = G.node_ids[v].tolist()
+        weights = w.tolist() if w is not None else None
+        for start, end in _batches(len(src)):
+            if weights is None:
+                f.write("".join(f'      <edge source="{src[k]}" target="{dst[k]}" id="{k}" />\n'
+                                for k in range(start, end)))
+            else:
+                f.write("".join(f'      <edge source="{src[k]}" target="{dst[k]}" id="{k}" weight="{weights[k]}" />\n'
+                                for k in range(start, end)))
+        f.write('    </edges>\n'
+                '  </graph>\n'
+                '</gexf>\n')
+
+def write_graphml(path, G, positions, node_attrs=None):
+    """Streams the subgraph of G induced by `positions` to a GraphML file (same arguments as write_gexf)."""
+    node_attrs = node_attrs or {}
+    names = list(node_attrs)
+    ids = G.node_ids[positions].tolist()
+    values = [np.asarray(node_attrs[name]).tolist() for name in names]
+    u, v, w = induced_edges(G, positions)
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("<?xml version='1.0' encoding='utf-8'?>\n"
+                '<graphml xmlns="http://graphml.graphdrawing.org/xmlns" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                'xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">\n')
+        for i, name in enumerate(names):
+            f.write(f'  <key id="d{i}" for="node" attr.name="{name}" attr.type="long" />\n')
+        if w is not None:
+            f.write(f'  <key id="d{len(names)}" for="edge" attr.name="weight" attr.type="double" />\n')
+        f.write('  <graph edgedefault="undirected">\n')
+
+        for start, end in _batches(len(ids)):
+            lines = []
+            for k in range(start, end):
+                data = "".join(f'      <data key="d{i}">{values[i][k]}</data>\n' for i in range(len(names)))
+                lines.append(f'    <node id="{ids[k]}">\n{data}    </node>\n' if data else f'    <node id="{ids[k]}" />\n')
+            f.write("".join(lines))
+
+        src = G.node_ids[u].tolist()
+        dst = G.node_ids[v].tolist()
+        weights = w.tolist() if w is not None else None
+        for start, end in _batches(len(src)):
+            if weights is None:
+                f.write("".join(f'    <edge source="{src[k]}" target="{dst[k]}" />\n' for k in range(start, end)))
+            else:
+                f.write("".join(f'    <edge source="{src[k]}" target="{dst[k]}">\n'
+                                f'      <data key="d{len(names)}">{weights[k]}</data>\n'
+                                f'    </edge>\n' for k in range(start, end)))
+        f.write('  </graph>\n'
+                '</graphml>\n')
+
+WRITERS = {"gexf": write_gexf, "graphml": write_graphml}
+
+def run_exports(jobs, max_workers=None):
+    """
+    Runs export jobs concurrently in a thread pool (one file per job).
+
+    Args:
+        jobs (list): (description, function, args) tuples.
+
+    Returns:
+        dict: {description: None on success, or the raised exception}
+    """
+    def run(job):
+        description, func, args = job
+        try:
+            with span("export.write", file=description, format=func.__name__):
+                func(*args)
+            print(f"Saved {description}")
+            return description, None
+        except Exception as e:
+            print(f"Error exporting {description}: {e}")
+            return description, e
+
+    if not jobs:
+        return {}
+    max_workers = max_workers or min(len(jobs), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(executor.map(run, jobs))
+
+class ExportQueue:
+    """
+    Runs export stages in one background thread, in submission order, so the pipeline
+    detects and scores the next algorithm while the files of the previous one are written.
+    The thread starts with the first submit and stops on close(); a later submit starts a
+    new one. A fork waits for the running stage to finish and no stage starts during it.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._futures = []
+
+    def submit(self, description, func, *args, on_done=None):
+        """
+        Queues `func(*args)`; `on_done(result)` runs in the export thread after it returns.
+        An exception is printed and does not stop the queue.
+        """
+        def run():
+            try:
+                with _EXPORT_LOCK:
+                    result = func(*args)
+                    if on_done is not None:
+                        on_done(result)
+                return True
+            except Exception as e:
+                print(f"Error exporting {description}: {e}")
+                return False
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="export")
+        self._futures.append(self._executor.submit(run))
+
+    def wait(self):
+        """Waits for every queued export stage; returns the number that failed."""
+        failed = sum(not future.result() for future in self._futures)
+        self._futures = []
+        return failed
+
+    def close(self):
+        """
+        Waits for every queued export stage and joins the export thread (e.g. before forking
+        worker processes); returns the number that failed.
+        """
+        failed = self.wait()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        return failed
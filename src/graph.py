@@ -0,0 +1,355 @@
+import numpy as np
+
+class CSRGraph:
+    """
+    Compact undirected graph stored in Compressed Sparse Row (CSR) form.
+
+    Every undirected edge (u, v) is stored twice (in rows u and v), a self-loop
+    is stored once. Nodes are addressed by their position 0..n-1; `node_ids`
+    maps positions back to the original node ids of the dataset.
+
+    Attributes:
+        indptr (np.ndarray): int64 array of size n+1, row offsets into `indices`.
+        indices (np.ndarray): int32 array with the neighbours of every row.
+        weights (np.ndarray or None): Edge weights aligned with `indices` (float64, or
+            int32 retweet counts when built from integer weights).
+        node_ids (np.ndarray): int64 array with the original id of every position.
+        arcs (tuple or None): Directed view (sources, targets, weights) with every ordered
+            pair once, kept for directed metrics/algorithms; the CSR itself is undirected.
+    """
+
+    def __init__(self, indptr, indices, node_ids, weights=None, arcs=None):
+        self.indptr = indptr
+        self.indices = indices
+        self.node_ids = node_ids
+        self.weights = weights
+        self.arcs = arcs
+        self._index = None
+        self._degrees = None
+        self._degree_order = None
+        self._degree_rank = None
+        self._edges = None
+        self._igraph = None
+        self._igraph_directed = None
+
+    @classmethod
+    def from_edges(cls, sources, targets, num_nodes, node_ids=None, weights=None):
+        """
+        Builds a CSRGraph from edge endpoint arrays given as positions in [0, num_nodes).
+
+        Duplicate edges are collapsed (as in nx.Graph): without weights they are
+        kept once, with weights their weights are summed (integer weights stay integers,
+        so repeated retweets collapse into int32 counts).
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        if node_ids is None:
+            node_ids = np.arange(num_nodes, dtype=np.int64)
+
+        # Canonical (low, high) key per undirected edge, then collapse duplicates
+        low = np.minimum(sources, targets)
+        high = np.maximum(sources, targets)
+        keys = low * num_nodes + high
+        if weights is None:
+            keys = np.unique(keys)
+            w = None
+        else:
+            weights = np.asarray(weights)
+            keys, inverse = np.unique(keys, return_inverse=True)
+            w = np.bincount(inverse, weights=weights, minlength=len(keys))
+            if np.issubdtype(weights.dtype, np.integer):
+                w = w.astype(weights.dtype)
+        low = keys // num_nodes
+        high = keys % num_nodes
+
+        # Store both directions, self-loops only once
+        off_diag = low != high
+        rows = np.concatenate([low, high[off_diag]])
+        cols = np.concatenate([high, low[off_diag]])
+        if w is not None:
+            w = np.concatenate([w, w[off_diag]])
+
+        order = np.argsort(rows, kind='stable')
+        indices = cols[order].astype(np.int32)
+        if w is not None:
+            w = w[order]
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=num_nodes), out=indptr[1:])
+        return cls(indptr, indices, np.asarray(node_ids, dtype=np.int64), w)
+
+    @classmethod
+    def from_networkx(cls, G, weight=None):
+        """
+        Builds a CSRGraph from a NetworkX graph with integer node ids.
+        If `weight` is given, that edge attribute (default 1) becomes the edge weight.
+        """
+        node_ids = np.fromiter(G.nodes(), dtype=np.int64, count=G.number_of_nodes())
+        position = {node: i for i, node in enumerate(node_ids.tolist())}
+        m = G.number_of_edges()
+        sources = np.empty(m, dtype=np.int64)
+        targets = np.empty(m, dtype=np.int64)
+        weights = np.empty(m, dtype=np.float64) if weight else None
+        for k, (u, v, data) in enumerate(G.edges(data=True)):
+            sources[k] = position[u]
+            targets[k] = position[v]
+            if weights is not None:
+                weights[k] = data.get(weight, 1)
+        return cls.from_edges(sources, targets, len(node_ids), node_ids=node_ids, weights=weights)
+
+    def number_of_nodes(self):
+        return len(self.indptr) - 1
+
+    def number_of_edges(self):
+        n_self_loops = int(np.count_nonzero(self._row_of_entries() == self.indices))
+        return (len(self.indices) + n_self_loops) // 2
+
+    def is_directed(self):
+        return False
+
+    def _row_of_entries(self):
+        """Row (source position) of every stored entry, aligned with `indices`."""
+        return np.repeat(np.arange(self.number_of_nodes(), dtype=np.int32), np.diff(self.indptr))
+
+    def entries_of(self, positions):
+        """
+        Offsets into `indices` (and `weights`) of the rows of `positions`, and the row of each entry.
+        Only those rows are read, so this stays cheap when `indices` is memory-mapped.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        starts = self.indptr[positions]
+        lengths = self.indptr[positions + 1] - starts
+        ends = np.cumsum(lengths)
+        offsets = np.arange(ends[-1] if len(ends) else 0, dtype=np.int64) + np.repeat(starts - ends + lengths, lengths)
+        return offsets, np.repeat(positions, lengths)
+
+    def row_blocks(self, max_entries):
+        """
+        Yields (start, end) position ranges whose rows hold at most `max_entries` entries
+        (a single longer row is a block by itself), to stream over the adjacency block by block.
+        """
+        return row_blocks(self.indptr, max_entries)
+
+    @property
+    def degrees(self):
+        """Degree of every position (self-loops count twice, as in NetworkX)."""
+        if self._degrees is None:
+            rows = self._row_of_entries()
+            self_loops = np.bincount(rows[rows == self.indices], minlength=self.number_of_nodes())
+            self._degrees = np.diff(self.indptr) + self_loops
+        return self._degrees
+
+    @property
+    def degree_order(self):
+        """
+        Positions sorted by decreasing degree (ties keep position order).
+        Sorted once per graph; cache.save_graph stores it next to the other arrays.
+        """
+        if self._degree_order is None:
+            self._degree_order = np.argsort(-self.degrees, kind='stable')
+        return self._degree_order
+
+    @property
+    def degree_rank(self):
+        """Rank of every position in `degree_order` (0 = highest degree)."""
+        if self._degree_rank is None:
+            rank = np.empty(self.number_of_nodes(), dtype=np.int64)
+            rank[self.degree_order] = np.arange(self.number_of_nodes())
+            self._degree_rank = rank
+        return self._degree_rank
+
+    def top_by_degree(self, k, positions=None):
+        """
+        The k highest-degree positions, overall or among `positions`, in decreasing degree order.
+        Only the selected k positions are sorted (argpartition on the precomputed ranks).
+        """
+        if positions is None:
+            return np.asarray(self.degree_order[:k])
+        positions = np.asarray(positions, dtype=np.int64)
+        ranks = self.degree_rank[positions]
+        if k <= 0:
+            return positions[:0]
+        if k < len(positions):
+            selected = np.argpartition(ranks, k - 1)[:k]
+            positions, ranks = positions[selected], ranks[selected]
+        return positions[np.argsort(ranks)]
+
+    def degree_order_by_label(self, labels):
+        """
+        Groups positions by label, every group in decreasing degree order.
+
+        Args:
+            labels (np.ndarray): Community index 0..k-1 of every position (negative = left out).
+
+        Returns:
+            tuple: (positions, offsets); group c is positions[offsets[c]:offsets[c + 1]], so its
+            top-n nodes are positions[offsets[c]:offsets[c] + n].
+        """
+        labels = np.asarray(labels)
+        order = np.asarray(self.degree_order)
+        order = order[labels[order] >= 0]
+        # Stable sort by label keeps the degree order inside every group
+        grouped = order[np.argsort(labels[order], kind='stable')]
+        k = int(labels.max()) + 1 if len(grouped) else 0
+        offsets = np.zeros(k + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels[grouped], minlength=k), out=offsets[1:])
+        return grouped, offsets
+
+    def strengths(self):
+        """Weighted degree of every position (self-loops count twice). Equals `degrees` if unweighted."""
+        if self.weights is None:
+            return self.degrees.astype(np.float64)
+        rows = self._row_of_entries()
+        w = np.where(rows == self.indices, 2 * self.weights, self.weights)
+        return np.bincount(rows, weights=w, minlength=self.number_of_nodes())
+
+    def total_weight(self):
+        """Sum of edge weights (number of edges if unweighted)."""
+        return float(self.strengths().sum()) / 2
+
+    def edge_array(self):
+        """
+        Returns every undirected edge once as (u, v, w) position arrays with u <= v.
+        `w` is None for unweighted graphs.
+        """
+        if self._edges is None:
+            rows = self._row_of_entries()
+            mask = rows <= self.indices
+            w = self.weights[mask] if self.weights is not None else None
+            self._edges = (rows[mask], self.indices[mask], w)
+        return self._edges
+
+    def index_of(self, nodes):
+        """Maps original node ids (scalar or array) to positions. Raises KeyError for unknown ids."""
+        if self._index is None:
+            order = np.argsort(self.node_ids, kind='stable')
+            self._index = (self.node_ids[order], order)
+        sorted_ids, order = self._index
+        nodes = np.asarray(nodes, dtype=np.int64)
+        pos = np.searchsorted(sorted_ids, nodes)
+        pos = np.minimum(pos, len(sorted_ids) - 1)
+        if len(sorted_ids) == 0 or np.any(sorted_ids[pos] != nodes):
+            raise KeyError("Unknown node id(s) for this graph")
+        return order[pos]
+
+    def labels_from_partition(self, partition, missing=-1):
+        """Converts a {node_id: community_id} dict to an int64 label array aligned with the positions."""
+        return np.fromiter(
+            (partition.get(n, missing) for n in self.node_ids.tolist()),
+            dtype=np.int64, count=self.number_of_nodes()
+        )
+
+    def partition_from_labels(self, labels):
+        """Converts a label array aligned with the positions back to a {node_id: community_id} dict."""
+        return dict(zip(self.node_ids.tolist(), np.asarray(labels).tolist()))
+
+    def subgraph(self, positions):
+        """Returns the subgraph induced by the given positions (in the given order), arcs included."""
+        positions = np.asarray(positions, dtype=np.int64)
+        n = self.number_of_nodes()
+        new_pos = np.full(n, -1, dtype=np.int64)
+        new_pos[positions] = np.arange(len(positions))
+        u, v, w = self.edge_array()
+        keep = (new_pos[u] >= 0) & (new_pos[v] >= 0)
+        H = CSRGraph.from_edges(
+            new_pos[u[keep]], new_pos[v[keep]], len(positions),
+            node_ids=self.node_ids[positions],
+            weights=w[keep] if w is not None else None
+        )
+        if self.arcs is not None:
+            s, t, aw = self.arcs
+            keep = (new_pos[s] >= 0) & (new_pos[t] >= 0)
+            H.arcs = (new_pos[s[keep]], new_pos[t[keep]], aw[keep])
+        return H
+
+    def directed_strengths(self):
+        """(out, in) weighted degrees of every position from `arcs` (None for undirected graphs)."""
+        if self.arcs is None:
+            return None
+        s, t, w = self.arcs
+        n = self.number_of_nodes()
+        return np.bincount(s, weights=w, minlength=n), np.bincount(t, weights=w, minlength=n)
+
+    def quotient(self, labels):
+        """
+        Collapses every community into a super-node.
+
+        Args:
+            labels (np.ndarray): Community index 0..k-1 of every position.
+
+        Returns:
+            CSRGraph: Weighted graph on k nodes (node ids 0..k-1). Edge weights sum the
+            weights between communities and every super-node has a self-loop carrying
+            its internal weight, so degrees and modularity are preserved.
+        """
+        labels = np.asarray(labels, dtype=np.int64)
+        k = int(labels.max()) + 1 if len(labels) else 0
+        u, v, w = self.edge_array()
+        if w is None:
+            w = np.ones(len(u), dtype=np.float64)
+        elif np.issubdtype(w.dtype, np.integer):
+            w = w.astype(np.int64)  # Summed retweet counts may not fit in int32
+        return CSRGraph.from_edges(labels[u], labels[v], k, weights=w)
+
+    def to_networkx(self, weight='weight'):
+        """Converts to an nx.Graph keyed by the original node ids (edge weights under `weight`)."""
+        import networkx as nx
+        G = nx.Graph()
+        G.add_nodes_from(self.node_ids.tolist())
+        u, v, w = self.edge_array()
+        ids_u = self.node_ids[u].tolist()
+        ids_v = self.node_ids[v].tolist()
+        if w is None:
+            G.add_edges_from(zip(ids_u, ids_v))
+        else:
+            G.add_weighted_edges_from(zip(ids_u, ids_v, w.tolist()), weight=weight)
+        return G
+
+    def to_igraph(self, directed=False):
+        """
+        Converts to an igraph.Graph whose vertex i is position i. Edge weights go to the `weight` attribute.
+        The igraph object is built straight from the edge arrays and cached, so repeated runs reuse it.
+        With `directed`, the graph is built from `arcs` (arc weights under `weight`).
+        """
+        if directed:
+            if self.arcs is None:
+                raise ValueError("This graph has no directed arcs")
+            if self._igraph_directed is None:
+                import igraph
+                s, t, w = self.arcs
+                H = igraph.Graph(n=self.number_of_nodes(), edges=np.column_stack((s, t)), directed=True)
+                H.es['weight'] = w
+                self._igraph_directed = H
+            return self._igraph_directed
+        if self._igraph is None:
+            import igraph
+            u, v, w = self.edge_array()
+            H = igraph.Graph(n=self.number_of_nodes(), edges=np.column_stack((u, v)), directed=False)
+            if w is not None:
+                H.es['weight'] = w
+            self._igraph = H
+        return self._igraph
+
+def row_blocks(indptr, max_entries):
+    """Yields (start, end) row ranges of a CSR row-offset array, each with at most `max_entries` entries (see CSRGraph.row_blocks)."""
+    n = len(indptr) - 1
+    start = 0
+    while start < n:
+        end = int(np.searchsorted(indptr, indptr[start] + max_entries, side='right')) - 1
+        end = min(max(end, start + 1), n)
+        yield start, end
+        start = end
+
+def as_networkx(G):
+    """Returns G as a NetworkX graph (converting a CSRGraph, passing anything else through)."""
+    if isinstance(G, CSRGraph):
+        return G.to_networkx()
+    return G
+
+def as_csr(G, weight=None):
+    """
+    Returns G as a CSRGraph (converting a NetworkX graph, passing a CSRGraph through).
+    When converting, `weight` names the edge attribute to keep as edge weight.
+    """
+    if isinstance(G, CSRGraph):
+        return G
+    return CSRGraph.from_networkx(G, weight=weight)
@@ -0,0 +1,205 @@
+"""
+Lightweight instrumentation: timed spans with wall time, CPU time and peak memory.
+
+Wrap a stage in `with span("name"):` or decorate a function with `@timed()`.
+Spans nest (per thread) and are kept in memory for the current process until
+`write_trace` saves them as JSON and in Chrome trace format (open it in
+chrome://tracing or https://ui.perfetto.dev).
+
+Peak memory is sampled by a background thread every SAMPLE_INTERVAL_S (and at
+the start and end of every span), so each span gets its own peak resident set
+size instead of the process-wide high-water mark. With `trace_allocations(True)`
+the peak of Python allocations (tracemalloc, NumPy included) is recorded as well,
+at a noticeable speed cost. `set_profiler` plugs a profiler around selected spans.
+"""
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+SAMPLE_INTERVAL_S = 0.01
+
+ENABLED = True
+
+_spans = []       # Finished spans of this process
+_open = []        # Open spans, whose peaks the sampler updates
+_lock = threading.Lock()
+_local = threading.local()
+_sampler = None
+_profiler_factory = None
+
+def _reset_after_fork():
+    # Threads do not survive fork and the parent's spans belong to the parent
+    global _lock, _local, _sampler, _spans, _open
+    _lock = threading.Lock()
+    _local = threading.local()
+    _sampler = None
+    _spans = []
+    _open = []
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def current_rss_mb():
+    """Current resident memory of this process in MB (the peak so far where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _traced_mb():
+    return tracemalloc.get_traced_memory()[0] / (1024 * 1024) if tracemalloc.is_tracing() else None
+
+def _update_peaks(records):
+    rss = current_rss_mb()
+    traced = _traced_mb()
+    for record in records:
+        if rss is not None:
+            record["peak_rss_mb"] = max(record["peak_rss_mb"] or 0, rss)
+        if traced is not None:
+            record["peak_traced_mb"] = max(record["peak_traced_mb"] or 0, traced)
+
+def _sample_forever():
+    while True:
+        time.sleep(SAMPLE_INTERVAL_S)
+        with _lock:
+            if _open:
+                _update_peaks(_open)
+
+def _ensure_sampler():
+    global _sampler
+    if _sampler is None:
+        _sampler = threading.Thread(target=_sample_forever, name="instrument-sampler", daemon=True)
+        _sampler.start()
+
+def trace_allocations(enabled=True):
+    """Starts (or stops) tracemalloc, so spans also record their peak of Python allocations."""
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def set_profiler(factory):
+    """
+    Installs a profiler hook: `factory(span_name)` returns a context manager entered around
+    every span (or None to skip that span). Pass None to remove the hook.
+    """
+    global _profiler_factory
+    _profiler_factory = factory
+
+def cprofile_hook(output_dir, names):
+    """Profiler factory for set_profiler: cProfile the spans named in `names` into `<output_dir>/<name>.prof`."""
+    names = set(names)
+
+    @contextmanager
+    def profile(name):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            os.makedirs(output_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(output_dir, f"{name}.prof"))
+
+    return lambda name: profile(name) if name in names else None
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Records a span around the enclosed block. Yields the span record (a dict), whose
+    `args` can be extended inside the block; its measurements are filled in on exit.
+    """
+    if not ENABLED:
+        yield {"name": name, "args": attrs}
+        return
+    _ensure_sampler()
+    stack = _local.__dict__.setdefault("stack", [])
+    record = {
+        "name": name,
+        "parent": stack[-1]["name"] if stack else None,
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+        "start": time.time(),
+        "peak_rss_mb": None,
+        "peak_traced_mb": None,
+        "args": dict(attrs),
+    }
+    _update_peaks([record])
+    with _lock:
+        _open.append(record)
+    stack.append(record)
+    profiler = (_profiler_factory(name) if _profiler_factory else None) or nullcontext()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        with profiler:
+            yield record
+    finally:
+        record["wall_s"] = time.perf_counter() - wall_start
+        record["cpu_s"] = time.process_time() - cpu_start  # Whole process, all threads
+        stack.pop()
+        with _lock:
+            _open.remove(record)
+            _update_peaks([record])
+            _spans.append(record)
+
+def timed(name=None):
+    """Decorator: records a span around every call (named `<module>.<function>` by default)."""
+    def decorator(func):
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def spans():
+    """Finished spans of this process (plus any merged with add_spans), in completion order."""
+    with _lock:
+        return list(_spans)
+
+def add_spans(records):
+    """Merges spans recorded in another process (e.g. a worker's spans returned with its result)."""
+    with _lock:
+        _spans.extend(records)
+
+def reset():
+    with _lock:
+        _spans.clear()
+
+def write_trace(json_path, chrome_path=None):
+    """Writes the recorded spans as a JSON list and, optionally, as a Chrome trace (complete events)."""
+    records = sorted(spans(), key=lambda r: r["start"])
+    with open(json_path, 'w') as f:
+        json.dump(records, f, indent=4)
+    if chrome_path:
+        events = [{
+            "name": r["name"],
+            "cat": r["name"].split(".", 1)[0],
+            "ph": "X",
+            "ts": r["start"] * 1e6,
+            "dur": r["wall_s"] * 1e6,
+            "pid": r["pid"],
+            "tid": r["tid"],
+            "args": {"cpu_s": r["cpu_s"], "peak_rss_mb": r["peak_rss_mb"],
+                     "peak_traced_mb": r["peak_traced_mb"], **r["args"]},
+        } for r in records]
+        with open(chrome_path, 'w') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
@@ -1,15 +1,29 @@
+import argparse
+import functools
+import importlib
 import os
 import sys
 import json
-import networkx as nx
-import pandas as pd
-from src import data_loader, algorithms, metrics
+import numpy as np
+# Only the light modules are imported here: detection backends, pandas and the export writers
+# are imported by the stages that use them, so the CLI starts fast (see benchmarks/bench_startup.py)
+from src import cache, manifest, parallel, partitions, instrument
 
 # Configuration
 RAW_DATA_PATH = "data/raw/eleicoes_2022.gml"
 CACHE_DIR = "data/processed"
 RESULTS_DIR = "results"
-GCC_CACHE_PATH = os.path.join(CACHE_DIR, "gcc_graph.pkl")
+PARTITIONS_DIR = os.path.join(RESULTS_DIR, "partitions")  # Columnar partition stores (graph_<key>/: one .npy label column per algorithm)
+TRACES_DIR = os.path.join(RESULTS_DIR, "traces")  # Stage traces (JSON and Chrome trace format)
+
+# Graph mode: WEIGHTED_GRAPH collapses repeated retweets into integer edge weights (retweet counts)
+# used by every algorithm and metric; DIRECTED_GRAPH also keeps the retweet direction
+# (directed modularity in the metrics, directed Leiden with the leidenalg backend)
+WEIGHTED_GRAPH = False
+DIRECTED_GRAPH = False
+
+# Preprocessing parameters that define the cached GCC (part of the cache key)
+GCC_PARAMS = {"component": "largest", "undirected": True, "weighted": WEIGHTED_GRAPH, "directed": DIRECTED_GRAPH}
 
 # Visualization Configuration
 EXPORT_TOP_50K = True
@@ -25,9 +39,13 @@ COMBINED_TOTAL_NODE_LIMIT = 5000   # Total nodes in the combined graph
 # Options: 'EQUAL' (split limit equally) or 'PROPORTIONAL' (split based on community size)
 COMBINED_NODE_DISTRIBUTION = 'PROPORTIONAL'
 
+# Options: 'gexf' or 'graphml'. Files are streamed from arrays and written concurrently.
+EXPORT_FORMAT = 'gexf'
+EXPORT_WORKERS = 4
+
 # Algorithm Configuration
-# Available: "louvain", "label_propagation", "greedy_modularity", "asyn_lpa", "girvan_newman"
-#            "hierarchical_greedy", "hierarchical_girvan", "leiden"
+# Available: "louvain", "label_propagation", "greedy_modularity", "greedy_modularity_approx", "asyn_lpa",
+#            "girvan_newman", "girvan_newman_approx", "hierarchical_greedy", "hierarchical_girvan", "leiden"
 # WARNING: "greedy_modularity" and "girvan_newman" are very slow/memory intensive on large graphs.
 # Use USE_SUBGRAPH = True for them.
 ALGORITHMS_TO_RUN = ["louvain", "label_propagation", "leiden", "hierarchical_greedy"] 
@@ -35,15 +53,155 @@ ALGORITHMS_TO_RUN = ["louvain", "label_propagation", "leiden", "hierarchical_gre
 # ALGORITHMS_TO_RUN = ["louvain", "label_propagation", "greedy_modularity", "asyn_lpa"] # Full run (risky) 
 # ALGORITHMS_TO_RUN = ["louvain", "label_propagation", "greedy_modularity", "asyn_lpa"] # Full run (risky) 
 
+# Number of coarsening levels (quotient graphs) built by the hierarchical variants before the meta algorithm
+HIERARCHICAL_LEVELS = 1
+
+# Keyword arguments passed to each algorithm (part of the run cache key). Without a "backend"
+# key the defaults of src/algorithms.py (LOUVAIN_BACKEND, ...) are used; they are part of the
+# code version in the run cache key.
+ALGORITHM_PARAMS = {
+    "louvain": {"resolution": 1.0},
+    "leiden": {"resolution": 1.0, "directed": DIRECTED_GRAPH},
+    "label_propagation": {"max_iter": 100, "tol": 0.0, "workers": 1},
+    "asyn_lpa": {"max_iter": 100, "tol": 0.0, "workers": 1},
+    "greedy_modularity": {"resolution": 1.0, "n_communities": None, "tolerance": 0.0},
+    # CNM whose merges may be up to `tolerance` (relative) below the best ΔQ: much faster on graphs with hubs
+    "greedy_modularity_approx": {"resolution": 1.0, "n_communities": None, "tolerance": 1e-3},
+    # workers None = a pool over every CPU, 1 inside --parallel workers (see betweenness.default_workers)
+    "girvan_newman_approx": {"k_pivots": 32, "max_levels": 20, "workers": None},
+    "hierarchical_greedy": {"levels": HIERARCHICAL_LEVELS},
+    "hierarchical_girvan": {"levels": HIERARCHICAL_LEVELS},
+}
+ALGORITHM_SEED = None  # Seed of the randomized algorithms (SEEDED_ALGORITHMS); None = not reproducible
+
+# Metrics Configuration
+BUBBLE_MIN_COMMUNITY_SIZE = 10  # Communities smaller than this are left out of the bubble metrics
+
+# Echo-Chamber Configuration
+# Adds the community flow matrix, the share of each community's cut going to each rival and the top
+# bridge users (participation coefficient, betweenness of their cut edges) to every metrics JSON
+# (key "echo_chambers"; not computed out of core). The edge betweenness does not depend on the partition:
+# it is estimated once per working graph from ECHO_BETWEENNESS_PIVOTS sampled sources and cached under CACHE_DIR.
+ECHO_CHAMBER_METRICS = True
+ECHO_BETWEENNESS_PIVOTS = 16  # 0 = rank bridge users by cut weight only
+ECHO_TOP_COMMUNITIES = 20     # Largest communities in the flow matrix (the others are summed into "other")
+ECHO_TOP_BRIDGES = 100
+
+# Null-Model Configuration
+# Re-runs every algorithm and its metrics on NULL_MODEL_SAMPLES degree-preserving randomizations of the
+# working graph, in a process pool (MAX_PARALLEL_WORKERS). Z-scores, null intervals and p-values of the
+# modularity, weighted conductance and internal density go to the metrics JSON ("null_model"), and the
+# z-scores to comparison.csv. Finished samples are checkpointed under CACHE_DIR/null_models: an interrupted
+# run resumes, and raising NULL_MODEL_SAMPLES only runs the new samples.
+# With --directed the arcs are randomized (in- and out-degrees kept), so directed Leiden stays directed.
+NULL_MODEL_SAMPLES = 0  # 0 = disabled
+NULL_MODEL_METHOD = "swap"  # "swap" (double edge swaps, exact degrees) or "configuration" (erased configuration model, faster)
+NULL_MODEL_SWAPS_PER_EDGE = 10
+NULL_MODEL_CONFIDENCE = 0.95
+
+# Parallel Configuration
+# Runs each algorithm (with its metrics) in its own worker process.
+# Workers memory-map the cached GCC arrays instead of receiving a pickled copy. They are forked, so
+# they inherit the configuration set from the command line; where fork is unavailable (Windows) the
+# algorithms run sequentially.
+PARALLEL_ALGORITHMS = False
+MAX_PARALLEL_WORKERS = os.cpu_count()
+ALGORITHM_TIMEOUT_S = None  # Seconds per algorithm before its worker is terminated (None = no limit)
+
+# Ensemble Configuration
+# When ENSEMBLE_SEEDS is not empty, randomized algorithms run once per seed (in parallel,
+# up to MAX_PARALLEL_WORKERS), the consensus partition is scored and the seeds, timings
+# and pairwise NMI/ARI stability are added to the metrics JSON.
+ENSEMBLE_SEEDS = []  # e.g. list(range(10))
+ENSEMBLE_CONSENSUS_THRESHOLD = 0.5  # Min fraction of runs that must co-assign an edge's endpoints
+
+# Run Cache Configuration
+# Partitions and metrics are cached under CACHE_DIR/runs, keyed by graph, subgraph, algorithm,
+# parameters, seed and code version. Changing only the metrics code or BUBBLE_MIN_COMMUNITY_SIZE
+# re-scores the cached partitions without re-running the detection.
+RUN_CACHE_MAX_MB = 2048  # Least recently used runs are evicted beyond this size
+
+# Resumable Runs
+# Every algorithm goes through the stages detect -> score -> export, and each completed stage is
+# recorded in MANIFEST_DIR with a key covering the graph, parameters, seed and code it depends on.
+# comparison.csv is rewritten as soon as each algorithm is scored, and a rerun (e.g. after a crash)
+# skips the stages recorded with the same key. Exports run in a background thread while the next
+# algorithm is detected and scored.
+RESUME_RUNS = True  # False (or --fresh) = re-run every stage (cached partitions are still reused)
+MANIFEST_DIR = os.path.join(RESULTS_DIR, "manifest")
+
+# Temporal Configuration
+# Slides a time window over the edge timestamps of the raw GML (edge attribute TIMESTAMP_ATTR) and
+# detects communities in every window, warm-starting from the previous window's partition.
+# The per-window modularity/conductance series is saved to results/metrics/temporal_<algorithm>.csv.
+TEMPORAL_ANALYSIS = False
+TIMESTAMP_ATTR = "timestamp"
+TEMPORAL_WINDOW = 3 * 24 * 3600  # Window length, in timestamp units (seconds for ISO dates)
+TEMPORAL_STEP = 24 * 3600        # Distance between window starts
+TEMPORAL_ALGORITHM = "leiden"    # "leiden" or "louvain"
+TEMPORAL_LEIDEN_ITERATIONS = 2   # Leiden iterations per window (warm starts converge quickly)
+
+# Out-of-Core Configuration (graphs whose edges do not fit in memory)
+# The GCC is built on disk (OUT_OF_CORE_DIR) and memory-mapped; label propagation and the metrics stream
+# over edge chunks, and only the quotient graph of the propagated labels is loaded in memory for each of
+# OUT_OF_CORE_ALGORITHMS. Node arrays plus one edge chunk must fit in MEMORY_BUDGET_MB.
+# -a/--algorithms selects among OUT_OF_CORE_ALGORITHMS; label propagation always runs.
+# Results are saved as "ooc_label_propagation" and "ooc_lpa+<algorithm>": the algorithms partition the
+# label-propagation communities (super-nodes), never the original nodes.
+OUT_OF_CORE = False
+MEMORY_BUDGET_MB = 4096
+OUT_OF_CORE_DIR = os.path.join(CACHE_DIR, "outofcore")
+OUT_OF_CORE_ALGORITHMS = ["leiden", "greedy_modularity"]
+OUT_OF_CORE_LPA_MAX_ITER = 20
+
+# Instrumentation Configuration
+# Every stage is timed (wall/CPU) with its peak RSS; runtime_s and peak_mem_mb go to comparison.csv.
+TRACE_ALLOCATIONS = False  # Also record peak Python/NumPy allocations with tracemalloc (slower)
+PROFILE_SPANS = []  # Span names to cProfile into TRACES_DIR, e.g. ["algorithms.run_leiden"]
+
 # Subgraph Configuration (Recommended for slow algorithms like Girvan-Newman)
 USE_SUBGRAPH = False
 SUBGRAPH_SIZE = 1000 # Number of nodes for the subgraph (Top Degree)
 
-def save_results(algorithm_name, partition, mod_score, bubble_metrics, weighted_avg_conductance, weighted_avg_internal_density, G_gcc):
-    """Saves analysis results to files."""
-    print(f"Saving results for {algorithm_name}...")
-    
-    # 1. Save Metrics
+# Algorithm registry: name -> ("module:function" in src, fixed keyword arguments).
+# Functions are imported on first use (get_algorithm), so listing or choosing algorithms
+# loads no detection code. Fixed arguments are "module:function" strings resolved the same way.
+ALGORITHM_REGISTRY = {
+    "louvain": ("algorithms:run_louvain", {}),
+    "label_propagation": ("algorithms:run_label_propagation", {}),
+    "greedy_modularity": ("algorithms:run_greedy_modularity", {}),
+    "greedy_modularity_approx": ("algorithms:run_greedy_modularity", {}),
+    "asyn_lpa": ("algorithms:run_asyn_lpa", {}),
+    "girvan_newman": ("algorithms:run_girvan_newman", {}),
+    "girvan_newman_approx": ("algorithms:run_girvan_newman_approx", {}),
+    # Hierarchical variants
+    "hierarchical_greedy": ("algorithms:run_hierarchical", {"meta_algo_func": "algorithms:run_greedy_modularity"}),
+    "hierarchical_girvan": ("algorithms:run_hierarchical", {"meta_algo_func": "algorithms:run_girvan_newman"}),
+    "leiden": ("algorithms:run_leiden", {}),
+}
+
+# Algorithms that accept a `seed` and can run in ensemble mode
+SEEDED_ALGORITHMS = {"louvain", "label_propagation", "asyn_lpa", "leiden"}
+
+_LOADED_ALGORITHMS = {}
+
+def _resolve(spec):
+    """Imports the function named by a "module:function" string (module in the src package)."""
+    module, name = spec.split(":")
+    return getattr(importlib.import_module(f"src.{module}"), name)
+
+def get_algorithm(name):
+    """Returns the function registered as `name`, importing its module on first use."""
+    if name not in _LOADED_ALGORITHMS:
+        spec, fixed = ALGORITHM_REGISTRY[name]
+        func = _resolve(spec)
+        if fixed:
+            func = functools.partial(func, **{key: _resolve(value) for key, value in fixed.items()})
+        _LOADED_ALGORITHMS[name] = func
+    return _LOADED_ALGORITHMS[name]
+
+def write_metrics_json(algorithm_name, mod_score, bubble_metrics, weighted_avg_conductance, weighted_avg_internal_density, extra_metrics=None):
+    """Writes results/metrics/<algorithm>_metrics.json. `extra_metrics` (dict) is merged into it."""
     metrics_data = {
         "algorithm": algorithm_name,
         "modularity": mod_score,
@@ -51,194 +209,695 @@ def save_results(algorithm_name, partition, mod_score, bubble_metrics, weighted_
         "weighted_avg_conductance": weighted_avg_conductance,
         "weighted_avg_internal_density": weighted_avg_internal_density
     }
+    if extra_metrics:
+        metrics_data.update(extra_metrics)
     
     metrics_file = os.path.join(RESULTS_DIR, "metrics", f"{algorithm_name}_metrics.json")
     with open(metrics_file, 'w') as f:
         json.dump(metrics_data, f, indent=4)
-        
-    # 2. Save Partition (CSV for easy loading)
-    df = pd.DataFrame(list(partition.items()), columns=['node_id', 'community_id'])
-    partition_file = os.path.join(RESULTS_DIR, "partitions", f"{algorithm_name}_partition.csv")
-    df.to_csv(partition_file, index=False)
-    
-    # Pre-calculate degrees for sorting
-    degrees = dict(G_gcc.degree())
+
+def write_comparison(rows):
+    """Writes results/metrics/comparison.csv atomically (rewritten every time an algorithm is scored)."""
+    import pandas as pd
+    path = os.path.join(RESULTS_DIR, "metrics", "comparison.csv")
+    tmp_path = f"{path}.tmp"
+    pd.DataFrame(rows).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+def export_algorithm(algorithm_name, G_gcc, store):
+    """
+    Export stage: writes the visualization files of the partition stored under `algorithm_name`
+    in `store`. Returns {path: None on success, or the raised exception}.
+    """
+    column = np.asarray(store.load(algorithm_name))
+    # Community index of every position, in order of first appearance along the node order
+    ids, first, inverse = np.unique(column, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind='stable')
+    rank = np.empty(len(ids), dtype=np.int64)
+    rank[order] = np.arange(len(ids))
+    labels = rank[inverse]
+    labels[column < 0] = -1  # Nodes without a community
+    return export_partition(algorithm_name, G_gcc, labels, ids[order].tolist())
+
+def export_partition(algorithm_name, G_gcc, labels, comm_ids):
+    """
+    Writes the visualization files of a partition given as community indices (`labels`,
+    aligned with G_gcc's positions, -1 = none) into `comm_ids`.
+    Returns {path: None on success, or the raised exception}.
+    """
+    from src import export
+
+    # Everything below works on arrays aligned with G_gcc's positions: no graph copies
+    degrees = G_gcc.degrees
+    write_graph = export.WRITERS[EXPORT_FORMAT]
+    jobs = []
+    community_values = np.array(comm_ids + [-1])[labels]  # Original community ids (-1 = none)
 
     # 3. Export Visualization (Top N nodes)
     if EXPORT_TOP_50K:
-        print(f"Exporting GEXF for Gephi (Top {TOP_50K_LIMIT} nodes)...")
-        try:
-            top_nodes = sorted(degrees, key=degrees.get, reverse=True)[:TOP_50K_LIMIT]
-            G_sub = G_gcc.subgraph(top_nodes).copy()
-            for node in G_sub.nodes():
-                G_sub.nodes[node]['community'] = partition.get(node, -1)
-                G_sub.nodes[node]['degree'] = degrees[node]
-            
-            visual_path = os.path.join(RESULTS_DIR, "visual", f"{algorithm_name}_top{TOP_50K_LIMIT}.gexf")
-            nx.write_gexf(G_sub, visual_path)
-            print(f"Saved visualization to {visual_path}")
-        except Exception as e:
-            print(f"Error exporting top nodes visualization: {e}")
-
-    # Group nodes by community for next steps
-    communities = {}
-    for node, comm_id in partition.items():
-        if comm_id not in communities:
-            communities[comm_id] = []
-        communities[comm_id].append(node)
-    
-    # Sort communities by size
-    sorted_communities = sorted(communities.items(), key=lambda x: len(x[1]), reverse=True)[:COMBINED_TOP_COMMUNITIES_COUNT]
+        print(f"Exporting {EXPORT_FORMAT.upper()} for Gephi (Top {TOP_50K_LIMIT} nodes)...")
+        top_nodes = G_gcc.top_by_degree(TOP_50K_LIMIT)
+        visual_path = os.path.join(RESULTS_DIR, "visual", f"{algorithm_name}_top{TOP_50K_LIMIT}.{EXPORT_FORMAT}")
+        jobs.append((f"visualization to {visual_path}", write_graph,
+                     (visual_path, G_gcc, top_nodes,
+                      {"community": community_values[top_nodes], "degree": degrees[top_nodes]})))
+
+    # Group nodes by community (each in decreasing degree order), sorted by size (ties keep first-appearance order)
+    by_degree, offsets = G_gcc.degree_order_by_label(labels)
+    sizes = np.diff(offsets)
+    top_comms = np.argsort(-sizes, kind='stable')[:COMBINED_TOP_COMMUNITIES_COUNT]
+    sorted_communities = [(comm_ids[c], by_degree[offsets[c]:offsets[c + 1]]) for c in top_comms]
 
     # 4. Export Top Communities individually
     if EXPORT_INDIVIDUAL_COMMUNITIES:
-        print(f"Exporting Top {COMBINED_TOP_COMMUNITIES_COUNT} Communities as separate GEXF files...")
-        try:
-            for comm_id, nodes in sorted_communities:
-                if len(nodes) > INDIVIDUAL_COMMUNITY_LIMIT:
-                    nodes = sorted(nodes, key=lambda n: degrees.get(n, 0), reverse=True)[:INDIVIDUAL_COMMUNITY_LIMIT]
-
-                comm_sub = G_gcc.subgraph(nodes).copy()
-                for n in comm_sub.nodes():
-                    comm_sub.nodes[n]['degree'] = degrees.get(n, 0)
-                    
-                comm_path = os.path.join(RESULTS_DIR, "visual", f"{algorithm_name}_community_{comm_id}.gexf")
-                nx.write_gexf(comm_sub, comm_path)
-                print(f"Saved community {comm_id} ({len(nodes)} nodes) to {comm_path}")
-        except Exception as e:
-            print(f"Error exporting individual communities: {e}")
+        print(f"Exporting Top {COMBINED_TOP_COMMUNITIES_COUNT} Communities as separate {EXPORT_FORMAT.upper()} files...")
+        for comm_id, nodes in sorted_communities:
+            nodes = nodes[:INDIVIDUAL_COMMUNITY_LIMIT]
+            comm_path = os.path.join(RESULTS_DIR, "visual", f"{algorithm_name}_community_{comm_id}.{EXPORT_FORMAT}")
+            jobs.append((f"community {comm_id} ({len(nodes)} nodes) to {comm_path}", write_graph,
+                         (comm_path, G_gcc, nodes, {"degree": degrees[nodes]})))
 
     # 5. Export Combined Top Communities
     if EXPORT_COMBINED_TOP_COMMUNITIES:
         print(f"Exporting Combined Top {COMBINED_TOP_COMMUNITIES_COUNT} Communities...")
-        try:
-            top_nodes_combined = []
-            
-            # Calculate limits per community
-            if COMBINED_NODE_DISTRIBUTION == 'EQUAL':
-                limit_per_comm = COMBINED_TOTAL_NODE_LIMIT // COMBINED_TOP_COMMUNITIES_COUNT
-                limits = {comm_id: limit_per_comm for comm_id, _ in sorted_communities}
-            elif COMBINED_NODE_DISTRIBUTION == 'PROPORTIONAL':
-                total_nodes_in_top = sum(len(nodes) for _, nodes in sorted_communities)
-                limits = {}
-                for comm_id, nodes in sorted_communities:
-                    # Proportion of the total limit based on community size relative to the sum of top communities
-                    prop = len(nodes) / total_nodes_in_top
-                    limits[comm_id] = int(prop * COMBINED_TOTAL_NODE_LIMIT)
-            else:
-                # Default to equal if unknown
-                limit_per_comm = COMBINED_TOTAL_NODE_LIMIT // COMBINED_TOP_COMMUNITIES_COUNT
-                limits = {comm_id: limit_per_comm for comm_id, _ in sorted_communities}
-
-            for comm_id, nodes in sorted_communities:
-                limit = limits.get(comm_id, 0)
-                if len(nodes) > limit:
-                    nodes_limited = sorted(nodes, key=lambda n: degrees.get(n, 0), reverse=True)[:limit]
-                else:
-                    nodes_limited = nodes
-                top_nodes_combined.extend(nodes_limited)
-                
-            G_top_combined = G_gcc.subgraph(top_nodes_combined).copy()
-            for n in G_top_combined.nodes():
-                G_top_combined.nodes[n]['community'] = partition.get(n, -1)
-                G_top_combined.nodes[n]['degree'] = degrees.get(n, 0)
-                
-            combined_path = os.path.join(RESULTS_DIR, "visual", f"{algorithm_name}_top{COMBINED_TOP_COMMUNITIES_COUNT}_combined.gexf")
-            nx.write_gexf(G_top_combined, combined_path)
-            print(f"Saved combined top communities to {combined_path}")
-
-        except Exception as e:
-            print(f"Error exporting combined visualization: {e}")
+        
+        # Calculate limits per community
+        if COMBINED_NODE_DISTRIBUTION == 'PROPORTIONAL':
+            total_nodes_in_top = sum(len(nodes) for _, nodes in sorted_communities)
+            # Proportion of the total limit based on community size relative to the sum of top communities
+            limits = [int(len(nodes) / total_nodes_in_top * COMBINED_TOTAL_NODE_LIMIT) for _, nodes in sorted_communities]
+        else:
+            # 'EQUAL' (also the default if unknown)
+            limits = [COMBINED_TOTAL_NODE_LIMIT // COMBINED_TOP_COMMUNITIES_COUNT] * len(sorted_communities)
+
+        top_nodes_combined = np.concatenate(
+            [nodes[:limit] for (_, nodes), limit in zip(sorted_communities, limits)]
+        ) if sorted_communities else np.array([], dtype=np.int64)
+        combined_path = os.path.join(RESULTS_DIR, "visual", f"{algorithm_name}_top{COMBINED_TOP_COMMUNITIES_COUNT}_combined.{EXPORT_FORMAT}")
+        jobs.append((f"combined top communities to {combined_path}", write_graph,
+                     (combined_path, G_gcc, top_nodes_combined,
+                      {"community": community_values[top_nodes_combined], "degree": degrees[top_nodes_combined]})))
+
+    # Write all files concurrently
+    errors = export.run_exports(jobs, max_workers=EXPORT_WORKERS)
+    return {args[0]: errors[description] for description, _, args in jobs}
+
+_BETWEENNESS = {}
+
+def bridge_betweenness(G_work, graph_key):
+    """
+    Edge betweenness of the working graph cached under `graph_key`, used to rank bridge users.
+    Estimated once per graph (fixed pivot seed) and cached under CACHE_DIR; None if ECHO_BETWEENNESS_PIVOTS is 0.
+    """
+    if not ECHO_BETWEENNESS_PIVOTS:
+        return None
+    from src import betweenness, echo_chambers
+    name = f"edge_betweenness_k{ECHO_BETWEENNESS_PIVOTS}_{cache.source_digest(betweenness, echo_chambers)}"
+    if (graph_key, name) not in _BETWEENNESS:
+        values = cache.load_derived(CACHE_DIR, graph_key, name)
+        if values is None:
+            print(f"Estimating edge betweenness ({ECHO_BETWEENNESS_PIVOTS} pivots) for the bridge users...")
+            values = echo_chambers.edge_betweenness(G_work, pivots=ECHO_BETWEENNESS_PIVOTS, seed=0)
+            cache.save_derived(CACHE_DIR, graph_key, name, values)
+        _BETWEENNESS[(graph_key, name)] = values
+    return _BETWEENNESS[(graph_key, name)]
+
+def run_ensemble(name, G_work):
+    """Runs a seeded algorithm once per ENSEMBLE_SEEDS entry and returns (consensus partition, ensemble metrics)."""
+    from src import ensemble, metrics
+    G_csr, labels, timings = ensemble.run_ensemble(G_work, get_algorithm(name), ENSEMBLE_SEEDS, max_workers=MAX_PARALLEL_WORKERS)
+    stability = ensemble.pairwise_stability(labels)
+    consensus, _ = ensemble.consensus_partition(G_csr, labels, threshold=ENSEMBLE_CONSENSUS_THRESHOLD)
+    run_modularity = [metrics.calculate_modularity(G_csr, G_csr.partition_from_labels(l)) for l in labels]
+    print(f"Ensemble stability: mean NMI {stability['mean_nmi']:.4f}, mean ARI {stability['mean_ari']:.4f}")
+
+    extra_metrics = {
+        "ensemble": {
+            "seeds": list(ENSEMBLE_SEEDS),
+            "run_time_s": timings,
+            "run_modularity": run_modularity,
+            "consensus_threshold": ENSEMBLE_CONSENSUS_THRESHOLD,
+            "consensus_num_communities": int(consensus.max()) + 1,
+            **stability
+        }
+    }
+    return G_csr.partition_from_labels(consensus), extra_metrics
+
+def run_null_model(name, func, params, G_work, graph_key, observed, code_version):
+    """
+    Runs `func` (with `params`) and the metrics on NULL_MODEL_SAMPLES randomizations of G_work and
+    returns the comparison of the `observed` scores with them (see null_models.summarize), or None
+    if the randomized graphs cannot be scored the way G_work was.
+    """
+    from src import metrics, null_models
+    key = cache.run_cache_key(graph_key, name, params, params.get("seed"),
+                              f"{code_version}_{cache.source_digest(null_models, metrics)}")
+    checkpoint_dir = os.path.join(CACHE_DIR, "null_models")
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    try:
+        samples = null_models.run_null_models(
+            G_work, func, params, n_samples=NULL_MODEL_SAMPLES, seed=ALGORITHM_SEED or 0, method=NULL_MODEL_METHOD,
+            swaps_per_edge=NULL_MODEL_SWAPS_PER_EDGE, min_size=BUBBLE_MIN_COMMUNITY_SIZE,
+            max_workers=MAX_PARALLEL_WORKERS, checkpoint_path=os.path.join(checkpoint_dir, f"{name}_{key}.json"),
+            checkpoint_key=key)
+    except ValueError as e:
+        print(f"WARNING: null model of {name} skipped: {e}")
+        return None
+    summary = null_models.summarize(observed, samples, confidence=NULL_MODEL_CONFIDENCE)
+    for metric, s in summary.items():
+        if s is not None:
+            z = f"{s['z_score']:.2f}" if s["z_score"] is not None else "n/a"
+            print(f"Null model {metric}: {s['observed']:.4f} vs {s['null_mean']:.4f} ± {s['null_std']:.4f} "
+                  f"(z = {z}, {NULL_MODEL_CONFIDENCE:.0%} null interval [{s['ci_low']:.4f}, {s['ci_high']:.4f}])")
+    return {"samples": len(samples), "method": NULL_MODEL_METHOD, "confidence": NULL_MODEL_CONFIDENCE, **summary}
+
+def algorithm_params(name):
+    """Keyword arguments of algorithm `name`: its ALGORITHM_PARAMS plus ALGORITHM_SEED if it is seeded."""
+    params = dict(ALGORITHM_PARAMS.get(name, {}))
+    if name in SEEDED_ALGORITHMS:
+        params["seed"] = ALGORITHM_SEED
+    return params
+
+def metrics_cache_key():
+    """Key of the metrics code and settings under which scores are cached with a run."""
+    from src import betweenness, echo_chambers, graph, metrics
+    key = f"{cache.source_digest(metrics, graph)}_min{BUBBLE_MIN_COMMUNITY_SIZE}"
+    if ECHO_CHAMBER_METRICS:
+        key += (f"_echo{cache.source_digest(echo_chambers, betweenness)}"
+                f"_k{ECHO_BETWEENNESS_PIVOTS}_top{ECHO_TOP_COMMUNITIES}_{ECHO_TOP_BRIDGES}")
+    return key
+
+def stage_keys(name, graph_key):
+    """
+    Manifest keys of the detect, score and export stages of algorithm `name` on the graph cached
+    under `graph_key`. Each key covers its stage's settings and code and the key of the stage before it.
+
+    Returns:
+        dict: {"detect", "score", "export"}
+    """
+    from src import algorithms, betweenness, cnm, ensemble, export, graph, lpa, null_models
+    params = algorithm_params(name)
+    detection_version = cache.source_digest(algorithms, lpa, cnm, graph, betweenness)
+    if ENSEMBLE_SEEDS and name in SEEDED_ALGORITHMS:
+        params = {**params, "ensemble_seeds": list(ENSEMBLE_SEEDS), "consensus_threshold": ENSEMBLE_CONSENSUS_THRESHOLD}
+        detection_version += f"_{cache.source_digest(ensemble)}"
+    detect_key = cache.run_cache_key(graph_key, name, params, params.get("seed"), detection_version)
+    null_settings = None
+    if NULL_MODEL_SAMPLES:
+        null_settings = [NULL_MODEL_SAMPLES, NULL_MODEL_METHOD, NULL_MODEL_SWAPS_PER_EDGE, NULL_MODEL_CONFIDENCE,
+                         cache.source_digest(null_models)]
+    score_key = manifest.stage_key(detect_key, metrics_cache_key(), DIRECTED_GRAPH, null_settings)
+    export_settings = [EXPORT_FORMAT, EXPORT_TOP_50K and TOP_50K_LIMIT,
+                       EXPORT_INDIVIDUAL_COMMUNITIES and INDIVIDUAL_COMMUNITY_LIMIT,
+                       EXPORT_COMBINED_TOP_COMMUNITIES and [COMBINED_TOTAL_NODE_LIMIT, COMBINED_NODE_DISTRIBUTION],
+                       COMBINED_TOP_COMMUNITIES_COUNT, cache.source_digest(export)]
+    return {"detect": detect_key, "score": score_key, "export": manifest.stage_key(detect_key, export_settings)}
+
+def process_algorithm(name, func, G_work, graph_key, store, run_manifest, keys):
+    """
+    Detect and score stages of one algorithm on G_work (the graph cached under `graph_key`).
+    The partition goes to `store` and the scores to its metrics JSON; both stages are recorded in
+    `run_manifest` under `keys` (see stage_keys), and a recorded detect stage is resumed from `store`.
+    Partitions and metrics are also reused from the run cache when the graph, parameters, seed and
+    code match. Returns the comparison row of the algorithm.
+    """
+    from src import algorithms, betweenness, cnm, echo_chambers, graph, lpa, metrics
+    with instrument.span("main.process_algorithm", algorithm=name) as stage:
+        print(f"\n--- Processing {name} ---")
     
-    print(f"Results saved to {RESULTS_DIR}")
+        partition = None
+        extra_metrics = None
+        use_ensemble = bool(ENSEMBLE_SEEDS) and name in SEEDED_ALGORITHMS
+        params = algorithm_params(name)
+        detection_version = cache.source_digest(algorithms, lpa, cnm, graph, betweenness)
+        run_key = None if use_ensemble else cache.run_cache_key(graph_key, name, params, params.get("seed"), detection_version)
 
-def main():
-    print("--- Starting Social Network Analysis Pipeline ---")
+        detected = run_manifest.completed(f"detect/{name}", keys["detect"])
+        stored = store.load(name) if detected else None
+        if stored is not None:
+            print(f"Resuming {name} from its recorded partition...")
+            partition = G_work.partition_from_labels(stored)
+            extra_metrics = detected["output"]
+        elif use_ensemble:
+            # Always re-run: the stability scores are part of the results
+            partition, extra_metrics = run_ensemble(name, G_work)
+        else:
+            labels = cache.load_run(CACHE_DIR, run_key)
+            if labels is not None:
+                print(f"Loading cached partition for {name} (run {run_key})...")
+                partition = G_work.partition_from_labels(labels)
+            else:
+                partition = func(G_work, **params)
+                cache.save_run(CACHE_DIR, run_key, G_work.labels_from_partition(partition),
+                               meta={"graph_key": graph_key, "algorithm": name, "params": params, "code_version": detection_version})
+        if stored is None:
+            # Label column aligned with the graph's node order; the old record goes first, as it no
+            # longer describes the column (nor the metrics and exports of the stages after it)
+            run_manifest.discard(f"detect/{name}")
+            store.save(name, G_work.labels_from_partition(partition))
+            run_manifest.record(f"detect/{name}", keys["detect"], extra_metrics)
+        
+        # Metrics
+        metrics_key = metrics_cache_key()
+        scores = cache.load_run_metrics(CACHE_DIR, run_key, metrics_key) if run_key else None
+        if scores is None:
+            print(f"Calculating metrics for {name}...")
+            bubble_metrics = metrics.calculate_bubble_metrics(G_work, partition, min_size=BUBBLE_MIN_COMMUNITY_SIZE)
+            scores = {
+                "modularity": metrics.calculate_modularity(G_work, partition),
+                "bubble_metrics": bubble_metrics,
+                "partition_stats": metrics.calculate_partition_stats(G_work, partition),
+                # Calculate weighted average metrics
+                "weighted_avg_conductance": metrics.calculate_weighted_avg_conductance(bubble_metrics),
+                "weighted_avg_internal_density": metrics.calculate_weighted_avg_internal_density(bubble_metrics)
+            }
+            if DIRECTED_GRAPH:
+                scores["directed_modularity"] = metrics.calculate_directed_modularity(G_work, partition)
+            if ECHO_CHAMBER_METRICS:
+                scores["echo_chambers"] = echo_chambers.calculate_echo_chamber_metrics(
+                    G_work, partition, betweenness=bridge_betweenness(G_work, graph_key),
+                    directed=DIRECTED_GRAPH and G_work.arcs is not None, min_size=BUBBLE_MIN_COMMUNITY_SIZE,
+                    top_communities=ECHO_TOP_COMMUNITIES, top_bridges=ECHO_TOP_BRIDGES)
+            if run_key:
+                cache.save_run_metrics(CACHE_DIR, run_key, metrics_key, scores)
+        else:
+            print(f"Using cached metrics for {name}.")
+    
+        mod_score = scores["modularity"]
+        bubble_metrics = scores["bubble_metrics"]
+        part_stats = scores["partition_stats"]
+        weighted_avg_conductance = scores["weighted_avg_conductance"]
+        weighted_avg_internal_density = scores["weighted_avg_internal_density"]
+    
+        print(f"Modularity: {mod_score:.4f}")
+        print(f"Communities found: {part_stats['num_communities']}")
+        print(f"Weighted Avg Conductance: {weighted_avg_conductance:.4f}")
+        print(f"Weighted Avg Internal Density: {weighted_avg_internal_density:.4f}")
+        if scores.get("directed_modularity") is not None:
+            print(f"Directed Modularity: {scores['directed_modularity']:.4f}")
+            extra_metrics = {**(extra_metrics or {}), "directed_modularity": scores["directed_modularity"]}
+        if scores.get("echo_chambers") is not None:
+            echo = scores["echo_chambers"]
+            print(f"Cut weight fraction: {echo['cut_weight_fraction']:.4f}, "
+                  f"mean participation: {echo['mean_participation']:.4f}")
+            extra_metrics = {**(extra_metrics or {}), "echo_chambers": echo}
+        null_summary = None
+        if NULL_MODEL_SAMPLES:
+            null_summary = run_null_model(name, func, params, G_work, graph_key, scores, detection_version)
+            extra_metrics = {**(extra_metrics or {}), "null_model": null_summary}
+    
+        # Save
+        print(f"Saving results for {name}...")
+        write_metrics_json(name, mod_score, bubble_metrics, weighted_avg_conductance, weighted_avg_internal_density, extra_metrics)
     
+    row = {
+        "algorithm": name,
+        "modularity": mod_score,
+        "num_communities": part_stats['num_communities'],
+        "avg_community_size": part_stats['avg_community_size'],
+        "weighted_avg_conductance": weighted_avg_conductance,
+        "weighted_avg_internal_density": weighted_avg_internal_density,
+        "runtime_s": stage["wall_s"],
+        "peak_mem_mb": stage["peak_rss_mb"]
+    }
+    if DIRECTED_GRAPH:
+        row["directed_modularity"] = scores.get("directed_modularity")
+    if null_summary is not None:
+        for metric in ("modularity", "weighted_avg_conductance", "weighted_avg_internal_density"):
+            row[f"{metric}_z"] = (null_summary[metric] or {}).get("z_score")
+    metrics_file = os.path.join(RESULTS_DIR, "metrics", f"{name}_metrics.json")
+    run_manifest.record(f"score/{name}", keys["score"], row, files=[metrics_file])
+    return row
+
+def run_temporal_analysis():
+    """Runs the sliding-window analysis on the raw GML and saves the per-window series."""
+    import pandas as pd
+    from src import temporal
+    if not TEMPORAL_WINDOW > 0 or not TEMPORAL_STEP > 0:
+        raise ValueError(f"TEMPORAL_WINDOW and TEMPORAL_STEP must be > 0 (got {TEMPORAL_WINDOW} and {TEMPORAL_STEP})")
+    print(f"\n--- Temporal analysis ({TEMPORAL_ALGORITHM}, window {TEMPORAL_WINDOW}, step {TEMPORAL_STEP}) ---")
+    if not os.path.exists(RAW_DATA_PATH):
+        print(f"WARNING: {RAW_DATA_PATH} not found, skipping the temporal analysis.")
+        return
+    try:
+        node_ids, sources, targets, times = temporal.load_timed_edges(RAW_DATA_PATH, TIMESTAMP_ATTR)
+    except ValueError as e:
+        print(f"WARNING: {e}, skipping the temporal analysis.")
+        return
+
+    func = get_algorithm(TEMPORAL_ALGORITHM)
+    kwargs = {"n_iterations": TEMPORAL_LEIDEN_ITERATIONS} if TEMPORAL_ALGORITHM == "leiden" else {}
+    rows = temporal.run_sliding_windows(node_ids, sources, targets, times, TEMPORAL_WINDOW, TEMPORAL_STEP, func,
+                                        seed=ALGORITHM_SEED, min_size=BUBBLE_MIN_COMMUNITY_SIZE, **kwargs)
+    series_path = os.path.join(RESULTS_DIR, "metrics", f"temporal_{TEMPORAL_ALGORITHM}.csv")
+    pd.DataFrame(rows).to_csv(series_path, index=False)
+    print(f"Saved {len(rows)} windows to {series_path}")
+
+def save_out_of_core_results(name, G, labels, totals, store, exports, extra_metrics=None):
+    """
+    Computes the metrics of an out-of-core partition from its streamed totals, saves its
+    results, queues its exports on `exports` (export.ExportQueue) and returns its comparison
+    row (without the stage measurements).
+    """
+    from src import metrics, outofcore
+    sizes = totals["sizes"]
+    bubble_metrics = metrics.bubble_metrics_from_counts(
+        list(range(len(sizes))), sizes, totals["internal_edges"], totals["cut"], totals["volume"],
+        totals["volume"].sum(), min_size=BUBBLE_MIN_COMMUNITY_SIZE)
+    mod_score = outofcore.modularity(totals)
+    weighted_avg_conductance = metrics.calculate_weighted_avg_conductance(bubble_metrics)
+    weighted_avg_internal_density = metrics.calculate_weighted_avg_internal_density(bubble_metrics)
+    print(f"Modularity: {mod_score:.4f}")
+    print(f"Communities found: {len(sizes)}")
+    print(f"Weighted Avg Conductance: {weighted_avg_conductance:.4f}")
+
+    print(f"Saving results for {name}...")
+    write_metrics_json(name, mod_score, bubble_metrics, weighted_avg_conductance, weighted_avg_internal_density, extra_metrics)
+    store.save(name, labels)
+    exports.submit(name, export_partition, name, G, labels, list(range(len(sizes))))
+    return {
+        "algorithm": name,
+        "modularity": mod_score,
+        "num_communities": len(sizes),
+        "avg_community_size": float(sizes.mean()),
+        "weighted_avg_conductance": weighted_avg_conductance,
+        "weighted_avg_internal_density": weighted_avg_internal_density,
+    }
+
+def run_out_of_core():
+    """
+    Out-of-core pipeline: on-disk GCC, streamed label propagation, OUT_OF_CORE_ALGORITHMS on the
+    quotient graph of its labels (rows "ooc_lpa+<algorithm>": each of their communities is a
+    union of label-propagation communities), and streamed metrics. comparison.csv is rewritten after every
+    algorithm while the exports run in the background. Returns the comparison rows.
+    """
+    from src import export, outofcore
+    if not os.path.exists(RAW_DATA_PATH):
+        raise FileNotFoundError(f"File not found: {RAW_DATA_PATH}")
+    os.makedirs(OUT_OF_CORE_DIR, exist_ok=True)
+    gcc_key = cache.graph_cache_key(RAW_DATA_PATH, {**GCC_PARAMS, "out_of_core": True}, CACHE_DIR)
+    if DIRECTED_GRAPH:
+        print("WARNING: DIRECTED_GRAPH is not supported out of core, using the undirected graph.")
+    gcc_dir = os.path.join(OUT_OF_CORE_DIR, f"gcc_{gcc_key}")
+    with instrument.span("main.load_gcc", out_of_core=True):
+        G = outofcore.load_gcc(gcc_dir)
+        if G is None:
+            G = outofcore.build_gcc(RAW_DATA_PATH, gcc_dir, MEMORY_BUDGET_MB, weighted=WEIGHTED_GRAPH)
+    max_entries = outofcore.chunk_entries(MEMORY_BUDGET_MB, G.number_of_nodes())
+    store = partitions.PartitionStore(PARTITIONS_DIR, gcc_key, G.node_ids)
+    exports = export.ExportQueue()
+
+    print("\n--- Processing ooc_label_propagation ---")
+    with instrument.span("main.process_algorithm", algorithm="ooc_label_propagation") as stage:
+        micro, changes = outofcore.label_propagation(G, max_entries, seed=ALGORITHM_SEED, max_iter=OUT_OF_CORE_LPA_MAX_ITER)
+        totals, Q = outofcore.aggregate_communities(G, micro, max_entries)
+        print(f"Quotient graph: {Q.number_of_nodes()} super-nodes, {Q.number_of_edges()} edges.")
+        row = save_out_of_core_results("ooc_label_propagation", G, micro, totals, store, exports,
+                                       {"label_changes_per_pass": changes})
+    rows = [{**row, "runtime_s": stage["wall_s"], "peak_mem_mb": stage["peak_rss_mb"]}]
+    write_comparison(rows)
+
+    for name in OUT_OF_CORE_ALGORITHMS:
+        result_name = f"ooc_lpa+{name}"
+        print(f"\n--- Processing {result_name} ---")
+        with instrument.span("main.process_algorithm", algorithm=result_name) as stage:
+            partition = get_algorithm(name)(Q, **algorithm_params(name))
+            q_labels = np.unique(Q.labels_from_partition(partition), return_inverse=True)[1]
+            labels = q_labels[micro]
+            totals, _ = outofcore.aggregate_communities(G, labels, max_entries)
+            row = save_out_of_core_results(result_name, G, labels, totals, store, exports)
+        rows.append({**row, "runtime_s": stage["wall_s"], "peak_mem_mb": stage["peak_rss_mb"]})
+        write_comparison(rows)
+    exports.close()
+    return rows
+
+def _algorithm_worker(name, graph_dir, graph_key, keys, result_path):
+    """
+    Worker process entry point: attaches to the memory-mapped graph and processes one algorithm.
+    Runs in a forked process, with the parent's configuration (ALGORITHM_SEED, ALGORITHM_PARAMS, ...).
+    """
+    G_work = cache.load_graph(graph_dir, graph_key, mmap=True)
+    store = partitions.PartitionStore(PARTITIONS_DIR, graph_key, G_work.node_ids)
+    run_manifest = manifest.RunManifest(MANIFEST_DIR, resume=RESUME_RUNS)
+    row = process_algorithm(name, get_algorithm(name), G_work, graph_key, store, run_manifest, keys)
+    # The worker's spans travel with its result and are merged into the pipeline trace
+    parallel.write_result(result_path, {**row, "spans": instrument.spans()})
+
+def run_algorithms_parallel(names, graph_dir, graph_key, keys, on_row=None):
+    """
+    Runs the given algorithms in worker processes (`keys`: {name: stage_keys(name, graph_key)})
+    and returns their comparison rows in `names` order. `on_row(name, row)` is called as soon as
+    each algorithm finishes, while the others keep running.
+    """
+    result_dir = os.path.join(graph_dir, f"results_{graph_key}")
+    os.makedirs(result_dir, exist_ok=True)
+    result_paths = {name: os.path.join(result_dir, f"{name}.json") for name in names}
+    for path in result_paths.values():
+        if os.path.exists(path):
+            os.remove(path)
+
+    rows = {}
+
+    def finished(name, status):
+        row = parallel.read_result(result_paths[name])
+        if row is None:
+            print(f"WARNING: {name} produced no results ({status}).")
+            return
+        instrument.add_spans(row.pop("spans", []))
+        rows[name] = row
+        if on_row is not None:
+            on_row(name, row)
+
+    tasks = [(name, _algorithm_worker, (name, graph_dir, graph_key, keys[name], result_paths[name])) for name in names]
+    parallel.run_in_processes(tasks, max_workers=MAX_PARALLEL_WORKERS, timeout=ALGORITHM_TIMEOUT_S, on_finish=finished)
+    return [rows[name] for name in names if name in rows]
+
+def run_in_memory():
+    """
+    In-memory pipeline: loads (or reuses) the cached GCC and runs ALGORITHMS_TO_RUN, skipping the
+    stages recorded in MANIFEST_DIR. comparison.csv is rewritten as each algorithm is scored and
+    the exports run in the background. Returns the comparison rows.
+    """
+    from src import data_loader, export
     # 1. Load Graph & GCC
-    G_gcc = data_loader.load_processed_data(GCC_CACHE_PATH)
-    if G_gcc is None:
-        G = data_loader.load_graph(RAW_DATA_PATH)
-        G_gcc = data_loader.get_gcc(G)
-        data_loader.save_processed_data(G_gcc, GCC_CACHE_PATH)
-    else:
-        print("Loaded GCC from cache.")
+    with instrument.span("main.load_gcc"):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        if os.path.exists(RAW_DATA_PATH):
+            gcc_key = cache.graph_cache_key(RAW_DATA_PATH, GCC_PARAMS, CACHE_DIR)
+        else:
+            # Raw file not available: fall back to the latest GCC built with the same parameters
+            gcc_key = cache.find_latest_key(CACHE_DIR, GCC_PARAMS)
+            if gcc_key is not None:
+                print(f"WARNING: {RAW_DATA_PATH} not found, using latest cached GCC ({gcc_key}).")
+
+        G_gcc = cache.load_graph(CACHE_DIR, gcc_key) if gcc_key is not None else None
+        if G_gcc is None:
+            G_gcc = data_loader.load_gcc(RAW_DATA_PATH, weighted=WEIGHTED_GRAPH, directed=DIRECTED_GRAPH)
+            cache.save_graph(G_gcc, CACHE_DIR, gcc_key, params=GCC_PARAMS, raw_path=RAW_DATA_PATH)
+        else:
+            print(f"Loaded GCC from cache: {G_gcc.number_of_nodes()} nodes, {G_gcc.number_of_edges()} edges.")
     
     # Apply Subgraph if configured
+    work_key = gcc_key
     if USE_SUBGRAPH:
         print(f"WARNING: Running on a SUBGRAPH of size {SUBGRAPH_SIZE} (Top Degree Nodes).")
-        degrees = dict(G_gcc.degree())
-        top_nodes = sorted(degrees, key=degrees.get, reverse=True)[:SUBGRAPH_SIZE]
-        G_work = G_gcc.subgraph(top_nodes).copy()
+        with instrument.span("main.subgraph", size=SUBGRAPH_SIZE):
+            top_positions = G_gcc.top_by_degree(SUBGRAPH_SIZE)
+            G_work = G_gcc.subgraph(top_positions)
         print(f"Subgraph created: {G_work.number_of_nodes()} nodes, {G_work.number_of_edges()} edges.")
+        work_key = f"{gcc_key}_top{SUBGRAPH_SIZE}"
     else:
         G_work = G_gcc
 
-    # 2. Run Algorithms
-    all_algos = {
-        "louvain": algorithms.run_louvain,
-        "label_propagation": algorithms.run_label_propagation,
-        "greedy_modularity": algorithms.run_greedy_modularity,
-        "asyn_lpa": algorithms.run_asyn_lpa,
-        "girvan_newman": algorithms.run_girvan_newman,
-        # Hierarchical variants
-        "hierarchical_greedy": lambda g: algorithms.run_hierarchical(g, meta_algo_func=algorithms.run_greedy_modularity),
-        "hierarchical_girvan": lambda g: algorithms.run_hierarchical(g, meta_algo_func=algorithms.run_girvan_newman),
-        "leiden": algorithms.run_leiden
-    }
-    
-    # Filter algorithms based on configuration
-    algos = {k: v for k, v in all_algos.items() if k in ALGORITHMS_TO_RUN}
-    
-    comparison_results = []
+    # The results store only holds the partitions of the current working graph
+    store = partitions.PartitionStore(PARTITIONS_DIR, work_key, G_work.node_ids)
+    run_manifest = manifest.RunManifest(MANIFEST_DIR, resume=RESUME_RUNS)
+    if run_manifest.completed("gcc", work_key) is None:
+        run_manifest.record("gcc", work_key, {"nodes": G_work.number_of_nodes(), "edges": G_work.number_of_edges()})
+
+    # 2. Run Algorithms (filtered based on configuration)
+    names = [name for name in ALGORITHM_REGISTRY if name in ALGORITHMS_TO_RUN]
+    keys = {name: stage_keys(name, work_key) for name in names}
+    rows = {}
+    exports = export.ExportQueue()
+    held_exports = []  # Algorithms scored while worker processes are forked, exported after
+
+    def completed(stage, name):
+        # The files of a stage are shared by every run of its algorithm: they are only current
+        # while the algorithm's detect stage is still the one recorded
+        if run_manifest.completed(f"detect/{name}", keys[name]["detect"]) is None:
+            return None
+        return run_manifest.completed(f"{stage}/{name}", keys[name][stage])
+
+    def queue_export(name):
+        def exported(errors):
+            if not any(errors.values()):
+                run_manifest.record(f"export/{name}", keys[name]["export"], files=list(errors))
+
+        # Written in the background while the next algorithm runs
+        exports.submit(name, export_algorithm, name, G_work, store, on_done=exported)
+
+    def scored(name, row, hold_export=False):
+        # comparison.csv always holds every algorithm scored so far
+        rows[name] = row
+        write_comparison([rows[n] for n in names if n in rows])
+        if completed("export", name) is not None:
+            print(f"Exports of {name} already written.")
+        elif hold_export:
+            held_exports.append(name)
+        else:
+            queue_export(name)
+
+    for name in names:
+        record = completed("score", name)
+        if record is not None:
+            print(f"Skipping {name}: already scored (manifest {MANIFEST_DIR}).")
+            scored(name, record["output"])
+    pending = [name for name in names if name not in rows]
+    if PARALLEL_ALGORITHMS and pending and not parallel.fork_available():
+        print("WARNING: worker processes cannot be forked on this platform, running the algorithms sequentially.")
+
+    if PARALLEL_ALGORITHMS and pending and parallel.fork_available():
+        if ECHO_CHAMBER_METRICS:
+            # Estimated (and cached) once here instead of in every worker
+            with instrument.span("main.bridge_betweenness"):
+                bridge_betweenness(G_work, work_key)
+        # Workers attach to the on-disk copy of the working graph
+        if USE_SUBGRAPH:
+            cache.save_graph(G_work, CACHE_DIR, work_key, params={**GCC_PARAMS, "subgraph": SUBGRAPH_SIZE})
+        # A forked worker inherits the locks the export thread holds at that moment (in the
+        # allocator, stdio, ...) but not the thread, and could deadlock on them: the queue is
+        # drained and its thread joined before any fork, and the exports of the algorithms
+        # scored meanwhile are queued once every worker has finished
+        with instrument.span("main.wait_exports"):
+            exports.close()
+        run_algorithms_parallel(pending, CACHE_DIR, work_key, keys,
+                                on_row=functools.partial(scored, hold_export=True))
+        for name in held_exports:
+            queue_export(name)
+    else:
+        for name in pending:
+            scored(name, process_algorithm(name, get_algorithm(name), G_work, work_key, store, run_manifest, keys[name]))
+
+    with instrument.span("main.wait_exports"):
+        exports.close()
+    return [rows[name] for name in names if name in rows]
+
+def parse_args(argv=None):
+    """
+    Parses the command line. Every option defaults to the configuration constant above,
+    so `python -m src.main` without arguments runs the configured pipeline.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m src.main",
+        description="Community detection and echo-chamber metrics on a retweet network.")
+    parser.add_argument("--input", default=RAW_DATA_PATH, help="Input .gml file (default: %(default)s)")
+    parser.add_argument("-a", "--algorithms", nargs="+", metavar="NAME", choices=list(ALGORITHM_REGISTRY),
+                        help="Algorithms to run, among: %(choices)s "
+                        f"(default: {ALGORITHMS_TO_RUN}). With --out-of-core, selects among "
+                        f"{OUT_OF_CORE_ALGORITHMS} (label propagation always runs)")
+    parser.add_argument("--list-algorithms", action="store_true", help="List the algorithms and exit")
+    parser.add_argument("--seed", type=int, default=ALGORITHM_SEED, help="Seed of the randomized algorithms")
+    parser.add_argument("--subgraph-size", type=int, metavar="N", default=SUBGRAPH_SIZE if USE_SUBGRAPH else 0,
+                        help="Run on the N highest-degree nodes of the GCC (0 = whole GCC, default: %(default)s)")
+    parser.add_argument("--weighted", action="store_true", default=WEIGHTED_GRAPH,
+                        help="Collapse repeated retweets into edge weights")
+    parser.add_argument("--directed", action="store_true", default=DIRECTED_GRAPH,
+                        help="Keep the retweet direction (directed modularity, directed Leiden)")
+    parser.add_argument("--parallel", action="store_true", default=PARALLEL_ALGORITHMS,
+                        help="Run each algorithm in its own worker process")
+    parser.add_argument("--temporal", action="store_true", default=TEMPORAL_ANALYSIS,
+                        help="Also run the sliding-window analysis")
+    parser.add_argument("--out-of-core", action="store_true", default=OUT_OF_CORE,
+                        help="Stream the graph from disk under --memory-budget")
+    parser.add_argument("--memory-budget", type=int, metavar="MB", default=MEMORY_BUDGET_MB,
+                        help="Memory budget of the out-of-core mode (default: %(default)s)")
+    parser.add_argument("--null-samples", type=int, metavar="N", default=NULL_MODEL_SAMPLES,
+                        help="Score every algorithm against N degree-preserving randomized graphs (0 = skip)")
+    parser.add_argument("--fresh", dest="resume", action="store_false", default=RESUME_RUNS,
+                        help="Re-run every stage instead of skipping those recorded in the run manifest")
+
+    exports = parser.add_argument_group("visualization exports")
+    exports.add_argument("--export-format", choices=["gexf", "graphml"], default=EXPORT_FORMAT,
+                         help="File format (default: %(default)s)")
+    exports.add_argument("--export-top", type=int, metavar="N", default=TOP_50K_LIMIT if EXPORT_TOP_50K else 0,
+                         help="Export the N highest-degree nodes (0 = skip, default: %(default)s)")
+    exports.add_argument("--export-individual", action="store_true", default=EXPORT_INDIVIDUAL_COMMUNITIES,
+                         help="Export each top community to its own file")
+    exports.add_argument("--no-export-combined", dest="export_combined", action="store_false",
+                         default=EXPORT_COMBINED_TOP_COMMUNITIES, help="Skip the combined top communities file")
+    exports.add_argument("--no-export", action="store_true", help="Skip every visualization export")
+    return parser.parse_args(argv)
+
+def configure(args):
+    """Applies the parsed command line to the configuration constants."""
+    global RAW_DATA_PATH, ALGORITHMS_TO_RUN, ALGORITHM_SEED, USE_SUBGRAPH, SUBGRAPH_SIZE
+    global WEIGHTED_GRAPH, DIRECTED_GRAPH, PARALLEL_ALGORITHMS, TEMPORAL_ANALYSIS, OUT_OF_CORE, MEMORY_BUDGET_MB
+    global NULL_MODEL_SAMPLES, RESUME_RUNS, OUT_OF_CORE_ALGORITHMS
+    global EXPORT_FORMAT, EXPORT_TOP_50K, TOP_50K_LIMIT, EXPORT_INDIVIDUAL_COMMUNITIES, EXPORT_COMBINED_TOP_COMMUNITIES
+    RAW_DATA_PATH = args.input
+    if args.algorithms is not None:
+        ALGORITHMS_TO_RUN = list(args.algorithms)
+        if args.out_of_core:
+            ignored = [n for n in ALGORITHMS_TO_RUN if n not in OUT_OF_CORE_ALGORITHMS and n != "label_propagation"]
+            if ignored:
+                print(f"WARNING: {', '.join(ignored)} not in OUT_OF_CORE_ALGORITHMS "
+                      f"({', '.join(OUT_OF_CORE_ALGORITHMS)}), skipped out of core.")
+            OUT_OF_CORE_ALGORITHMS = [n for n in OUT_OF_CORE_ALGORITHMS if n in ALGORITHMS_TO_RUN]
+    ALGORITHM_SEED = args.seed
+    USE_SUBGRAPH = args.subgraph_size > 0
+    SUBGRAPH_SIZE = args.subgraph_size if USE_SUBGRAPH else SUBGRAPH_SIZE
+    WEIGHTED_GRAPH = args.weighted
+    DIRECTED_GRAPH = args.directed
+    GCC_PARAMS.update(weighted=WEIGHTED_GRAPH, directed=DIRECTED_GRAPH)
+    ALGORITHM_PARAMS["leiden"]["directed"] = DIRECTED_GRAPH
+    PARALLEL_ALGORITHMS = args.parallel
+    TEMPORAL_ANALYSIS = args.temporal
+    OUT_OF_CORE = args.out_of_core
+    MEMORY_BUDGET_MB = args.memory_budget
+    NULL_MODEL_SAMPLES = args.null_samples
+    RESUME_RUNS = args.resume
+
+    EXPORT_FORMAT = args.export_format
+    EXPORT_TOP_50K = args.export_top > 0 and not args.no_export
+    TOP_50K_LIMIT = args.export_top if EXPORT_TOP_50K else TOP_50K_LIMIT
+    EXPORT_INDIVIDUAL_COMMUNITIES = args.export_individual and not args.no_export
+    EXPORT_COMBINED_TOP_COMMUNITIES = args.export_combined and not args.no_export
+
+def list_algorithms():
+    """Prints the registered algorithms with their parameters (without importing them)."""
+    for name, (spec, fixed) in ALGORITHM_REGISTRY.items():
+        params = algorithm_params(name)
+        fixed = "".join(f" {key}={value}" for key, value in fixed.items())
+        print(f"{name:<24} {spec}{fixed}  {params}")
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.list_algorithms:
+        list_algorithms()
+        return
+    configure(args)
+
+    print("--- Starting Social Network Analysis Pipeline ---")
+    instrument.reset()
+    instrument.trace_allocations(TRACE_ALLOCATIONS)
+    if PROFILE_SPANS:
+        instrument.set_profiler(instrument.cprofile_hook(TRACES_DIR, PROFILE_SPANS))
     
-    for name, func in algos.items():
-        print(f"\n--- Processing {name} ---")
-        
-        # Check cache (only if NOT using subgraph, to avoid cache pollution/mismatch)
-        # Actually, we could cache subgraphs too but let's keep it simple and only cache full runs
-        partition = None
-        partition_file = os.path.join(RESULTS_DIR, "partitions", f"{name}_partition.csv")
-        
-        if not USE_SUBGRAPH and os.path.exists(partition_file):
-             # Load from CSV if exists and we are using the full graph
-             print(f"Loading partition from {partition_file}...")
-             df = pd.read_csv(partition_file)
-             # Ensure node_id is int (matches graph)
-             partition = dict(zip(df['node_id'].astype(int), df['community_id']))
-        
-        if partition is None:
-            partition = func(G_work)
-            
-        # Metrics
-        print(f"Calculating metrics for {name}...")
-        mod_score = metrics.calculate_modularity(G_work, partition)
-        bubble_metrics = metrics.calculate_bubble_metrics(G_work, partition)
-        part_stats = metrics.calculate_partition_stats(G_work, partition)
-        
-        # Calculate weighted average metrics
-        weighted_avg_conductance = metrics.calculate_weighted_avg_conductance(bubble_metrics)
-        weighted_avg_internal_density = metrics.calculate_weighted_avg_internal_density(bubble_metrics)
-        
-        print(f"Modularity: {mod_score:.4f}")
-        print(f"Communities found: {part_stats['num_communities']}")
-        print(f"Weighted Avg Conductance: {weighted_avg_conductance:.4f}")
-        print(f"Weighted Avg Internal Density: {weighted_avg_internal_density:.4f}")
-        
-        # Save
-        save_results(name, partition, mod_score, bubble_metrics, weighted_avg_conductance, weighted_avg_internal_density, G_work)
-        
-        comparison_results.append({
-            "algorithm": name,
-            "modularity": mod_score,
-            "num_communities": part_stats['num_communities'],
-            "avg_community_size": part_stats['avg_community_size'],
-            "weighted_avg_conductance": weighted_avg_conductance,
-            "weighted_avg_internal_density": weighted_avg_internal_density
-        })
-
-    # 4. Save Comparison
-    pd.DataFrame(comparison_results).to_csv(os.path.join(RESULTS_DIR, "metrics", "comparison.csv"), index=False)
+    # 1-4. Load the GCC, run the algorithms and export them (streamed from disk in out-of-core mode);
+    # comparison.csv is updated as each algorithm finishes
+    comparison_results = run_out_of_core() if OUT_OF_CORE else run_in_memory()
+    write_comparison(comparison_results)
+    cache.evict_runs(CACHE_DIR, RUN_CACHE_MAX_MB * 1024 * 1024)
+
+    if TEMPORAL_ANALYSIS:
+        run_temporal_analysis()
+
+    # 5. Save Trace (per-stage wall/CPU time and peak memory)
+    os.makedirs(TRACES_DIR, exist_ok=True)
+    trace_path = os.path.join(TRACES_DIR, "pipeline_trace.json")
+    instrument.write_trace(trace_path, os.path.join(TRACES_DIR, "pipeline_trace.chrome.json"))
+    print(f"Saved stage trace to {trace_path}")
     print("\n--- Pipeline Complete ---")
 
 if __name__ == "__main__":
@@ -0,0 +1,77 @@
+"""
+Checkpoint manifest of the pipeline stages.
+
+Every algorithm goes through a small DAG of stages, load -> GCC -> detect ->
+score -> export, and each completed stage is recorded in a manifest directory as
+one JSON file: the stage's key (a hash of everything its output depends on:
+graph, parameters, seed, code and the keys of the stages before it), a small
+output (e.g. the comparison row of a score stage) and the files it wrote.
+Records are written to a temporary file and moved into place, so a crash or a
+terminated worker never leaves a partial record, and worker processes can record
+the stages of their own algorithm without any locking.
+
+A rerun skips the stages recorded with the same key whose files still exist, and
+re-runs the others: after a crash only the unfinished stages run, and a changed
+parameter re-runs the stages that depend on it (their keys change with it).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+def stage_key(*parts):
+    """Short SHA-256 digest of JSON-serializable `parts` (a stage key)."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+class RunManifest:
+    """
+    Completed stages of the pipeline, one record per stage in `directory`.
+
+    Stages are named "<stage>" or "<stage>/<algorithm>" (e.g. "gcc", "score/louvain").
+    With `resume=False` the recorded stages are ignored (and overwritten as the stages
+    complete again).
+    """
+
+    def __init__(self, directory, resume=True):
+        self.directory = directory
+        self.resume = resume
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, stage):
+        return os.path.join(self.directory, f"{stage.replace('/', '.')}.json")
+
+    def completed(self, stage, key):
+        """
+        Record of `stage` if it completed with `key` and its files still exist, else None.
+
+        Returns:
+            dict: {"stage", "key", "output", "files", "completed_at"}
+        """
+        path = self._path(stage)
+        if not self.resume or not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get("key") != key or not all(os.path.exists(p) for p in record.get("files", [])):
+            return None
+        return record
+
+    def record(self, stage, key, output=None, files=()):
+        """Records `stage` as completed with `key`, its `output` (JSON-serializable) and the `files` it wrote."""
+        path = self._path(stage)
+        record = {"stage": stage, "key": key, "output": output, "files": list(files), "completed_at": time.time()}
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f, indent=4, default=str)
+        os.replace(tmp_path, path)
+
+    def discard(self, stage):
+        """Forgets `stage` (e.g. before overwriting the files it recorded)."""
+        path = self._path(stage)
+        if os.path.exists(path):
+            os.remove(path)
@@ -1,9 +1,29 @@
-import networkx as nx
-import community as community_louvain
+import numpy as np
+from .graph import CSRGraph, as_csr
+from .instrument import timed
 
+def _csr_modularity(G, partition):
+    """Vectorized modularity of a partition over a CSRGraph (same convention as python-louvain)."""
+    labels = G.labels_from_partition(partition)
+    _, labels = np.unique(labels, return_inverse=True)
+    u, v, w = G.edge_array()
+    if w is None:
+        w = np.ones(len(u), dtype=np.float64)
+    m = float(w.sum())
+    if m == 0:
+        raise ValueError("A graph without link has an undefined modularity")
+    same = labels[u] == labels[v]
+    internal = np.bincount(labels[u[same]], weights=w[same], minlength=labels.max() + 1)
+    degree = np.bincount(labels, weights=G.strengths(), minlength=labels.max() + 1)
+    return float(np.sum(internal / m - (degree / (2 * m)) ** 2))
+
+@timed()
 def calculate_modularity(G, partition):
     """Calculates the modularity score of the partition."""
     try:
+        if isinstance(G, CSRGraph):
+            return _csr_modularity(G, partition)
+        import community as community_louvain
         # community_louvain.modularity expects a partition dict {node: comm_id}
         score = community_louvain.modularity(partition, G)
         return score
@@ -11,6 +31,29 @@ def calculate_modularity(G, partition):
         print(f"Error calculating modularity: {e}")
         return None
 
+@timed()
+def calculate_directed_modularity(G, partition):
+    """
+    Directed modularity (Leicht & Newman) of the partition over the retweet arcs:
+    sum over communities of internal_arc_weight / W - (out_strength * in_strength) / W^2.
+    Returns None if G has no arcs (not loaded with directed=True).
+    """
+    if not isinstance(G, CSRGraph) or G.arcs is None:
+        return None
+    _, labels = np.unique(G.labels_from_partition(partition), return_inverse=True)
+    s, t, w = G.arcs
+    w = np.asarray(w, dtype=np.float64)
+    total = w.sum()
+    if total == 0:
+        return None
+    k = int(labels.max()) + 1
+    same = labels[s] == labels[t]
+    internal = np.bincount(labels[s[same]], weights=w[same], minlength=k)
+    out_strength = np.bincount(labels[s], weights=w, minlength=k)
+    in_strength = np.bincount(labels[t], weights=w, minlength=k)
+    return float(np.sum(internal / total - out_strength * in_strength / total ** 2))
+
+@timed()
 def calculate_partition_stats(G, partition):
     """Calculates basic stats for the partition."""
     communities = {}
@@ -32,56 +75,102 @@ def calculate_partition_stats(G, partition):
         "avg_community_size": avg_size
     }
 
-def calculate_bubble_metrics(G, partition):
+@timed()
+def calculate_bubble_metrics(G, partition, min_size=10):
     """
     Calculates metrics related to 'bubbles':
     - Internal Density: Density of edges within the community.
     - Conductance: Fraction of edges leaving the community.
+
+    On weighted graphs (retweet counts) the cut, volume and conductance use the edge
+    weights; the internal density still counts distinct edges.
+
+    All communities are measured together in a single pass over the edge array
+    (label arrays + np.bincount), instead of building one subgraph per community.
+
+    Args:
+        G: nx.Graph or CSRGraph
+        partition (dict): {node_id: community_id}
+        min_size (int): Communities with fewer nodes are left out of the result.
+
+    Returns:
+        dict: {community_id: {"size", "internal_density", "conductance", "cut_size"}},
+        in order of first appearance in `partition`. `cut_size` is the cut weight on weighted graphs
+        (an int when it is integral, e.g. unweighted or retweet-count weights).
+    """
+    if not isinstance(G, CSRGraph):
+        import networkx as nx
+        G = as_csr(G, weight='weight' if nx.is_weighted(G) else None)
+
+    # Dense community indices 0..k-1, in order of first appearance in the partition
+    comm_ids = list(dict.fromkeys(partition.values()))
+    comm_index = {c: i for i, c in enumerate(comm_ids)}
+    k = len(comm_ids)
+    labels = np.fromiter(
+        (comm_index.get(partition.get(n), k) for n in G.node_ids.tolist()),
+        dtype=np.int64, count=G.number_of_nodes()
+    )  # Nodes without a community get the extra label k
+
+    u, v, w = G.edge_array()
+    lu = labels[u]
+    lv = labels[v]
+    same = lu == lv
+    cut_w = w[~same] if w is not None else None
+
+    sizes = np.bincount(labels, minlength=k + 1)[:k]
+    int_edges = np.bincount(lu[same], minlength=k + 1)[:k]
+    cut_sizes = (np.bincount(lu[~same], weights=cut_w, minlength=k + 1)
+                 + np.bincount(lv[~same], weights=cut_w, minlength=k + 1))[:k]
+    # Volume is sum of degrees (strengths if weighted)
+    if w is None:
+        volumes = np.bincount(labels, weights=G.degrees, minlength=k + 1)[:k]
+        total_vol = 2 * G.number_of_edges()
+    else:
+        volumes = np.bincount(labels, weights=G.strengths(), minlength=k + 1)[:k]
+        total_vol = 2 * G.total_weight()
+
+    return bubble_metrics_from_counts(comm_ids, sizes, int_edges, cut_sizes, volumes, total_vol, min_size)
+
+def bubble_metrics_from_counts(comm_ids, sizes, int_edges, cut_sizes, volumes, total_vol, min_size=10):
+    """
+    Bubble metrics from per-community aggregates (arrays aligned with `comm_ids`), so they can
+    be computed from a single pass over the edges or from streamed edge chunks (see outofcore).
+
+    Args:
+        comm_ids (list): Community ids.
+        sizes, int_edges (np.ndarray): Nodes and distinct internal edges of every community.
+        cut_sizes, volumes (np.ndarray): Cut and volume of every community (weighted or not).
+        total_vol (float): Volume of the whole graph (2m, or twice the total weight).
+        min_size (int): Communities with fewer nodes are left out of the result.
     """
-    communities = {}
-    for node, comm_id in partition.items():
-        if comm_id not in communities:
-            communities[comm_id] = []
-        communities[comm_id].append(node)
-    
     metrics = {}
-    
-    for comm_id, nodes in communities.items():
-        # Skip very small communities to save time/noise
-        if len(nodes) < 10:
-            continue
-            
-        subgraph = G.subgraph(nodes)
-        int_edges = subgraph.number_of_edges()
-        size = len(nodes)
-        
+
+    for i in np.flatnonzero(sizes >= min_size).tolist():
+        size = int(sizes[i])
+
         # Internal Density
         possible_edges = size * (size - 1) / 2
-        internal_density = int_edges / possible_edges if possible_edges > 0 else 0
-        
-        # Cut Size (edges leaving the community)
-        cut_size = nx.cut_size(G, nodes)
-        
-        # Conductance (cut_size / min(volume(S), volume(V-S)))
-        # Volume is sum of degrees
-        vol_S = sum(dict(G.degree(nodes)).values())
-        # Approximate volume of rest of graph (total_vol - vol_S)
-        # For large graphs, just use vol_S as denominator if we assume S is small compared to V
-        # But standard definition:
-        # conductance = cut_size / min(vol_S, 2*m - vol_S)
-        total_vol = 2 * G.number_of_edges()
+        internal_density = int(int_edges[i]) / possible_edges if possible_edges > 0 else 0
+
+        # Conductance = cut_size / min(vol_S, 2*m - vol_S)
+        # Float weights (quotient graphs, consensus co-assignments) keep their fractional cut
+        cut_size = float(cut_sizes[i])
+        vol_S = volumes[i]
         denom = min(vol_S, total_vol - vol_S)
         conductance = cut_size / denom if denom > 0 else 0
-        
-        metrics[comm_id] = {
+        if cut_size.is_integer():
+            cut_size = int(cut_size)
+
+        metrics[comm_ids[i]] = {
             "size": size,
             "internal_density": internal_density,
             "conductance": conductance,
             "cut_size": cut_size
         }
-        
+
     return metrics
 
+@timed()
 def calculate_weighted_avg_conductance(bubble_metrics):
     """
     Calculates the average conductance weighted by community size.
@@ -106,6 +195,7 @@ def calculate_weighted_avg_conductance(bubble_metrics):
     
     return total_weighted_conductance / total_size if total_size > 0 else 0.0
 
+@timed()
 def calculate_weighted_avg_internal_density(bubble_metrics):
     """
     Calculates the average internal density weighted by community size.
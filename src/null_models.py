@@ -0,0 +1,322 @@
+"""
+Null-model significance testing of community detection results.
+
+The graph is randomized many times while keeping every node's degree, the chosen
+algorithm and the metrics are re-run on every randomized graph, and the observed
+scores are compared with that null distribution (z-scores, null intervals and
+empirical p-values). Randomized graphs are built directly from the CSR edge arrays (from the arcs, keeping
+in- and out-degrees, when the graph was loaded with its directed arcs):
+
+- `edge_swap`: double edge swaps, (a, b), (c, d) -> (a, d), (c, b). Every round
+  proposes swaps for a random pairing of all edges at once and accepts those that
+  create no self-loop or multi-edge, so degrees are preserved exactly.
+- `configuration_model`: the edge endpoints (stubs) shuffled and paired again, with
+  self-loops dropped and multi-edges merged (erased configuration model). Faster,
+  but the degrees of hubs are only approximately preserved.
+
+Samples run in a fork-based process pool that inherits the graph (never pickled).
+Finished samples are checkpointed to a JSON file, so an interrupted run resumes
+with the samples it has not done yet.
+"""
+import hashlib
+import json
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from .graph import CSRGraph, as_csr
+from .instrument import timed
+from . import metrics
+
+NULL_METRICS = ["modularity", "weighted_avg_conductance", "weighted_avg_internal_density"]
+
+# Graph shared with the sample workers (inherited through fork, never pickled)
+_WORKER_GRAPH = None
+
+def _init_worker(G):
+    global _WORKER_GRAPH
+    _WORKER_GRAPH = G
+
+def _edge_keys(u, v, n):
+    return np.minimum(u, v) * n + np.maximum(u, v)
+
+def _contains(sorted_keys, keys):
+    """Membership of `keys` in the sorted array `sorted_keys`."""
+    found = np.zeros(len(keys), dtype=bool)
+    if len(sorted_keys) == 0:
+        return found
+    # Sorted queries walk `sorted_keys` in order, which is much faster than random lookups
+    order = np.argsort(keys)
+    queries = keys[order]
+    pos = np.minimum(np.searchsorted(sorted_keys, queries), len(sorted_keys) - 1)
+    found[order] = sorted_keys[pos] == queries
+    return found
+
+def _swap_rounds(u, v, n, rng, target, max_rounds, directed=False):
+    """
+    Double edge swaps on the edge arrays `u`, `v` (modified in place) until `target` swaps are
+    accepted or `max_rounds` rounds have run. With `directed`, (u, v) are arcs and swaps keep
+    their direction, (a -> b), (c -> d) -> (a -> d), (c -> b), so every node keeps its in- and
+    out-degree; otherwise (c, d) is taken in a random orientation.
+
+    Returns:
+        tuple: (accepted swaps, rounds)
+    """
+    keys = u * n + v if directed else _edge_keys(u, v, n)
+    m = len(u)
+    accepted = 0
+    rounds = 0
+    while accepted < target and rounds < max_rounds and m >= 2:
+        rounds += 1
+        perm = rng.permutation(m)
+        half = m // 2
+        e1, e2 = perm[:half], perm[half:2 * half]
+        a, b = u[e1], v[e1]
+        if directed:
+            c, d = u[e2], v[e2]
+            k1, k2 = a * n + d, c * n + b
+        else:
+            flip = rng.random(half) < 0.5
+            c = np.where(flip, v[e2], u[e2])
+            d = np.where(flip, u[e2], v[e2])
+            k1, k2 = _edge_keys(a, d, n), _edge_keys(c, b, n)
+        existing = np.sort(keys)
+        ok = (a != d) & (c != b) & (k1 != k2)
+        ok &= ~_contains(existing, np.concatenate([k1, k2])).reshape(2, -1).any(axis=0)
+        # Two swaps of the same round must not create the same edge
+        new = np.concatenate([k1[ok], k2[ok]])
+        uniq, counts = np.unique(new, return_counts=True)
+        clash = uniq[counts > 1]
+        if len(clash):
+            ok &= ~(np.isin(k1, clash) | np.isin(k2, clash))
+        ok_e1, ok_e2 = e1[ok], e2[ok]
+        u[ok_e1], v[ok_e1] = a[ok], d[ok]
+        u[ok_e2], v[ok_e2] = c[ok], b[ok]
+        keys[ok_e1] = k1[ok]
+        keys[ok_e2] = k2[ok]
+        accepted += int(ok.sum())
+    return accepted, rounds
+
+def _from_arcs(G, s, t, aw):
+    """
+    CSRGraph with the node ids of G over the arcs (s, t, aw), every ordered pair once: the
+    undirected CSR merges the two directions of a pair (weights summed, as data_loader.load_gcc
+    does) and the arcs are kept as `arcs`.
+    """
+    n = G.number_of_nodes()
+    order = np.argsort(s * n + t)
+    s, t, aw = s[order].astype(np.int32), t[order].astype(np.int32), aw[order]
+    H = CSRGraph.from_edges(s, t, n, node_ids=G.node_ids, weights=aw if G.weights is not None else None)
+    H.arcs = (s, t, aw)
+    return H
+
+@timed()
+def edge_swap(G, seed=None, swaps_per_edge=10, max_rounds=None):
+    """
+    Degree-preserving randomization of G by double edge swaps (vectorized).
+
+    Every round pairs all edges at random and proposes (a, b), (c, d) -> (a, d), (c, b)
+    (with (c, d) in a random orientation) for every pair. Swaps creating a self-loop,
+    an edge already in the graph, or the same edge as another swap of the round are
+    rejected; the others are applied together. Edge weights stay with their edge slot,
+    so strengths are not preserved on weighted graphs, only degrees.
+
+    If G has directed arcs (`G.arcs`), the arcs are swapped instead, keeping their
+    direction, so every node keeps its in- and out-degree and the randomized graph has
+    arcs too (directed algorithms and metrics run on it as on G). The undirected degrees
+    then change where swaps create or break reciprocated pairs.
+
+    Args:
+        G (CSRGraph): Graph.
+        seed (int or np.random.Generator): Random seed.
+        swaps_per_edge (float): Accepted swaps to reach, per edge (per arc if directed).
+        max_rounds (int): Stop after this many rounds even if fewer swaps were accepted
+            (default: 20 * swaps_per_edge, for graphs where few swaps are possible).
+
+    Returns:
+        CSRGraph: Randomized graph with the same node ids and degrees.
+    """
+    rng = np.random.default_rng(seed)
+    n = G.number_of_nodes()
+    directed = G.arcs is not None
+    u, v, w = G.arcs if directed else G.edge_array()
+    u = np.array(u, dtype=np.int64)
+    v = np.array(v, dtype=np.int64)
+    target = int(swaps_per_edge * len(u))
+    max_rounds = max_rounds or int(20 * swaps_per_edge) + 1
+    accepted, rounds = _swap_rounds(u, v, n, rng, target, max_rounds, directed=directed)
+    if accepted < target:
+        print(f"  Edge swap: {accepted} of {target} swaps accepted after {rounds} rounds.")
+    if directed:
+        return _from_arcs(G, u, v, w)
+    return CSRGraph.from_edges(u, v, n, node_ids=G.node_ids, weights=w)
+
+@timed()
+def configuration_model(G, seed=None):
+    """
+    Erased configuration model of G: the 2m edge endpoints are shuffled and paired again,
+    self-loops are dropped and multi-edges merged (weights summed). Edge weights are dealt
+    to the new edges in random order.
+
+    If G has directed arcs (`G.arcs`), the directed configuration model is used instead: the
+    arc targets (in-stubs) are shuffled against the arc sources (out-stubs), so in- and
+    out-degrees are approximately preserved, and the randomized graph keeps arcs.
+
+    Returns:
+        CSRGraph: Randomized graph with the same node ids and approximately the same degrees.
+    """
+    rng = np.random.default_rng(seed)
+    if G.arcs is not None:
+        n = G.number_of_nodes()
+        s, t, aw = G.arcs
+        s = np.asarray(s, dtype=np.int64)
+        t = rng.permutation(np.asarray(t, dtype=np.int64))
+        aw = rng.permutation(np.asarray(aw))
+        keep = s != t
+        keys, inverse = np.unique(s[keep] * n + t[keep], return_inverse=True)
+        if G.weights is None:
+            aw = np.ones(len(keys), dtype=aw.dtype)
+        else:
+            aw = np.bincount(inverse, weights=aw[keep], minlength=len(keys)).astype(aw.dtype)
+        return _from_arcs(G, keys // n, keys % n, aw)
+    u, v, w = G.edge_array()
+    stubs = rng.permutation(np.concatenate([u, v]).astype(np.int64))
+    s, t = stubs[0::2], stubs[1::2]
+    keep = s != t
+    if w is not None:
+        w = rng.permutation(np.asarray(w))[keep]
+    return CSRGraph.from_edges(s[keep], t[keep], G.number_of_nodes(), node_ids=G.node_ids, weights=w)
+
+RANDOMIZERS = {"swap": edge_swap, "configuration": configuration_model}
+
+def score_partition(G, partition, min_size=10):
+    """Modularity, weighted average conductance and internal density of a partition of G."""
+    bubble_metrics = metrics.calculate_bubble_metrics(G, partition, min_size=min_size)
+    return {
+        "modularity": metrics.calculate_modularity(G, partition),
+        "weighted_avg_conductance": metrics.calculate_weighted_avg_conductance(bubble_metrics),
+        "weighted_avg_internal_density": metrics.calculate_weighted_avg_internal_density(bubble_metrics),
+    }
+
+def _run_sample(func, params, index, seed, method, randomizer_kwargs, min_size):
+    """Randomizes the shared graph (sample `index` of `seed`), runs `func` on it and scores the partition."""
+    rng = np.random.default_rng([seed, index])
+    H = RANDOMIZERS[method](_WORKER_GRAPH, seed=rng, **randomizer_kwargs)
+    if (H.arcs is None) != (_WORKER_GRAPH.arcs is None):
+        # A directed algorithm would fall back to the undirected graph on H only
+        raise ValueError(f"The {method} randomization does not keep the directed arcs of the graph")
+    partition = func(H, **params)
+    return index, score_partition(H, partition, min_size=min_size)
+
+def _load_checkpoint(path, meta):
+    """Samples saved at `path` by a run with the same `meta`, as {index: scores}."""
+    if path is None or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    if data.get("meta") != meta:
+        return {}
+    return {int(i): scores for i, scores in data["samples"].items()}
+
+def _save_checkpoint(path, meta, samples):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({"meta": meta, "samples": {str(i): s for i, s in sorted(samples.items())}}, f)
+    os.replace(tmp_path, path)
+
+@timed()
+def run_null_models(G, func, params=None, n_samples=20, seed=0, method="swap", swaps_per_edge=10,
+                    min_size=10, max_workers=None, checkpoint_path=None, checkpoint_key=None):
+    """
+    Runs `func` and the metrics on `n_samples` randomized copies of G, in parallel worker processes.
+
+    Args:
+        G: nx.Graph or CSRGraph
+        func: A run_* function (or any function returning a {node_id: community_id} partition).
+        params (dict): Keyword arguments of `func`.
+        n_samples (int): Number of randomized graphs.
+        seed (int): Seed of the randomizations (sample i uses the seed sequence [seed, i]).
+        method (str): "swap" (edge_swap) or "configuration" (configuration_model).
+        swaps_per_edge (float): Accepted swaps per edge of the "swap" method.
+        min_size (int): Minimum community size of the bubble metrics.
+        max_workers (int): Number of worker processes (default: number of CPUs).
+        checkpoint_path (str): JSON file where finished samples are saved as they complete;
+            a rerun with the same settings only runs the missing samples.
+        checkpoint_key (str): Identifies the graph/algorithm/code of the run (e.g. a cache key),
+            so a checkpoint of another run is never reused.
+
+    Returns:
+        list: One {metric: value} dict per sample, in sample order.
+
+    Raises:
+        ValueError: If the randomized graphs do not have directed arcs exactly when G has,
+            so `func` would not run the same way on both.
+    """
+    G = as_csr(G)
+    params = dict(params or {})
+    randomizer_kwargs = {"swaps_per_edge": swaps_per_edge} if method == "swap" else {}
+    meta = {"key": checkpoint_key, "seed": seed, "method": method, "min_size": min_size, **randomizer_kwargs,
+            "params": hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode('utf-8')).hexdigest()}
+    done = _load_checkpoint(checkpoint_path, meta)
+    todo = [i for i in range(n_samples) if i not in done]
+    if done:
+        print(f"Resuming null model: {n_samples - len(todo)} of {n_samples} samples already done.")
+    max_workers = min(max_workers or os.cpu_count() or 1, max(len(todo), 1))
+    if todo:
+        print(f"Running {len(todo)} null-model samples ({method}) on {max_workers} worker(s)...")
+    sample_args = (seed, method, randomizer_kwargs, min_size)
+
+    def finished(index, scores):
+        done[index] = scores
+        if checkpoint_path is not None:
+            _save_checkpoint(checkpoint_path, meta, done)
+
+    if max_workers <= 1 or "fork" not in mp.get_all_start_methods():
+        _init_worker(G)
+        for i in todo:
+            finished(*_run_sample(func, params, i, *sample_args))
+    elif todo:
+        # Workers inherit the graph through fork instead of receiving a pickled copy
+        ctx = mp.get_context("fork")
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx,
+                                 initializer=_init_worker, initargs=(G,)) as executor:
+            futures = [executor.submit(_run_sample, func, params, i, *sample_args) for i in todo]
+            for future in as_completed(futures):
+                finished(*future.result())
+    return [done[i] for i in range(n_samples)]
+
+def summarize(observed, samples, confidence=0.95):
+    """
+    Compares observed scores with their null distribution.
+
+    Args:
+        observed (dict): {metric: observed value} (see score_partition).
+        samples (list): Output of run_null_models.
+        confidence (float): Coverage of the null interval.
+
+    Returns:
+        dict: {metric: {"observed", "null_mean", "null_std", "z_score", "ci_low", "ci_high", "p_value"}}.
+        The interval holds the central `confidence` fraction of the null values; the p-value is
+        the two-sided empirical probability of a null value at least as far from the null mean.
+    """
+    summary = {}
+    for metric in NULL_METRICS:
+        obs = observed.get(metric)
+        values = np.array([s[metric] for s in samples if s.get(metric) is not None], dtype=np.float64)
+        if obs is None or len(values) == 0:
+            summary[metric] = None
+            continue
+        mean = float(values.mean())
+        std = float(values.std(ddof=1)) if len(values) > 1 else 0.0
+        low, high = np.quantile(values, [(1 - confidence) / 2, (1 + confidence) / 2])
+        extreme = np.count_nonzero(np.abs(values - mean) >= abs(obs - mean))
+        summary[metric] = {
+            "observed": float(obs),
+            "null_mean": mean,
+            "null_std": std,
+            "z_score": (obs - mean) / std if std > 0 else None,
+            "ci_low": float(low),
+            "ci_high": float(high),
+            "p_value": (extreme + 1) / (len(values) + 1),
+        }
+    return summary
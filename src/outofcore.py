@@ -0,0 +1,439 @@
+"""
+Out-of-core mode for retweet graphs whose edges do not fit in memory.
+
+The mode is semi-external: arrays with one entry per node (ids, union-find
+parents, labels, degrees, row offsets) stay in memory, everything with one
+entry per edge lives on disk and is processed in chunks sized by a memory
+budget (`chunk_entries`).
+
+1. `build_gcc` streams the GML into chunked `.npy` edge files, finds the GCC
+   with a union-find that merges one edge chunk at a time, and writes the GCC
+   as an on-disk CSR (external distribution sort by row range).
+2. `load_gcc` memory-maps it as a CSRGraph whose `indices`/`weights` are only
+   read block by block (`CSRGraph.row_blocks`).
+3. `label_propagation` and `aggregate_communities` stream over those blocks;
+   the quotient graph of the propagated labels is the only graph brought into
+   memory, for Leiden, greedy modularity or any other run_* function.
+
+CSRGraph methods that build per-edge arrays (edge_array, number_of_edges,
+subgraph, to_networkx, to_igraph) are not meant for these graphs.
+"""
+import json
+import os
+import shutil
+import numpy as np
+from .graph import CSRGraph, row_blocks
+from .instrument import span, timed
+from .lpa import heaviest_labels
+from . import data_loader
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+
+# Working memory per edge entry of a chunk (endpoints, keys, sort buffers and temporaries)
+BYTES_PER_ENTRY = 64
+# Resident memory per node (ids, union-find parents, labels, degrees, row offsets)
+BYTES_PER_NODE = 64
+MIN_CHUNK_ENTRIES = 1024
+
+# Label propagation: rows of a block are updated in this many random groups
+LPA_ROUNDS = 4
+
+def chunk_entries(budget_mb, num_nodes=0):
+    """
+    Edge entries processed per chunk so that the node arrays plus one chunk fit in `budget_mb`.
+    Raises MemoryError if the node arrays alone do not fit.
+    """
+    free = budget_mb * 1024 * 1024 - num_nodes * BYTES_PER_NODE
+    entries = int(free // BYTES_PER_ENTRY)
+    if entries < MIN_CHUNK_ENTRIES:
+        raise MemoryError(f"A memory budget of {budget_mb} MB cannot hold the arrays of {num_nodes} nodes")
+    return entries
+
+def _slices(length, size):
+    for start in range(0, length, size):
+        yield slice(start, min(start + size, length))
+
+class EdgeChunks:
+    """
+    An edge list kept on disk as numbered `.npy` chunks (sources, targets and optional
+    weights), appended one chunk at a time and read back one memory-mapped chunk at a time.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.num_chunks = 0
+        self.num_edges = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, i, name):
+        return os.path.join(self.directory, f"{i:06d}_{name}.npy")
+
+    def append(self, sources, targets, weights=None):
+        if len(sources) == 0:
+            return
+        np.save(self._path(self.num_chunks, "src"), sources)
+        np.save(self._path(self.num_chunks, "dst"), targets)
+        if weights is not None:
+            np.save(self._path(self.num_chunks, "w"), weights)
+        self.num_chunks += 1
+        self.num_edges += len(sources)
+
+    def __iter__(self):
+        """Yields (sources, targets, weights or None) per chunk, memory-mapped."""
+        for i in range(self.num_chunks):
+            w_path = self._path(i, "w")
+            yield (np.load(self._path(i, "src"), mmap_mode='r'),
+                   np.load(self._path(i, "dst"), mmap_mode='r'),
+                   np.load(w_path, mmap_mode='r') if os.path.exists(w_path) else None)
+
+    def remove(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+class ChunkedUnionFind:
+    """
+    Union-find over n nodes whose unions arrive in edge chunks (the parent array is in
+    memory, the edges are not).
+
+    A chunk is merged at once: its edges are mapped to their current roots, the components
+    of that root graph are found with scipy, and every root is hooked to the smallest root
+    of its component. Parents stay fully compressed (every node points at its root).
+    """
+
+    def __init__(self, num_nodes):
+        self.parent = np.arange(num_nodes, dtype=np.int64)
+        self._remap = np.arange(num_nodes, dtype=np.int64)  # Scratch array: old root -> new root
+
+    def union(self, sources, targets):
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+        ru = self.parent[sources]
+        rv = self.parent[targets]
+        differ = ru != rv
+        if not differ.any():
+            return
+        ru, rv = ru[differ], rv[differ]
+        roots, inverse = np.unique(np.concatenate([ru, rv]), return_inverse=True)
+        k = len(roots)
+        root_graph = coo_matrix((np.ones(len(ru), dtype=bool), (inverse[:len(ru)], inverse[len(ru):])), shape=(k, k))
+        _, comp = connected_components(root_graph, directed=False)
+        # `roots` is sorted, so the first root of every component is its smallest
+        _, first = np.unique(comp, return_index=True)
+        self._remap[roots] = roots[first][comp]
+        self.parent = self._remap[self.parent]
+        self._remap[roots] = roots
+
+@timed()
+def build_gcc(gml_path, directory, budget_mb, weighted=False):
+    """
+    Builds the GCC of a GML file as an on-disk CSR, within a memory budget.
+
+    Args:
+        gml_path (str): Raw GML file.
+        directory (str): Output directory (replaced if it exists).
+        budget_mb (float): Memory for the node arrays plus one edge chunk, in MB.
+        weighted (bool): Collapse repeated retweets into int32 edge weights (as data_loader.load_gcc).
+
+    Returns:
+        CSRGraph: The GCC, memory-mapped from `directory` (see load_gcc).
+    """
+    tmp_dir = f"{directory}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    # 1. GML -> edge chunks of original node ids (the batch size ignores the unknown node count;
+    #    parsed tokens take several times the bytes they are read from)
+    print(f"Streaming {gml_path} into on-disk edge chunks...")
+    raw = EdgeChunks(os.path.join(tmp_dir, "raw"))
+    node_batches = []
+    read_size = int(min(data_loader.GML_CHUNK_SIZE, budget_mb * 1024 * 1024 / 64))
+    with span("outofcore.read_gml"):
+        for batch in data_loader.iter_gml_arrays(gml_path, chunk_entries(budget_mb) // 4, chunk_size=read_size):
+            node_batches.append(batch.node_ids)
+            raw.append(batch.sources, batch.targets)
+    node_ids = np.concatenate(node_batches)
+    del node_batches
+    n = len(node_ids)
+    if n == 0:
+        raise ValueError(f"No nodes in {gml_path}")
+    max_entries = chunk_entries(budget_mb, n)
+    print(f"Graph streamed: {n} nodes, {raw.num_edges} edges in {raw.num_chunks} chunks "
+          f"({max_entries} entries per chunk).")
+
+    # 2. Node ids -> positions, and connected components with the chunked union-find
+    order = np.argsort(node_ids, kind='stable')
+    sorted_ids = node_ids[order]
+    dtype = np.int32 if n < np.iinfo(np.int32).max else np.int64
+    edges = EdgeChunks(os.path.join(tmp_dir, "positions"))
+    components = ChunkedUnionFind(n)
+    with span("outofcore.union_find"):
+        for sources, targets, _ in raw:
+            for part in _slices(len(sources), max_entries):
+                pos = np.searchsorted(sorted_ids, sources[part])
+                pos_t = np.searchsorted(sorted_ids, targets[part])
+                if np.any(pos >= n) or np.any(pos_t >= n) \
+                        or np.any(sorted_ids[pos] != sources[part]) or np.any(sorted_ids[pos_t] != targets[part]):
+                    raise ValueError("Edge endpoint not declared as a node")
+                u, v = order[pos], order[pos_t]
+                edges.append(u.astype(dtype), v.astype(dtype))
+                components.union(u, v)
+    raw.remove()
+    del sorted_ids, order
+
+    parent = components.parent
+    del components
+    in_gcc = parent == np.argmax(np.bincount(parent, minlength=n))
+    del parent
+    new_pos = (np.cumsum(in_gcc) - 1).astype(dtype)
+    n_gcc = int(in_gcc.sum())
+    np.save(os.path.join(tmp_dir, "node_ids.npy"), node_ids[in_gcc])
+    del node_ids
+    print(f"GCC found: {n_gcc} nodes.")
+
+    # 3. Distribution sort: row ranges sized from an upper bound of the entries per row
+    with span("outofcore.sort_edges"):
+        row_counts = np.zeros(n_gcc, dtype=np.int64)
+        for u, v, _ in edges:
+            for part in _slices(len(u), max_entries):
+                keep = in_gcc[u[part]]
+                nu, nv = new_pos[u[part][keep]], new_pos[v[part][keep]]
+                row_counts += np.bincount(nu, minlength=n_gcc)
+                row_counts += np.bincount(nv[nu != nv], minlength=n_gcc)
+        bound_indptr = np.concatenate(([0], np.cumsum(row_counts)))
+        del row_counts
+        bucket_starts = np.array([start for start, _ in row_blocks(bound_indptr, max_entries)], dtype=np.int64)
+        del bound_indptr
+        buckets = [EdgeChunks(os.path.join(tmp_dir, f"bucket_{b:05d}")) for b in range(len(bucket_starts))]
+
+        for u, v, _ in edges:
+            for part in _slices(len(u), max_entries // 2):
+                keep = in_gcc[u[part]]
+                nu, nv = new_pos[u[part][keep]], new_pos[v[part][keep]]
+                off_diag = nu != nv
+                rows = np.concatenate([nu, nv[off_diag]])
+                cols = np.concatenate([nv, nu[off_diag]])
+                bucket = np.searchsorted(bucket_starts, rows, side='right') - 1
+                by_bucket = np.argsort(bucket, kind='stable')
+                bounds = np.searchsorted(bucket[by_bucket], np.arange(len(buckets) + 1))
+                for b in np.flatnonzero(np.diff(bounds)).tolist():
+                    piece = by_bucket[bounds[b]:bounds[b + 1]]
+                    buckets[b].append(rows[piece], cols[piece])
+        edges.remove()
+        del in_gcc, new_pos
+
+        # 4. Every bucket is sorted and deduplicated in memory, then appended to the CSR
+        indptr = np.zeros(n_gcc + 1, dtype=np.int64)
+        degrees = np.zeros(n_gcc, dtype=np.int64)
+        results = []
+        for b, bucket in enumerate(buckets):
+            start = int(bucket_starts[b])
+            end = int(bucket_starts[b + 1]) if b + 1 < len(buckets) else n_gcc
+            parts = list(bucket)
+            rows = np.concatenate([p[0] for p in parts]).astype(np.int64) if parts else np.empty(0, np.int64)
+            cols = np.concatenate([p[1] for p in parts]) if parts else np.empty(0, dtype)
+            del parts
+            keys = (rows - start) * n_gcc + cols
+            del rows, cols
+            if weighted:
+                keys, counts = np.unique(keys, return_counts=True)
+            else:
+                keys = np.unique(keys)
+            rows = keys // n_gcc
+            cols = (keys % n_gcc).astype(np.int32)
+            del keys
+            indptr[start + 1:end + 1] = np.bincount(rows, minlength=end - start)
+            degrees[start:end] = indptr[start + 1:end + 1] + np.bincount(rows[rows + start == cols], minlength=end - start)
+            path = os.path.join(tmp_dir, f"sorted_{b:05d}")
+            np.save(f"{path}_cols.npy", cols)
+            if weighted:
+                np.save(f"{path}_w.npy", counts.astype(np.int32))
+            results.append(path)
+            bucket.remove()
+        np.cumsum(indptr, out=indptr)
+
+        num_entries = int(indptr[-1])
+        indices = np.lib.format.open_memmap(os.path.join(tmp_dir, "indices.npy"), mode='w+',
+                                            dtype=np.int32, shape=(num_entries,))
+        weights = np.lib.format.open_memmap(os.path.join(tmp_dir, "weights.npy"), mode='w+',
+                                            dtype=np.int32, shape=(num_entries,)) if weighted else None
+        for b, path in enumerate(results):
+            lo = int(indptr[bucket_starts[b]])
+            cols = np.load(f"{path}_cols.npy")
+            indices[lo:lo + len(cols)] = cols
+            if weighted:
+                weights[lo:lo + len(cols)] = np.load(f"{path}_w.npy")
+            os.remove(f"{path}_cols.npy")
+            if weighted:
+                os.remove(f"{path}_w.npy")
+        indices.flush()
+        del indices
+        if weighted:
+            weights.flush()
+            del weights
+
+    np.save(os.path.join(tmp_dir, "indptr.npy"), indptr)
+    np.save(os.path.join(tmp_dir, "degrees.npy"), degrees)
+    num_edges = int(degrees.sum()) // 2
+    meta = {
+        "version": FORMAT_VERSION,
+        "raw_path": gml_path,
+        "num_nodes": n_gcc,
+        "num_edges": num_edges,
+        "weighted": weighted,
+    }
+    with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=4)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_dir, directory)
+    print(f"On-disk GCC written to {directory}: {n_gcc} nodes, {num_edges} edges "
+          f"(peak memory: {data_loader.peak_memory_mb() or 0:.0f} MB).")
+    return load_gcc(directory)
+
+def load_gcc(directory):
+    """
+    Memory-maps the on-disk GCC written by build_gcc (None if there is no complete one).
+    Only the node arrays (ids, row offsets, degrees) are read into memory.
+    """
+    meta_path = os.path.join(directory, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("version") != FORMAT_VERSION:
+        return None
+    load = lambda name, mode=None: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode)
+    G = CSRGraph(load("indptr"), load("indices", 'r'), load("node_ids"),
+                 load("weights", 'r') if meta["weighted"] else None)
+    G._degrees = load("degrees")
+    print(f"Loaded on-disk GCC from {directory}: {meta['num_nodes']} nodes, {meta['num_edges']} edges.")
+    return G
+
+def _block(G, start, end):
+    """Rows, columns and weights (float64, ones if unweighted) of the entries of rows start..end-1."""
+    lo, hi = int(G.indptr[start]), int(G.indptr[end])
+    cols = np.asarray(G.indices[lo:hi], dtype=np.int64)
+    rows = np.repeat(np.arange(start, end, dtype=np.int64), np.diff(G.indptr[start:end + 1]))
+    w = np.asarray(G.weights[lo:hi], dtype=np.float64) if G.weights is not None else np.ones(hi - lo)
+    return rows, cols, w
+
+def _propagate_block(G, labels, start, end, rng, rounds, priority):
+    """
+    Label propagation step for rows start..end-1. The block is read once and its rows are
+    updated in `rounds` random groups, each seeing the labels of the previous ones, which
+    breaks the label swaps of a fully synchronous update.
+    """
+    rows, cols, w = _block(G, start, end)
+    entry_round = rng.integers(0, rounds, end - start)[rows - start]
+    changed = 0
+    for r in range(rounds):
+        sel = entry_round == r
+        nodes, new = heaviest_labels(labels, rows[sel], cols[sel], w[sel], priority)
+        labels[nodes] = new
+        changed += len(nodes)
+    return changed
+
+@timed()
+def label_propagation(G, max_entries, seed=None, max_iter=20, tol=1e-3, rounds=LPA_ROUNDS):
+    """
+    Label propagation streamed over row blocks of at most `max_entries` entries.
+
+    Blocks are visited in a random order and updated one at a time from the labels
+    left by the previous blocks; inside a block, rows are updated in `rounds` random
+    groups (see _propagate_block). Every node takes the label with the largest total
+    edge weight among its neighbours (lpa.heaviest_labels), keeping its own label on ties.
+
+    Args:
+        G (CSRGraph): Graph (typically memory-mapped by load_gcc).
+        max_entries (int): Entries per block (see chunk_entries).
+        seed (int): Random seed (block order and tie-breaking).
+        max_iter (int): Maximum number of passes over the edges.
+        tol (float): Stop when fewer than this fraction of the nodes change label in a pass.
+        rounds (int): Update groups per block.
+
+    Returns:
+        tuple: (labels renumbered 0..k-1, list with the number of label changes per pass)
+    """
+    print("Running streamed Label Propagation...")
+    n = G.number_of_nodes()
+    rng = np.random.default_rng(seed)
+    labels = np.arange(n, dtype=np.int64)
+    blocks = list(G.row_blocks(max_entries))
+    changes = []
+    for iteration in range(max_iter):
+        changed = 0
+        priority = rng.random(n)
+        for b in rng.permutation(len(blocks)).tolist():
+            changed += _propagate_block(G, labels, *blocks[b], rng, rounds, priority)
+        changes.append(changed)
+        print(f"  Pass {iteration + 1}: {changed} labels changed ({len(blocks)} blocks).")
+        if changed <= tol * n:
+            break
+    return np.unique(labels, return_inverse=True)[1], changes
+
+@timed()
+def aggregate_communities(G, labels, max_entries):
+    """
+    Per-community totals and the quotient graph, streamed over row blocks.
+
+    Args:
+        G (CSRGraph): Graph.
+        labels (np.ndarray): Community 0..k-1 of every position.
+        max_entries (int): Entries per block.
+
+    Returns:
+        tuple: (dict of arrays indexed by community: "sizes", "internal_edges" (distinct),
+        "internal_weight", "cut" and "volume" (weighted if G is), and the quotient
+        CSRGraph, built like CSRGraph.quotient)
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    k = int(labels.max()) + 1
+    internal_edges = np.zeros(k, dtype=np.int64)
+    internal_weight = np.zeros(k)
+    cut = np.zeros(k)
+    volume = np.zeros(k)
+    pair_keys = np.empty(0, dtype=np.int64)
+    pair_weights = np.empty(0)
+
+    # Half-size blocks: the label pairs and their sort take about twice the memory of a block
+    for start, end in G.row_blocks(max(max_entries // 2, 1)):
+        rows, cols, w = _block(G, start, end)
+        lr, lc = labels[rows], labels[cols]
+        loops = rows == cols
+        volume += np.bincount(lr, weights=w, minlength=k) + np.bincount(lr[loops], weights=w[loops], minlength=k)
+        cross = lr != lc
+        cut += np.bincount(lr[cross], weights=w[cross], minlength=k)
+
+        once = rows <= cols  # Every undirected edge once from here on
+        del rows, cols, loops, cross
+        lr, lc, w = lr[once], lc[once], w[once]
+        inside = lr == lc
+        internal_edges += np.bincount(lr[inside], minlength=k)
+        internal_weight += np.bincount(lr[inside], weights=w[inside], minlength=k)
+
+        keys, inverse = np.unique(np.minimum(lr, lc) * k + np.maximum(lr, lc), return_inverse=True)
+        del lr, lc
+        sums = np.bincount(inverse, weights=w, minlength=len(keys))
+        pair_keys, inverse = np.unique(np.concatenate([pair_keys, keys]), return_inverse=True)
+        pair_weights = np.bincount(inverse, weights=np.concatenate([pair_weights, sums]), minlength=len(pair_keys))
+
+    if len(pair_keys) > max_entries:
+        print(f"  WARNING: the quotient graph has {len(pair_keys)} edges, more than one chunk ({max_entries}): "
+              "the labels do not coarsen the graph enough for the memory budget.")
+    if G.weights is not None:
+        pair_weights = pair_weights.astype(np.int64)  # Summed retweet counts, as CSRGraph.quotient
+    totals = {
+        "sizes": np.bincount(labels, minlength=k),
+        "internal_edges": internal_edges,
+        "internal_weight": internal_weight,
+        "cut": cut,
+        "volume": volume,
+    }
+    Q = CSRGraph.from_edges(pair_keys // k, pair_keys % k, k, weights=pair_weights)
+    return totals, Q
+
+def modularity(totals):
+    """Modularity of a partition from its aggregate_communities totals."""
+    two_m = totals["volume"].sum()
+    if two_m == 0:
+        raise ValueError("A graph without link has an undefined modularity")
+    return float(np.sum(totals["internal_weight"] / (two_m / 2) - (totals["volume"] / two_m) ** 2))
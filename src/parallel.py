@@ -0,0 +1,79 @@
+import json
+import multiprocessing as mp
+import os
+import time
+
+POLL_INTERVAL_S = 0.2
+
+def fork_available():
+    """True if worker processes can be forked (not on Windows)."""
+    return "fork" in mp.get_all_start_methods()
+
+def run_in_processes(tasks, max_workers=None, timeout=None, on_finish=None):
+    """
+    Runs tasks in separate worker processes, at most `max_workers` at a time.
+
+    Workers are always forked (whatever the platform's default start method), so they
+    inherit the parent's module state, e.g. the configuration set from the command line;
+    a spawned worker would re-import its modules with their defaults. Check
+    fork_available() first.
+
+    Each task is a (name, target, args) tuple; `target(*args)` runs in its own
+    process, so a task that exceeds `timeout` seconds can be terminated without
+    affecting the others. Large inputs should be passed by reference (e.g. the
+    path of a memory-mapped cache entry), never as pickled objects.
+    `on_finish(name, status)` is called in the parent as soon as each task ends,
+    while the others keep running.
+
+    Returns:
+        dict: {name: "ok" | "failed" | "timeout"}, in task order.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    ctx = mp.get_context("fork")
+    pending = list(tasks)
+    running = {}  # name -> (process, start time)
+    status = {name: None for name, _, _ in tasks}
+
+    while pending or running:
+        while pending and len(running) < max_workers:
+            name, target, args = pending.pop(0)
+            proc = ctx.Process(target=target, args=args, name=f"worker-{name}")
+            proc.start()
+            print(f"[parallel] Started {name} (pid {proc.pid})")
+            running[name] = (proc, time.monotonic())
+
+        time.sleep(POLL_INTERVAL_S)
+
+        for name, (proc, started) in list(running.items()):
+            elapsed = time.monotonic() - started
+            if not proc.is_alive():
+                proc.join()
+                status[name] = "ok" if proc.exitcode == 0 else "failed"
+                print(f"[parallel] {name} finished in {elapsed:.1f}s ({status[name]})")
+                del running[name]
+                if on_finish is not None:
+                    on_finish(name, status[name])
+            elif timeout is not None and elapsed > timeout:
+                proc.terminate()
+                proc.join()
+                status[name] = "timeout"
+                print(f"[parallel] {name} exceeded {timeout}s and was terminated")
+                del running[name]
+                if on_finish is not None:
+                    on_finish(name, status[name])
+
+    return status
+
+def write_result(path, data):
+    """Writes a worker result atomically (a terminated worker never leaves a partial file)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def read_result(path):
+    """Reads a worker result written with write_result, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,80 @@
+"""
+Columnar store for the partitions found by every algorithm.
+
+Every graph (identified by its cache key, which also covers subgraph selections)
+has its own store, a directory `graph_<key>/` under the store root holding
+`node_ids.npy` (the node order of that graph), `store.json` (its key and node
+count) and one integer label column per algorithm, `<algorithm>.npy`, aligned
+with `node_ids`. Stores of different graphs coexist, so switching between e.g. a
+subgraph run and a full-graph run keeps both sets of columns. Columns are written
+atomically and independently, so parallel workers can append to the same store,
+and each one is loaded lazily (memory-mapped) only when asked for.
+"""
+import json
+import os
+import numpy as np
+
+STORE_FILE = "store.json"
+NODE_IDS_FILE = "node_ids.npy"
+
+class PartitionStore:
+    """
+    Label columns for one graph, stored in `<root>/graph_<graph_key>/`.
+
+    A store whose recorded node count does not match `node_ids` (e.g. left over by an
+    interrupted write) is cleared; the stores of other graphs are never touched.
+    """
+
+    def __init__(self, root, graph_key, node_ids):
+        self.root = root
+        self.directory = os.path.join(root, f"graph_{graph_key}")
+        self.graph_key = graph_key
+        self.num_nodes = len(node_ids)
+        os.makedirs(self.directory, exist_ok=True)
+
+        meta_path = os.path.join(self.directory, STORE_FILE)
+        meta = None
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+        if meta != {"graph_key": graph_key, "num_nodes": self.num_nodes}:
+            if meta is not None:
+                print(f"Partition store {self.directory} does not match its graph, clearing it.")
+            for name in self.columns():
+                os.remove(self._column_path(name))
+            np.save(os.path.join(self.directory, NODE_IDS_FILE), np.asarray(node_ids, dtype=np.int64))
+            tmp_path = f"{meta_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({"graph_key": graph_key, "num_nodes": self.num_nodes}, f, indent=4)
+            os.replace(tmp_path, meta_path)
+
+    def _column_path(self, name):
+        return os.path.join(self.directory, f"{name}.npy")
+
+    def columns(self):
+        """Names of the stored partitions."""
+        return sorted(
+            f[:-len(".npy")] for f in os.listdir(self.directory)
+            if f.endswith(".npy") and f != NODE_IDS_FILE and not f.startswith(".")
+        )
+
+    def node_ids(self):
+        return np.load(os.path.join(self.directory, NODE_IDS_FILE), mmap_mode='r')
+
+    def save(self, name, labels):
+        """Adds (or replaces) the label column `name`; `labels` must be aligned with the graph positions."""
+        labels = np.asarray(labels)
+        if len(labels) != self.num_nodes:
+            raise ValueError(f"Partition {name} has {len(labels)} labels, expected {self.num_nodes}")
+        dtype = np.int32 if len(labels) == 0 or labels.max() < np.iinfo(np.int32).max else np.int64
+        # np.save appends ".npy" to names without it, so the temporary file keeps the extension
+        tmp_path = os.path.join(self.directory, f".{name}.tmp.npy")
+        np.save(tmp_path, labels.astype(dtype))
+        os.replace(tmp_path, self._column_path(name))
+
+    def load(self, name, mmap=True):
+        """Returns the label column `name` (memory-mapped by default), or None if it is not stored."""
+        path = self._column_path(name)
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode='r' if mmap else None)